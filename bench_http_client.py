@@ -0,0 +1,120 @@
+# Per-fetch latency of the old urlopen-per-call approach versus the pooled
+# HttpClient, against a local stub of the CoinGecko simple/price endpoint.
+#
+#   python bench_http_client.py [--requests 200] [--tls]
+#
+# --tls serves HTTPS with a throwaway self-signed certificate (needs the
+# openssl CLI), which is where connection reuse matters most.
+import argparse
+import gzip
+import json
+import os
+import shutil
+import ssl
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from http_client import HttpClient
+
+PAYLOAD = json.dumps({
+    coin_id: {"usd": 1.0, "usd_market_cap": 1e9, "usd_24h_vol": 1e8, "usd_24h_change": 0.5}
+    for coin_id in ("bitcoin", "ethereum", "ripple")
+}).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+    def do_GET(self):
+        body = PAYLOAD
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_certificate(directory):
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1",
+                    "-keyout", key, "-out", cert], check=True, capture_output=True)
+    return cert, key
+
+
+def start_server(tls_files=None):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    scheme = "http"
+    if tls_files:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*tls_files)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"{scheme}://127.0.0.1:{server.server_address[1]}/api/v3/simple/price?ids=bitcoin,ethereum,ripple"
+    return server, url
+
+
+def time_fetches(fetch, count):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        json.loads(fetch())
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(name, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<28} mean {statistics.mean(latencies):7.3f} ms   "
+          f"median {statistics.median(latencies):7.3f} ms   p95 {p95:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pooled HttpClient against urlopen")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--tls", action="store_true")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        tls_files = make_certificate(tmpdir) if args.tls else None
+        server, url = start_server(tls_files)
+        context = ssl.create_default_context(cafile=tls_files[0]) if tls_files else ssl.create_default_context()
+
+        def urlopen_fetch():
+            # What CryptoAPI did before: new connection (and TLS handshake) per call
+            with urllib.request.urlopen(url, context=context if args.tls else None) as response:
+                return response.read().decode()
+
+        client = HttpClient(context=context)
+
+        def pooled_fetch():
+            return client.get(url).body.decode()
+
+        print(f"{args.requests} requests against {url.split('?')[0]}")
+        report("urlopen per fetch (before)", time_fetches(urlopen_fetch, args.requests))
+        report("pooled HttpClient (after)", time_fetches(pooled_fetch, args.requests))
+
+        client.close()
+        server.shutdown()
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    main()
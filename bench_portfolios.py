@@ -0,0 +1,75 @@
+# Batched valuation of many portfolios against many scenarios.
+#
+#   python bench_portfolios.py [--portfolios 10000] [--scenarios 10000] [--coins 20] [--budget-mb 64]
+#
+# Writes one holdings file per portfolio to a scratch directory, then times
+# scanning it, loading every file, valuing all portfolios at current prices,
+# and the full per-portfolio risk summary over every scenario. Peak memory is
+# what tracemalloc sees NumPy allocate on top of the inputs; the full
+# (portfolios x scenarios) matrix would need portfolios x scenarios x 8 bytes.
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from coin_registry import Coin, CoinRegistry
+from portfolio_collection import PortfolioCollection
+
+
+def timed(label, function, trace=True):
+    # tracemalloc slows down pure-Python work a lot, so file loading is timed untraced
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    peak = f"   peak {tracemalloc.get_traced_memory()[1] / 2 ** 20:8.1f} MiB" if trace else ""
+    tracemalloc.stop()
+    print(f"{label:<28} {elapsed * 1000:9.1f} ms{peak}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched valuation across portfolios")
+    parser.add_argument("--portfolios", type=int, default=10000)
+    parser.add_argument("--scenarios", type=int, default=10000)
+    parser.add_argument("--coins", type=int, default=20)
+    parser.add_argument("--budget-mb", type=float, default=64, help="working memory per block")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    registry = CoinRegistry([Coin(f"c{i}", f"coin-{i}", 2, "#888888") for i in range(args.coins)])
+    current = rng.uniform(1, 1000, args.coins)
+    current_prices = dict(zip(registry.symbols, current.tolist()))
+    scenario_prices = current * rng.lognormal(0.0, 0.3, (args.scenarios, args.coins))
+
+    directory = tempfile.mkdtemp()
+    try:
+        holdings = rng.uniform(0, 10, (args.portfolios, args.coins)) * (rng.random((args.portfolios, args.coins)) < 0.5)
+        for i, row in enumerate(holdings.tolist()):
+            with open(os.path.join(directory, f"client{i:06d}.json"), "w") as f:
+                json.dump(dict(zip(registry.symbols, row)), f)
+
+        print(f"{args.portfolios} portfolios x {args.scenarios} scenarios x {args.coins} coins, "
+              f"{args.budget_mb:g} MiB blocks (full matrix: {args.portfolios * args.scenarios * 8 / 2 ** 20:.0f} MiB)")
+        collection = PortfolioCollection(registry, directory)
+        timed("scan directory", collection.scan, trace=False)
+        timed("load every file", lambda: collection.matrix, trace=False)
+        totals = timed("value at current prices", lambda: collection.current_totals(current_prices))
+        budget = int(args.budget_mb * 2 ** 20)
+        summary = timed("risk summary (all scenarios)",
+                        lambda: collection.risk_summary(scenario_prices, current_prices, max_bytes=budget))
+        assert np.allclose(totals, holdings @ current)
+        print(f"  median VaR 95%: {np.median(summary['risk'][0.95]['var']):,.2f}   "
+              f"median CVaR 95%: {np.median(summary['risk'][0.95]['cvar']):,.2f}")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# Round latency and availability of one price source versus several queried
+# through AggregatePriceSource, against local stub servers that misbehave on
+# purpose.
+#
+#   python bench_price_sources.py [--rounds 50] [--timeout 0.5]
+#
+# Each stub answers in its CoinGecko or Binance response format after a random
+# delay, fails some requests with a 500, and now and then stalls well past the
+# aggregate's timeout. Every stub quotes slightly different prices, so the
+# median shows up in the combined snapshot.
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from coin_registry import CoinRegistry
+from http_client import HttpClient
+from price_sources import AggregatePriceSource, BinanceSource, CoinGeckoSource
+
+PRICES = {"btc": 60000.0, "eth": 3000.0, "xrp": 0.5}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        stub = self.server.stub
+        delay, fail = stub.plan()
+        time.sleep(delay)
+        if fail:
+            self.send_error(500)
+            return
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        body = json.dumps(stub.payload(query)).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubSource:
+    def __init__(self, kind, registry, bias, delay, failure_rate, stall_rate, stall, seed):
+        self.kind = kind
+        self.registry = registry
+        self.bias = bias  # relative price offset, so sources disagree a little
+        self.delay = delay
+        self.failure_rate = failure_rate
+        self.stall_rate = stall_rate
+        self.stall = stall
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/price"
+
+    def plan(self):
+        with self.lock:
+            delay = self.random.expovariate(1 / self.delay)
+            if self.random.random() < self.stall_rate:
+                delay += self.stall
+            return delay, self.random.random() < self.failure_rate
+
+    def payload(self, query):
+        if self.kind == "coingecko":
+            ids = query.get("ids", [""])[0].split(",")
+            return {coin.coingecko_id: {"usd": self.price(coin.symbol), "usd_market_cap": 1e9, "usd_24h_vol": 1e8,
+                                        "usd_24h_change": 0.5} for coin in self.registry if coin.coingecko_id in ids}
+        pairs = json.loads(query["symbols"][0])
+        return [{"symbol": coin.symbol.upper() + "USDT", "lastPrice": str(self.price(coin.symbol)),
+                 "quoteVolume": "1e8", "priceChangePercent": "0.5"}
+                for coin in self.registry if coin.symbol.upper() + "USDT" in pairs]
+
+    def price(self, symbol):
+        return PRICES.get(symbol, 100.0) * (1 + self.bias)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def run(name, source, rounds, pause):
+    latencies = []
+    failures = 0
+    snapshot = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        try:
+            snapshot, _ = source.fetch()
+        except Exception:
+            failures += 1
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(pause)
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{name:<24} median {statistics.median(latencies):8.1f} ms   p95 {p95:8.1f} ms   "
+          f"max {latencies[-1]:8.1f} ms   failed {failures}/{rounds}")
+    return snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark aggregated price sources against flaky local stubs")
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=0.5, help="aggregate timeout in seconds")
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds between rounds")
+    args = parser.parse_args()
+
+    registry = CoinRegistry()
+    stubs = [
+        StubSource("coingecko", registry, 0.000, delay=0.05, failure_rate=0.10, stall_rate=0.10, stall=2.0, seed=1),
+        StubSource("coingecko", registry, 0.002, delay=0.08, failure_rate=0.10, stall_rate=0.05, stall=2.0, seed=2),
+        StubSource("binance", registry, -0.001, delay=0.03, failure_rate=0.10, stall_rate=0.05, stall=2.0, seed=3),
+    ]
+    http = HttpClient(timeout=5)
+
+    def sources():
+        built = []
+        for index, stub in enumerate(stubs):
+            source_type = CoinGeckoSource if stub.kind == "coingecko" else BinanceSource
+            source = source_type(registry, http, base_url=stub.url)
+            source.name = f"{stub.kind}-{index}"
+            built.append(source)
+        return built
+
+    print(f"{args.rounds} rounds, {len(stubs)} stub sources, aggregate timeout {args.timeout:g}s")
+    run("single source", sources()[0], args.rounds, args.pause)
+    for strategy in ("first", "median"):
+        aggregate = AggregatePriceSource(sources(), registry, strategy, args.timeout)
+        snapshot = run(f"aggregate ({strategy})", aggregate, args.rounds, args.pause)
+        if snapshot is not None:
+            print("    last prices: " + ", ".join(f"{symbol} {price:g}" for symbol, price in snapshot[0].items()))
+        for name, stats in aggregate.source_stats().items():
+            print(f"    {name:<12} requests {stats['requests']:4d}   error rate {stats['error_rate']:5.1%}   "
+                  f"timeouts {stats['timeouts']:3d}   p50 {1000 * (stats['latency_p50_s'] or 0):7.1f} ms   "
+                  f"p95 {1000 * (stats['latency_p95_s'] or 0):7.1f} ms")
+        aggregate.close()
+
+    http.close()
+    for stub in stubs:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# Startup cost of the GUI entry points.
+#
+#   python bench_startup.py [--ui qt|tk] [--runs 5] [--top 10]
+#
+# Reports cumulative import time per module from `python -X importtime` and the
+# wall-clock time from interpreter launch until the main window has been shown
+# and has processed its first events (time-to-first-window). The Qt app can be
+# measured headless with QT_QPA_PLATFORM=offscreen; the Tk app needs a display.
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+ENTRY_MODULES = {"qt": "main_pyside6", "tk": "main"}
+
+FIRST_WINDOW_SNIPPETS = {
+    "qt": """
+import sys
+from PySide6.QtWidgets import QApplication
+import main_pyside6
+app = QApplication(sys.argv)
+window = main_pyside6.CryptoPortfolioApp()
+window.show()
+app.processEvents()
+print("FIRST_WINDOW")
+""",
+    "tk": """
+import main
+app = main.CryptoPortfolioApp()
+app.update()
+print("FIRST_WINDOW")
+""",
+}
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)")
+
+
+def import_times(module):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=HERE, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            times[match.group(4)] = int(match.group(2))  # cumulative microseconds
+    return times
+
+
+def time_to_first_window(ui, workdir):
+    # Run from an empty directory so saved holdings/scenarios don't skew the numbers
+    env = dict(os.environ, PYTHONPATH=HERE)
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", FIRST_WINDOW_SNIPPETS[ui]], cwd=workdir, env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    for line in process.stdout:
+        if line.strip() == "FIRST_WINDOW":
+            elapsed = time.perf_counter() - start
+            break
+    else:
+        process.wait()
+        raise RuntimeError(f"{ui} app exited before showing a window")
+    process.kill()
+    process.wait()
+    return elapsed * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure GUI import time and time-to-first-window")
+    parser.add_argument("--ui", choices=sorted(ENTRY_MODULES), default="qt")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest modules to list")
+    args = parser.parse_args()
+
+    module = ENTRY_MODULES[args.ui]
+    times = import_times(module)
+    print(f"import {module}: {times[module] / 1000:.1f} ms cumulative")
+    for name, micros in sorted(times.items(), key=lambda item: -item[1])[1:args.top + 1]:
+        print(f"  {micros / 1000:8.1f} ms  {name}")
+    loaded_matplotlib = any(name.startswith("matplotlib") for name in times)
+    print(f"matplotlib imported at startup: {'yes' if loaded_matplotlib else 'no'}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        samples = [time_to_first_window(args.ui, workdir) for _ in range(args.runs)]
+    print(f"time-to-first-window over {args.runs} runs: median {statistics.median(samples):.0f} ms, "
+          f"min {min(samples):.0f} ms, max {max(samples):.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# Tick-to-screen latency of the live price feed, end to end.
+#
+#   python bench_stream_latency.py [--rate 20] [--seconds 5] [--scenarios 0]
+#
+# Starts the stand-in feed (price_feed_server.py) in-process, points the Qt app
+# at it, and measures for each tick the time from the server sending it to the
+# first paint event after the app has applied that price. Ticks that arrive
+# while the GUI is busy are merged into one redraw; those count as "coalesced".
+# Runs headless with QT_QPA_PLATFORM=offscreen (the default here). REST polling
+# is disabled so nothing touches the network; runs in a scratch directory.
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure tick-to-screen latency of the live price feed")
+    parser.add_argument("--rate", type=float, default=20.0, help="ticks per second")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--scenarios", type=int, default=0, help="random future scenarios to revalue per tick")
+    args = parser.parse_args()
+
+    from PySide6.QtCore import QEvent, QObject, QTimer
+    from PySide6.QtWidgets import QApplication
+    import numpy as np
+    import main_pyside6
+    from price_feed_server import PriceFeedServer
+
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    try:
+        lock = threading.Lock()
+        sent = {}  # (symbol, price) -> send time
+
+        def on_send(symbol, price, sent_at):
+            with lock:
+                sent[(symbol, price)] = sent_at
+
+        app = QApplication(sys.argv)
+        registry = main_pyside6.CoinRegistry.load()
+        server = PriceFeedServer(registry.symbols, rate=args.rate, seed=1, on_send=on_send).start()
+        main_pyside6.PRICE_STREAM_URL = server.url
+
+        class BenchApp(main_pyside6.CryptoPortfolioApp):
+            def auto_fetch_prices(self):
+                pass
+
+            def scheduled_refresh(self):
+                pass
+
+        window = BenchApp()
+        window.portfolio_manager.holdings = {symbol: 1.0 for symbol in registry.symbols}
+        if args.scenarios:
+            window.portfolio_manager.future_prices = np.random.default_rng(0).uniform(
+                0.5, 2.0, (args.scenarios, len(registry))) * [server.prices[s] for s in registry.symbols]
+        window.show()
+
+        latencies = []
+        shown = set()
+
+        class PaintProbe(QObject):
+            def eventFilter(self, obj, event):
+                if event.type() == QEvent.Type.Paint:
+                    now = time.time()
+                    with lock:
+                        for symbol, price in window.crypto_api.get_current_prices().items():
+                            sent_at = sent.pop((symbol, price), None)
+                            if sent_at is not None and (symbol, price) not in shown:
+                                shown.add((symbol, price))
+                                latencies.append(now - sent_at)
+                return False
+
+        probe = PaintProbe()
+        app.installEventFilter(probe)
+        QTimer.singleShot(int(args.seconds * 1000), app.quit)
+        app.exec()
+        app.removeEventFilter(probe)
+        window.price_stream.stop()
+        server.stop()
+
+        total = len(latencies) + len(sent)
+        print(f"{total} ticks at {args.rate:g}/s, {args.scenarios} scenarios, {len(registry)} coins")
+        if latencies:
+            ms = [latency * 1000 for latency in latencies]
+            print(f"  shown      {len(ms):6d}")
+            print(f"  coalesced  {len(sent):6d}")
+            print(f"  median   {statistics.median(ms):8.2f} ms")
+            print(f"  p95      {percentile(ms, 0.95):8.2f} ms")
+            print(f"  max      {max(ms):8.2f} ms")
+        else:
+            print("  no ticks reached the screen")
+    finally:
+        os.chdir(HERE)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# Toolkit-independent chart surfaces. Each chart owns one Figure for the life of
+# the app; the UI wraps it in a canvas once and later calls update(), which
+# rewrites the existing artists' data instead of rebuilding the figure.
+# Imported lazily by the UI modules, like the rest of matplotlib.
+import math
+import time
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter, MaxNLocator
+
+from constants_pyside6 import PLOT_MAX_LEGEND_ENTRIES, PLOT_DENSE_THRESHOLD, PLOT_MAX_TICK_LABELS
+from downsample import minmax_indices
+import instrumentation
+
+
+class ScenarioChart:
+    def __init__(self, figsize, labels, colors, total_color, background, line_width=None, title_weight=None,
+                 grid_alpha=None):
+        self.figure = Figure(figsize=figsize)
+        self.figure.patch.set_facecolor(background)
+        self.ax = self.figure.add_subplot(111)
+        self.canvas = None
+        self.background = None
+        self.scenarios = np.empty((0, len(labels) + 1))
+        self.count = 0
+        self.names = self.default_name
+        self.dense = False
+        self.rescaling = False
+        self.draw_requested = None  # perf_counter() of the pending full redraw, for instrumentation
+
+        line_options = {"marker": "o"}
+        if line_width is not None:
+            line_options["linewidth"] = line_width
+        # Animated lines are left out of full draws and painted on top by blitting
+        self.lines = [self.ax.plot([], [], label=label, color=color, animated=True, **line_options)[0]
+                      for label, color in zip(["Total Portfolio"] + list(labels), [total_color] + list(colors))]
+
+        self.ax.set_xlabel('Scenarios')
+        self.ax.set_ylabel('Worth ($)')
+        self.ax.set_title('Portfolio Worth Over Scenarios', **({"fontweight": title_weight} if title_weight else {}))
+        self.show_legend = len(labels) < PLOT_MAX_LEGEND_ENTRIES
+        if self.show_legend:
+            self.ax.legend(handles=self.lines)
+        if grid_alpha is not None:
+            self.ax.grid(True, alpha=grid_alpha)
+        else:
+            self.ax.grid(True)
+
+        # Zooming or panning re-samples the visible window at full resolution
+        self.ax.callbacks.connect('xlim_changed', self._on_xlim_changed)
+
+    def attach(self, canvas):
+        self.canvas = canvas
+        canvas.mpl_connect('draw_event', self._on_draw)
+
+    @staticmethod
+    def default_name(index):
+        return 'Current' if index == 0 else f'Future {index}'
+
+    @instrumentation.timed("chart.scenarios.update")
+    def update(self, scenarios, names=None, relabel=False):
+        # names(i) labels row i; relabel=True when rows were reordered, since
+        # tick labels are part of the background rather than blitted
+        self.scenarios = scenarios
+        self.names = names or self.default_name
+        count = len(scenarios)
+        dense = count > PLOT_DENSE_THRESHOLD
+        if dense != self.dense:
+            # Per-point markers are noise (and slow) once points are sub-pixel
+            for line in self.lines:
+                line.set_marker('' if dense else 'o')
+            self.dense = dense
+
+        low, high = self.ax.get_ylim()
+        fits = count and scenarios.min() >= low and scenarios.max() <= high
+        if count == self.count and fits and self.background is not None and not relabel:
+            self._set_visible_data()
+            self._blit()
+            instrumentation.count("chart.scenarios.blits")
+            return
+
+        # Scenario count or value range changed: rescale and do one full redraw
+        self.count = count
+        self._set_ticks(count)
+        self.rescaling = True
+        try:
+            self.ax.set_xlim(auto=True)
+            self._set_visible_data(0, count)
+            self.ax.relim()
+            self.ax.autoscale_view()
+        finally:
+            self.rescaling = False
+        self._set_visible_data()
+        self.draw_requested = time.perf_counter()
+        self.canvas.draw_idle()
+
+    def _set_ticks(self, count):
+        if count <= PLOT_MAX_TICK_LABELS:
+            times = np.arange(count)
+            self.ax.set_xticks(times)
+            self.ax.set_xticklabels([self.names(i) for i in range(count)])
+        else:
+            # Let matplotlib pick a readable number of integer ticks
+            self.ax.xaxis.set_major_locator(MaxNLocator(nbins=8, integer=True))
+            self.ax.xaxis.set_major_formatter(FuncFormatter(
+                lambda x, pos: self.names(int(x)) if 0 <= x < self.count else ''))
+
+    def _set_visible_data(self, start=None, stop=None):
+        # Decimate the visible index range to about two points per horizontal pixel
+        if start is None:
+            x0, x1 = self.ax.get_xlim()
+            start = max(0, int(math.floor(x0)))
+            stop = min(self.count, int(math.ceil(x1)) + 1)
+        stop = max(start, stop)
+        buckets = max(1, int(self.ax.bbox.width))
+        for column, line in enumerate(self.lines):
+            values = self.scenarios[start:stop, column]
+            indices = minmax_indices(values, buckets)
+            line.set_data(indices + start, values[indices])
+
+    def _on_xlim_changed(self, ax):
+        if not self.rescaling and self.count:
+            self._set_visible_data()
+
+    def _on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_lines()
+        # Update to finished full redraw, including the wait for the event loop
+        if self.draw_requested is not None:
+            instrumentation.observe("chart.scenarios.redraw", time.perf_counter() - self.draw_requested)
+            self.draw_requested = None
+
+    def _draw_lines(self):
+        for line in self.lines:
+            self.ax.draw_artist(line)
+
+    def _blit(self):
+        self.canvas.restore_region(self.background)
+        self._draw_lines()
+        self.canvas.blit(self.figure.bbox)
+
+
+class AllocationChart:
+    START_ANGLE = 140
+    LABEL_DISTANCE = 1.1
+    PCT_DISTANCE = 0.6
+
+    def __init__(self, figsize, background, title_weight=None, pct_color=None, pct_weight=None):
+        self.figure = Figure(figsize=figsize)
+        self.figure.patch.set_facecolor(background)
+        self.ax = self.figure.add_subplot(111)
+        self.canvas = None
+        self.title_weight = title_weight
+        self.pct_color = pct_color
+        self.pct_weight = pct_weight
+        self.labels = None
+        self.wedges = []
+        self.texts = []
+        self.autotexts = []
+        self.draw_requested = None
+
+    def attach(self, canvas):
+        self.canvas = canvas
+        canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _on_draw(self, event):
+        if self.draw_requested is not None:
+            instrumentation.observe("chart.allocation.redraw", time.perf_counter() - self.draw_requested)
+            self.draw_requested = None
+
+    @instrumentation.timed("chart.allocation.update")
+    def update(self, allocation_data):
+        labels = allocation_data["labels"]
+        sizes = allocation_data["sizes"]
+        if labels == self.labels:
+            self._move_wedges(sizes)
+        else:
+            self._build(labels, sizes, allocation_data["colors"])
+        self.draw_requested = time.perf_counter()
+        self.canvas.draw_idle()
+
+    def _build(self, labels, sizes, colors):
+        # Only needed when the set of held coins changes
+        self.ax.clear()
+        self.wedges, self.texts, self.autotexts = self.ax.pie(
+            sizes, labels=labels, colors=colors, autopct='%1.1f%%', startangle=self.START_ANGLE,
+            labeldistance=self.LABEL_DISTANCE, pctdistance=self.PCT_DISTANCE)
+        self.ax.set_title('Current Portfolio Allocation',
+                          **({"fontweight": self.title_weight} if self.title_weight else {}))
+        for autotext in self.autotexts:
+            if self.pct_color:
+                autotext.set_color(self.pct_color)
+            if self.pct_weight:
+                autotext.set_weight(self.pct_weight)
+        self.labels = list(labels)
+
+    def _move_wedges(self, sizes):
+        # Same layout maths as Axes.pie, applied to the existing artists
+        total = float(sum(sizes))
+        theta1 = self.START_ANGLE / 360.0
+        for wedge, text, autotext, size in zip(self.wedges, self.texts, self.autotexts, sizes):
+            fraction = size / total
+            theta2 = theta1 + fraction
+            wedge.set_theta1(360.0 * theta1)
+            wedge.set_theta2(360.0 * theta2)
+
+            middle = math.pi * (theta1 + theta2)
+            x, y = math.cos(middle), math.sin(middle)
+            text.set_position((self.LABEL_DISTANCE * x, self.LABEL_DISTANCE * y))
+            text.set_horizontalalignment('left' if x > 0 else 'right')
+            autotext.set_position((self.PCT_DISTANCE * x, self.PCT_DISTANCE * y))
+            autotext.set_text(f'{100 * fraction:1.1f}%')
+            theta1 = theta2
+
@@ -0,0 +1,64 @@
+import json
+import os
+from collections import namedtuple
+
+from constants_pyside6 import COINS_FILE_PATH, COIN_COLOR_PALETTE
+
+Coin = namedtuple("Coin", ["symbol", "coingecko_id", "precision", "color"])
+
+DEFAULT_COINS = [
+    Coin("btc", "bitcoin", 2, COIN_COLOR_PALETTE[0]),
+    Coin("eth", "ethereum", 2, COIN_COLOR_PALETTE[1]),
+    Coin("xrp", "ripple", 4, COIN_COLOR_PALETTE[2]),
+]
+
+
+class CoinRegistry:
+    # Ordered set of tracked coins. A coin's position is its column index in
+    # every holdings vector and scenario price/worth array.
+    def __init__(self, coins=None):
+        self.coins = list(coins if coins is not None else DEFAULT_COINS)
+        self.symbols = [coin.symbol for coin in self.coins]
+        self._index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        if len(self._index) != len(self.coins):
+            raise ValueError("Duplicate coin symbols in registry")
+
+    @classmethod
+    def load(cls, path=COINS_FILE_PATH):
+        # coins.json: [{"symbol": "sol", "id": "solana", "precision": 2, "color": "#9945FF"}, ...]
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "r") as f:
+            data = json.load(f)
+        coins = []
+        for i, entry in enumerate(data):
+            coins.append(Coin(
+                entry["symbol"].lower(),
+                entry["id"],
+                int(entry.get("precision", 2)),
+                entry.get("color", COIN_COLOR_PALETTE[i % len(COIN_COLOR_PALETTE)])
+            ))
+        return cls(coins)
+
+    def __len__(self):
+        return len(self.coins)
+
+    def __iter__(self):
+        return iter(self.coins)
+
+    def __getitem__(self, index):
+        return self.coins[index]
+
+    def __contains__(self, symbol):
+        return symbol in self._index
+
+    def index_of(self, symbol):
+        return self._index[symbol]
+
+    @property
+    def labels(self):
+        return [symbol.upper() for symbol in self.symbols]
+
+    @property
+    def colors(self):
+        return [coin.color for coin in self.coins]
@@ -15,10 +15,13 @@ LISTBOX_HEIGHT = 10
 LISTBOX_WIDTH = 100
 FIGURE_SIZE_LARGE = (8, 6)
 FIGURE_SIZE_MEDIUM = (6, 6)
+PLOT_MAX_LEGEND_ENTRIES = 12
+MATPLOTLIB_PREWARM_DELAY_MS = 500
 FONT_BODY = ('Arial', 10)
 FONT_HEADING = ('Arial', 12, 'bold')
 FONT_BUTTON = ('Arial', 10, 'bold')
 BUTTON_PADDING = 10
+FETCH_POLL_INTERVAL_MS = 16  # ~60 fps check for background fetch results
 
 # Constants for defaults
 DEFAULT_ENTRY_VALUE = "0"
@@ -26,7 +29,30 @@ LAST_FETCHED_DEFAULT = "Last Fetched: Never"
 
 # File paths
 HOLDINGS_FILE_PATH = "crypto_holdings.json"
-SCENARIOS_FILE_PATH = "future_scenarios.json"
+SCENARIOS_FILE_PATH = "future_scenarios.scen"  # binary, see scenario_file.py
+LEGACY_SCENARIOS_FILE_PATH = "future_scenarios.json"  # imported if no binary file exists yet
+COINS_FILE_PATH = "coins.json"  # optional coin registry override
+PRICE_HISTORY_DIR = "price_history"  # one append-only .ticks file per coin
+RESPONSE_CACHE_DIR = "price_cache"  # shared by every app instance started here
+DATABASE_PATH = None  # SQLite file, e.g. "portfolio.db", to store holdings, scenarios and history instead
+RESPONSE_CACHE_TTL_S = 30
+HOLDINGS_SAVE_DELAY_S = 0.5  # debounce for write-behind holdings saves
+HOLDINGS_SAVE_MAX_DELAY_S = 5.0  # longest a pending holdings save waits while edits keep coming
+
+# Auto-refresh settings (seconds)
+AUTO_REFRESH_INTERVAL_S = 60
+AUTO_REFRESH_BACKOFF_BASE_S = 5
+AUTO_REFRESH_MAX_BACKOFF_S = 900
+AUTO_REFRESH_JITTER = 0.2  # +/- fraction applied to backoff delays
 
 # API endpoints
-COINGECKO_API_URL = "https://api.coingecko.com/api/v3/simple/price?ids=bitcoin,ethereum,ripple&vs_currencies=usd&include_market_cap=true&include_24hr_vol=true&include_24hr_change=true"
\ No newline at end of file
+COINGECKO_API_URL = "https://api.coingecko.com/api/v3/simple/price"
+COINGECKO_PRICE_PARAMS = "vs_currencies=usd&include_market_cap=true&include_24hr_vol=true&include_24hr_change=true"
+COINGECKO_MAX_URL_LENGTH = 2000  # ids are batched so each simple/price URL stays under this
+HTTP_TIMEOUT_S = 10
+HTTP_POOL_SIZE = 4  # idle keep-alive connections kept per host
+PRICE_STREAM_URL = None  # WebSocket ticker feed, e.g. "ws://127.0.0.1:8765/ticker" (see price_feed_server.py)
+PRICE_STREAM_TIMEOUT_S = 30  # a feed silent for this long is treated as dropped
+
+# Debug panel (see instrumentation.py)
+DEBUG_PANEL_REFRESH_MS = 1000
@@ -19,6 +19,12 @@ COLOR_HOVER = "#E9ECEF"  # Hover effect
 
 # Chart colors
 CHART_COLORS = [COLOR_SUCCESS_GREEN, COLOR_NEUTRAL_GRAY, COLOR_WARNING_RED]
+# Default per-coin colours, cycled for coins without an explicit colour
+COIN_COLOR_PALETTE = CHART_COLORS + ["#F7931A", "#6F42C1", "#FD7E14", "#20C997", "#E83E8C",
+                                     "#17A2B8", "#FFC107", "#343A40", "#007BFF"]
+PLOT_MAX_LEGEND_ENTRIES = 12
+PLOT_MAX_TICK_LABELS = 50  # one "Future i" tick per scenario up to this many
+PLOT_DENSE_THRESHOLD = 2000  # above this many scenarios, drop markers and decimate lines
 
 # Font settings
 FONT_FAMILY = "Arial"
@@ -36,6 +42,8 @@ INPUT_HEIGHT = 28
 LIST_MIN_HEIGHT = 200
 PLOT_WIDTH = 600
 PLOT_HEIGHT = 400
+COIN_INPUTS_MAX_HEIGHT = 160  # per-coin input grids scroll beyond this
+MATPLOTLIB_PREWARM_DELAY_MS = 500
 
 # Widget sizes
 LABEL_MIN_WIDTH = 80
@@ -48,10 +56,57 @@ LAST_FETCHED_DEFAULT = "Last Fetched: Never"
 
 # File paths
 HOLDINGS_FILE_PATH = "crypto_holdings.json"
-SCENARIOS_FILE_PATH = "future_scenarios.json"
+SCENARIOS_FILE_PATH = "future_scenarios.scen"  # binary, see scenario_file.py
+LEGACY_SCENARIOS_FILE_PATH = "future_scenarios.json"  # imported if no binary file exists yet
+COINS_FILE_PATH = "coins.json"  # optional coin registry override
+PRICE_HISTORY_DIR = "price_history"  # one append-only .ticks file per coin
+RESPONSE_CACHE_DIR = "price_cache"  # shared by every app instance started here
+DATABASE_PATH = None  # SQLite file, e.g. "portfolio.db", to store holdings, scenarios and history instead
+PORTFOLIOS_DIR = "portfolios"  # one holdings file per client portfolio, see portfolio_collection.py
+RESPONSE_CACHE_TTL_S = 30
+HOLDINGS_SAVE_DELAY_S = 0.5  # debounce for write-behind holdings saves
+HOLDINGS_SAVE_MAX_DELAY_S = 5.0  # longest a pending holdings save waits while edits keep coming
+IO_BATCH_ROWS = 8192  # rows per batch when streaming scenario import/export
+IO_READ_CHUNK_SIZE = 1 << 20  # characters read at a time by the streaming JSON parser
+SCENARIO_DISPLAY_CACHE_SIZE = 4096  # formatted scenario rows kept for redraws and scrolling
+SCENARIO_RESYNC_UPDATES = 256  # incremental revaluations before totals are recomputed from scratch
+PORTFOLIO_BATCH_BYTES = 64 << 20  # working memory per block when valuing many portfolios x scenarios
+
+# Auto-refresh settings (seconds)
+AUTO_REFRESH_INTERVAL_S = 60
+AUTO_REFRESH_BACKOFF_BASE_S = 5
+AUTO_REFRESH_MAX_BACKOFF_S = 900
+AUTO_REFRESH_JITTER = 0.2  # +/- fraction applied to backoff delays
 
 # API endpoints
-COINGECKO_API_URL = "https://api.coingecko.com/api/v3/simple/price?ids=bitcoin,ethereum,ripple&vs_currencies=usd&include_market_cap=true&include_24hr_vol=true&include_24hr_change=true"
+COINGECKO_API_URL = "https://api.coingecko.com/api/v3/simple/price"
+COINGECKO_PRICE_PARAMS = "vs_currencies=usd&include_market_cap=true&include_24hr_vol=true&include_24hr_change=true"
+COINGECKO_MAX_URL_LENGTH = 2000  # ids are batched so each simple/price URL stays under this
+BINANCE_API_URL = "https://api.binance.com/api/v3/ticker/24hr"
+BINANCE_QUOTE_ASSET = "USDT"
+PRICE_SOURCES = ("coingecko",)  # pull sources to query; more than one are aggregated (see price_sources.py)
+PRICE_AGGREGATION = "median"  # "median" across sources, or "first" good answer per coin
+PRICE_SOURCE_TIMEOUT_S = 5  # an aggregate stops waiting for slower sources after this
+PRICE_SOURCE_STATS_WINDOW = 100  # recent calls per source kept for latency percentiles
+HTTP_TIMEOUT_S = 10
+HTTP_POOL_SIZE = 4  # idle keep-alive connections kept per host
+PRICE_STREAM_URL = None  # WebSocket ticker feed, e.g. "ws://127.0.0.1:8765/ticker" (see price_feed_server.py)
+PRICE_STREAM_TIMEOUT_S = 30  # a feed silent for this long is treated as dropped
+
+# Monte Carlo scenario generation
+MONTE_CARLO_CHUNK_SIZE = 65536  # scenarios per worker task (and per seed)
+MONTE_CARLO_HORIZON_DAYS = 30
+MONTE_CARLO_CONFIDENCES = (0.95, 0.99)  # VaR / CVaR levels
+MONTE_CARLO_PERCENTILES = (1, 5, 25, 50, 75, 95, 99)  # bands of scenario total worth
+
+# Instrumentation (see instrumentation.py) and the debug panel
+INSTRUMENTATION_ENABLED = False  # record timings from startup; the debug panel turns it on when opened
+INSTRUMENTATION_BUCKETS_S = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                             1, 2.5, 5, 10, 30)  # histogram bucket upper bounds, in seconds
+METRICS_PREFIX = "cryptoportfolio"  # Prometheus metric name prefix
+PROFILE_SAMPLE_INTERVAL_S = 0.005  # stack sampling period of the sampling profiler
+PROFILE_REPORT_LINES = 30  # functions listed in a profile report
+DEBUG_PANEL_REFRESH_MS = 1000
 
 # Qt StyleSheet for modern appearance
 APP_STYLESHEET = f"""
@@ -1,54 +1,82 @@
-import urllib.request
-import json
-import ssl
 import datetime
-from constants_pyside6 import COINGECKO_API_URL
+import time
+from coin_registry import CoinRegistry
+from http_client import HttpClient
+import instrumentation
+from price_sources import build_price_source
 
 
 class CryptoAPI:
-    def __init__(self):
+    # Holds the latest prices and market info. A pull source (built from
+    # PRICE_SOURCES unless a PriceSource is given) is polled by the UIs; an optional
+    # streaming source pushes partial updates between polls.
+    def __init__(self, registry=None, history=None, cache=None, http_client=None, source=None, stream=None):
+        self.registry = registry if registry is not None else CoinRegistry()
+        # One pooled client for the lifetime of the API object, so polling reuses connections
+        self.http = http_client if http_client is not None else HttpClient()
+        self.history = history  # optional PriceHistoryStore; every fetch is appended to it
+        self.cache = cache  # optional ResponseCache shared between processes
+        self.source = source if source is not None else build_price_source(self.registry, self.http, cache)
+        self.stream = stream  # optional StreamingPriceSource
         self.current_prices = {}
         self.market_info = {}
         self.last_fetched = None
 
     def fetch_prices(self):
-        try:
-            ctx = ssl.create_default_context()
-            ctx.check_hostname = False
-            ctx.verify_mode = ssl.CERT_NONE
-
-            with urllib.request.urlopen(COINGECKO_API_URL, context=ctx) as response:
-                data = json.loads(response.read().decode())
-
-            self.current_prices = {
-                "btc": data['bitcoin']['usd'],
-                "eth": data['ethereum']['usd'],
-                "xrp": data['ripple']['usd']
-            }
-
-            self.market_info = {
-                "btc": {
-                    "market_cap": data['bitcoin']['usd_market_cap'],
-                    "24h_vol": data['bitcoin']['usd_24h_vol'],
-                    "24h_change": data['bitcoin']['usd_24h_change']
-                },
-                "eth": {
-                    "market_cap": data['ethereum']['usd_market_cap'],
-                    "24h_vol": data['ethereum']['usd_24h_vol'],
-                    "24h_change": data['ethereum']['usd_24h_change']
-                },
-                "xrp": {
-                    "market_cap": data['ripple']['usd_market_cap'],
-                    "24h_vol": data['ripple']['usd_24h_vol'],
-                    "24h_change": data['ripple']['usd_24h_change']
-                }
-            }
-
-            self.last_fetched = datetime.datetime.now()
-            return True
-
-        except Exception as e:
-            raise e
+        return self.apply_snapshot(self.request_prices())
+
+    def request_prices(self):
+        # Safe to run on a worker thread: nothing here touches the current prices
+        with instrumentation.timer("fetch.total"):
+            snapshot, fresh = self.source.fetch()
+        instrumentation.count("fetch.fresh" if fresh else "fetch.cached")
+        # Cache hits and 304s carry no new ticks
+        if self.history is not None and fresh:
+            with instrumentation.timer("history.append"):
+                self.history.append_snapshot(time.time(), *snapshot)
+        return snapshot
+
+    def load_cached_snapshot(self):
+        # Whatever the source has cached, however old, so the UI can render
+        # immediately at startup
+        return self.source.cached_snapshot()
+
+    def source_stats(self):
+        # Per-source latency and error counts when prices are aggregated, else None
+        stats = getattr(self.source, "source_stats", None)
+        return stats() if stats is not None else None
+
+    def start_stream(self, on_update, on_error):
+        # Starts the streaming source, if there is one. Both callbacks run on the
+        # stream's thread: hand updates to the GUI thread and apply_update() there.
+        if self.stream is None:
+            return False
+
+        def record(update):
+            if self.history is not None:
+                self.history.append_snapshot(time.time(), *update)
+            on_update(update)
+
+        self.stream.start(record, on_error)
+        return True
+
+    def stop_stream(self):
+        if self.stream is not None:
+            self.stream.stop()
+
+    def apply_snapshot(self, snapshot, fetched_at=None):
+        # Must be called from the GUI thread; the worker only hands over the parsed snapshot.
+        self.current_prices, self.market_info = snapshot
+        self.last_fetched = fetched_at if fetched_at is not None else datetime.datetime.now()
+        return True
+
+    def apply_update(self, update, fetched_at=None):
+        # Merges a partial snapshot (just the coins that ticked); GUI thread only
+        prices, market_info = update
+        self.current_prices = {**self.current_prices, **prices}
+        self.market_info = {**self.market_info, **market_info}
+        self.last_fetched = fetched_at if fetched_at is not None else datetime.datetime.now()
+        return True
 
     def get_current_prices(self):
         return self.current_prices
@@ -62,9 +90,13 @@ class CryptoAPI:
     def format_market_info(self):
         if not self.current_prices or not self.market_info:
             return "No market data available"
-        
-        btc_info = f"BTC: Price ${self.current_prices['btc']:.2f}, Market Cap ${self.market_info['btc']['market_cap']:,.2f}, 24h Vol ${self.market_info['btc']['24h_vol']:,.2f}, 24h Change {self.market_info['btc']['24h_change']:.2f}%\n"
-        eth_info = f"ETH: Price ${self.current_prices['eth']:.2f}, Market Cap ${self.market_info['eth']['market_cap']:,.2f}, 24h Vol ${self.market_info['eth']['24h_vol']:,.2f}, 24h Change {self.market_info['eth']['24h_change']:.2f}%\n"
-        xrp_info = f"XRP: Price ${self.current_prices['xrp']:.4f}, Market Cap ${self.market_info['xrp']['market_cap']:,.2f}, 24h Vol ${self.market_info['xrp']['24h_vol']:,.2f}, 24h Change {self.market_info['xrp']['24h_change']:.2f}%"
-        
-        return btc_info + eth_info + xrp_info
\ No newline at end of file
+
+        lines = []
+        for coin in self.registry:
+            if coin.symbol not in self.current_prices:
+                continue
+            info = self.market_info[coin.symbol]
+            lines.append(f"{coin.symbol.upper()}: Price ${self.current_prices[coin.symbol]:.{coin.precision}f}, "
+                         f"Market Cap ${info['market_cap']:,.2f}, 24h Vol ${info['24h_vol']:,.2f}, "
+                         f"24h Change {info['24h_change']:.2f}%")
+        return "\n".join(lines)
@@ -0,0 +1,445 @@
+# Headless entry point: python -m cryptoportfolio {fetch,value,scenarios,simulate,portfolios,import,export,sources,daemon}
+#
+# Uses CryptoAPI and PortfolioManager without importing any GUI toolkit or
+# matplotlib. Modules that pull in NumPy (PortfolioManager, PriceHistoryStore)
+# are imported only by the commands that need them, so `fetch --no-history`
+# starts in a few tens of ms.
+import argparse
+import csv
+import datetime
+import json
+import re
+import sys
+import time
+
+from constants_pyside6 import (HOLDINGS_FILE_PATH, SCENARIOS_FILE_PATH, COINS_FILE_PATH,
+                               AUTO_REFRESH_INTERVAL_S, MONTE_CARLO_HORIZON_DAYS, MONTE_CARLO_CONFIDENCES,
+                               PRICE_SOURCES, PRICE_AGGREGATION, PRICE_SOURCE_TIMEOUT_S, PORTFOLIOS_DIR)
+from coin_registry import CoinRegistry
+from crypto_api import CryptoAPI
+from http_client import HttpClient
+import instrumentation
+from persistence import atomic_write, atomic_write_json
+from price_sources import SOURCE_TYPES, build_price_source
+from response_cache import ResponseCache
+
+
+def build_api(args, registry):
+    cache = None if args.no_cache else ResponseCache()
+    history = None
+    if not args.no_history:
+        history = price_history(args)
+    http_client = HttpClient()
+    source = build_price_source(registry, http_client, cache, args.sources.split(","), args.aggregate,
+                                args.source_timeout)
+    return CryptoAPI(registry, history, cache, http_client, source)
+
+
+def open_store(args):
+    # The SQLite database given by --db, opened once per run, or None
+    if args.db is None:
+        return None
+    if getattr(args, "store", None) is None:
+        from sqlite_store import SQLiteStore
+        args.store = SQLiteStore(args.db)
+    return args.store
+
+
+def price_history(args):
+    store = open_store(args)
+    if store is not None:
+        return store
+    from price_history import PriceHistoryStore
+    return PriceHistoryStore()
+
+
+def load_portfolio(args, registry):
+    from portfolio_manager import PortfolioManager
+
+    portfolio_manager = PortfolioManager(registry, args.holdings, args.scenarios, open_store(args), args.portfolio)
+    success, message = portfolio_manager.load_holdings()
+    if not success:
+        print(message, file=sys.stderr)
+    success, message = portfolio_manager.load_future_prices()
+    if not success:
+        print(message, file=sys.stderr)
+    return portfolio_manager
+
+
+def fetch_rows(crypto_api):
+    rows = []
+    for coin in crypto_api.registry:
+        if coin.symbol not in crypto_api.current_prices:
+            continue
+        info = crypto_api.market_info[coin.symbol]
+        rows.append({
+            "coin": coin.symbol,
+            "price": crypto_api.current_prices[coin.symbol],
+            "market_cap": info["market_cap"],
+            "24h_vol": info["24h_vol"],
+            "24h_change": info["24h_change"],
+        })
+    return rows
+
+
+def valuation(crypto_api, portfolio_manager):
+    current_prices = crypto_api.get_current_prices()
+    worths = portfolio_manager.current_worths(current_prices).tolist()
+    return {
+        "fetched_at": crypto_api.get_last_fetched().isoformat(),
+        "prices": current_prices,
+        "holdings": portfolio_manager.holdings,
+        "worth": dict(zip(crypto_api.registry.symbols, worths), total=sum(worths)),
+    }
+
+
+def valuation_rows(result):
+    return [{"coin": symbol, "amount": amount, "price": result["prices"].get(symbol, 0.0),
+             "worth": result["worth"][symbol]} for symbol, amount in result["holdings"].items()] + \
+           [{"coin": "total", "amount": "", "price": "", "worth": result["worth"]["total"]}]
+
+
+def scenario_rows(crypto_api, portfolio_manager, query=None):
+    # Every scenario, or "Current" plus the rows a query_scenarios query selects
+    symbols = crypto_api.registry.symbols
+    count = len(symbols)
+    current_prices = crypto_api.get_current_prices()
+    portfolio_manager.calculate_scenarios(current_prices)
+    values = portfolio_manager.get_scenario_row_values(current_prices)
+    indices = range(len(values)) if query is None else [0] + portfolio_manager.query_scenarios(**query).tolist()
+    rows = []
+    for i in indices:
+        worths, prices = values[i, :count + 1].tolist(), values[i, count + 1:].tolist()
+        row = {"scenario": portfolio_manager.scenario_name(i)}
+        row.update({f"price_{symbol}": price for symbol, price in zip(symbols, prices)})
+        row["worth_total"] = worths[0]
+        row.update({f"worth_{symbol}": worth for symbol, worth in zip(symbols, worths[1:])})
+        rows.append(row)
+    return rows
+
+
+def scenario_query(args):
+    # --where/--sort/--descending/--top as query_scenarios arguments, or None
+    if not (args.where or args.sort or args.top is not None):
+        return None
+    where = []
+    for condition in args.where:
+        match = re.fullmatch(r"\s*(\w+)\s*(<=|>=|==|!=|<|>)\s*(\S+)\s*", condition)
+        if not match:
+            raise ValueError(f"Bad condition (expected e.g. total<current): {condition}")
+        column, op, value = match.groups()
+        where.append((column, op, value if value == "current" else float(value)))
+    return {"sort": args.sort, "descending": args.descending, "where": where, "limit": args.top}
+
+
+def risk_rows(summary):
+    rows = [{"measure": f"p{percentile}", "value": value} for percentile, value in summary["percentiles"].items()]
+    for confidence, risk in summary["risk"].items():
+        rows.append({"measure": f"var_{confidence}", "value": risk["var"]})
+        rows.append({"measure": f"cvar_{confidence}", "value": risk["cvar"]})
+    return rows
+
+
+def portfolio_rows(summary):
+    rows = []
+    for i, name in enumerate(summary["names"]):
+        row = {"portfolio": name, "current_total": float(summary["current_total"][i])}
+        if "mean_total" in summary:
+            row["mean_total"] = float(summary["mean_total"][i])
+            row.update({f"p{percentile}": float(values[i]) for percentile, values in summary["percentiles"].items()})
+            for confidence, risk in summary["risk"].items():
+                row[f"var_{confidence}"] = float(risk["var"][i])
+                row[f"cvar_{confidence}"] = float(risk["cvar"][i])
+        rows.append(row)
+    return rows
+
+
+def source_rows(stats):
+    return [dict(source=name, **values) for name, values in stats.items()]
+
+
+def write_output(args, data, rows):
+    if args.format == "csv":
+        if rows:
+            writer = csv.DictWriter(sys.stdout, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        json.dump(data, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+
+def write_metrics(args):
+    # Timings and counters recorded so far, to --metrics ("-" for stderr)
+    if args.metrics_format == "json":
+        text = instrumentation.to_json() + "\n"
+    else:
+        text = instrumentation.to_prometheus()
+    if args.metrics == "-":
+        sys.stderr.write(text)
+    else:
+        atomic_write(args.metrics, lambda f: f.write(text))
+
+
+def cmd_fetch(args, registry):
+    crypto_api = build_api(args, registry)
+    crypto_api.fetch_prices()
+    rows = fetch_rows(crypto_api)
+    write_output(args, {"fetched_at": crypto_api.get_last_fetched().isoformat(), "coins": rows}, rows)
+
+
+def cmd_value(args, registry):
+    crypto_api = build_api(args, registry)
+    portfolio_manager = load_portfolio(args, registry)
+    crypto_api.fetch_prices()
+    result = valuation(crypto_api, portfolio_manager)
+    write_output(args, result, valuation_rows(result))
+
+
+def cmd_scenarios(args, registry):
+    crypto_api = build_api(args, registry)
+    portfolio_manager = load_portfolio(args, registry)
+    query = scenario_query(args)
+    crypto_api.fetch_prices()
+    rows = scenario_rows(crypto_api, portfolio_manager, query)
+    write_output(args, rows, rows)
+
+
+def cmd_simulate(args, registry):
+    crypto_api = build_api(args, registry)
+    portfolio_manager = load_portfolio(args, registry)
+    crypto_api.fetch_prices()
+    current_prices = crypto_api.get_current_prices()
+
+    # Saved scenarios are replaced by the generated set
+    portfolio_manager.future_prices = []
+    portfolio_manager.generate_scenarios(current_prices, args.count, price_history(args), args.model, args.horizon,
+                                         args.seed, args.workers)
+    portfolio_manager.calculate_scenarios(current_prices)
+    summary = portfolio_manager.risk_summary(tuple(args.confidence or MONTE_CARLO_CONFIDENCES))
+    if args.save:
+        success, message = portfolio_manager.save_future_prices()
+        if not success:
+            raise RuntimeError(message)
+    write_output(args, dict(summary, model=args.model, horizon_days=args.horizon, seed=args.seed), risk_rows(summary))
+
+
+def cmd_portfolios(args, registry):
+    # Values every portfolio in a directory at current prices and, if there are
+    # saved scenarios, reports each one's risk across all of them
+    from portfolio_collection import PortfolioCollection
+    from portfolio_manager import PortfolioManager
+
+    collection = PortfolioCollection(registry, args.directory)
+    if not collection.scan():
+        raise RuntimeError(f"No portfolio files found in {args.directory}")
+    crypto_api = build_api(args, registry)
+    crypto_api.fetch_prices()
+    current_prices = crypto_api.get_current_prices()
+
+    scenarios = PortfolioManager(registry, args.holdings, args.scenarios, open_store(args), args.portfolio)
+    success, message = scenarios.load_future_prices()
+    if not success:
+        print(message, file=sys.stderr)
+    if len(scenarios.future_prices):
+        summary = collection.risk_summary(scenarios.future_prices, current_prices,
+                                          tuple(args.confidence or MONTE_CARLO_CONFIDENCES))
+    else:
+        summary = {"names": collection.names, "current_total": collection.current_totals(current_prices)}
+    rows = portfolio_rows(summary)
+    write_output(args, {"fetched_at": crypto_api.get_last_fetched().isoformat(),
+                        "scenario_count": len(scenarios.future_prices), "portfolios": rows}, rows)
+
+
+def progress_reporter(args):
+    if not args.progress:
+        return None
+
+    def report(done, total):
+        sys.stderr.write(f"\r{100 * done / total if total else 100:.0f}%")
+        sys.stderr.flush()
+    return report
+
+
+def cmd_import(args, registry):
+    portfolio_manager = load_portfolio(args, registry)
+    if args.kind == "scenarios":
+        portfolio_manager.import_future_prices(args.path, progress_reporter(args))
+        success, message = portfolio_manager.save_future_prices()
+    else:
+        success, message = portfolio_manager.import_holdings(args.path)
+        if success:
+            success = portfolio_manager.flush()
+            message = message if success else f"Failed to save holdings: {portfolio_manager.holdings_writer.last_error}"
+    if args.progress:
+        sys.stderr.write("\n")
+    if not success:
+        raise RuntimeError(message)
+
+
+def cmd_export(args, registry):
+    portfolio_manager = load_portfolio(args, registry)
+    if args.kind == "scenarios":
+        portfolio_manager.export_future_prices(args.path, progress_reporter(args))
+        if args.progress:
+            sys.stderr.write("\n")
+    else:
+        portfolio_manager.export_holdings(args.path)
+
+
+def cmd_sources(args, registry):
+    # Polls every configured source for a few rounds and reports how each fared
+    crypto_api = build_api(args, registry)
+    failures = 0
+    for round_number in range(args.rounds):
+        if round_number:
+            time.sleep(args.pause)
+        try:
+            crypto_api.fetch_prices()
+        except Exception as e:
+            failures += 1
+            print(f"round {round_number + 1} failed: {e}", file=sys.stderr)
+    stats = crypto_api.source_stats()
+    if stats is None:
+        raise RuntimeError("Only one price source is configured; pass --sources with two or more")
+    write_output(args, {"rounds": args.rounds, "failed_rounds": failures, "sources": stats}, source_rows(stats))
+
+
+def cmd_daemon(args, registry):
+    from refresh_scheduler import RefreshScheduler
+
+    crypto_api = build_api(args, registry)
+    portfolio_manager = load_portfolio(args, registry)
+    scheduler = RefreshScheduler(interval=args.interval)
+
+    while True:
+        try:
+            crypto_api.fetch_prices()
+            # Pick up holdings edited by a GUI or another process since the last round
+            portfolio_manager.load_holdings()
+            result = valuation(crypto_api, portfolio_manager)
+            if args.output:
+                atomic_write_json(args.output, result)
+            else:
+                sys.stdout.write(json.dumps(result) + "\n")
+                sys.stdout.flush()
+            delay = scheduler.on_success()
+        except Exception as e:
+            delay = scheduler.on_failure(e)
+            print(f"{datetime.datetime.now().isoformat()} refresh failed: {e}; retrying in {delay:.0f}s",
+                  file=sys.stderr)
+        if args.metrics:
+            # Rewritten every round, e.g. for the node exporter's textfile collector
+            write_metrics(args)
+        time.sleep(delay)
+
+
+def build_parser():
+    # Shared options are accepted after the command name, e.g. `scenarios --format csv`
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--coins", default=COINS_FILE_PATH, help="coin registry file")
+    common.add_argument("--holdings", default=HOLDINGS_FILE_PATH, help="holdings JSON file")
+    common.add_argument("--scenarios", default=SCENARIOS_FILE_PATH,
+                        help="scenarios file (binary, or JSON if it ends in .json)")
+    common.add_argument("--format", choices=("json", "csv"), default="json")
+    common.add_argument("--no-cache", action="store_true", help="always go to the network")
+    common.add_argument("--no-history", action="store_true", help="don't append fetches to the price history")
+    common.add_argument("--db", help="SQLite database for holdings, scenarios and price history, instead of files")
+    common.add_argument("--portfolio", default="default", help="portfolio name within --db")
+    common.add_argument("--sources", default=",".join(PRICE_SOURCES),
+                        help=f"comma-separated price sources to query concurrently ({', '.join(SOURCE_TYPES)})")
+    common.add_argument("--aggregate", choices=("median", "first"), default=PRICE_AGGREGATION,
+                        help="how to combine several sources: median price, or first good answer")
+    common.add_argument("--source-timeout", type=float, default=PRICE_SOURCE_TIMEOUT_S,
+                        help="seconds to wait for slower sources")
+    common.add_argument("--metrics", help="record timings and write them here when the command ends "
+                                          "(every round for daemon); - for stderr")
+    common.add_argument("--metrics-format", choices=("prometheus", "json"), default="prometheus")
+    common.add_argument("--profile", help="profile the command and save the result here")
+    common.add_argument("--profile-mode", choices=instrumentation.ProfileCapture.MODES, default="cprofile",
+                        help="cprofile writes a .prof file; sampling writes collapsed stacks for flamegraph.pl")
+
+    parser = argparse.ArgumentParser(prog="cryptoportfolio", description="Headless crypto portfolio valuation")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("fetch", parents=[common], help="fetch current prices and market info").set_defaults(
+        handler=cmd_fetch)
+    subparsers.add_parser("value", parents=[common], help="value current holdings").set_defaults(
+        handler=cmd_value)
+    scenarios = subparsers.add_parser("scenarios", parents=[common],
+                                      help="value holdings under every saved scenario, or those a query selects")
+    scenarios.add_argument("--where", action="append", default=[],
+                           help="keep scenarios where COLUMN OP VALUE, e.g. total<current or btc>=5000 "
+                                "(COLUMN is total or a coin symbol; repeat to combine)")
+    scenarios.add_argument("--sort", help="order by this worth column (total or a coin symbol)")
+    scenarios.add_argument("--descending", action="store_true")
+    scenarios.add_argument("--top", type=int, help="only the first N matching scenarios")
+    scenarios.set_defaults(handler=cmd_scenarios)
+
+    simulate = subparsers.add_parser("simulate", parents=[common],
+                                     help="generate Monte Carlo scenarios from the price history and report risk")
+    simulate.add_argument("--count", type=int, default=10000, help="number of scenarios")
+    simulate.add_argument("--model", choices=("gbm", "bootstrap"), default="gbm")
+    simulate.add_argument("--horizon", type=float, default=MONTE_CARLO_HORIZON_DAYS, help="days ahead")
+    simulate.add_argument("--seed", type=int, help="seed for reproducible scenarios")
+    simulate.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    simulate.add_argument("--confidence", type=float, action="append",
+                          help="VaR/CVaR confidence level, repeatable (default: 0.95 and 0.99)")
+    simulate.add_argument("--save", action="store_true", help="replace the scenarios file with the generated set")
+    simulate.set_defaults(handler=cmd_simulate)
+
+    portfolios = subparsers.add_parser("portfolios", parents=[common],
+                                       help="value every portfolio in a directory, with risk across saved scenarios")
+    portfolios.add_argument("--directory", default=PORTFOLIOS_DIR, help="one holdings file per portfolio")
+    portfolios.add_argument("--confidence", type=float, action="append",
+                            help="VaR/CVaR confidence level, repeatable (default: 0.95 and 0.99)")
+    portfolios.set_defaults(handler=cmd_portfolios)
+
+    for name, handler, verb in (("import", cmd_import, "read"), ("export", cmd_export, "write")):
+        command = subparsers.add_parser(name, parents=[common],
+                                        help=f"{verb} scenarios or holdings as .json, .ndjson or .csv")
+        command.add_argument("kind", choices=("scenarios", "holdings"))
+        command.add_argument("path", help="file to " + verb + "; the format follows the extension")
+        command.add_argument("--progress", action="store_true", help="report progress on stderr")
+        command.set_defaults(handler=handler)
+
+    sources = subparsers.add_parser("sources", parents=[common],
+                                    help="poll the configured price sources and report latency and error rates")
+    sources.add_argument("--rounds", type=int, default=5)
+    sources.add_argument("--pause", type=float, default=1.0, help="seconds between rounds")
+    sources.set_defaults(handler=cmd_sources)
+
+    daemon = subparsers.add_parser("daemon", parents=[common],
+                                   help="refresh prices and write valuations on a schedule")
+    daemon.add_argument("--interval", type=float, default=AUTO_REFRESH_INTERVAL_S, help="seconds between refreshes")
+    daemon.add_argument("--output", help="write each valuation atomically to this file instead of stdout")
+    daemon.set_defaults(handler=cmd_daemon)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    registry = CoinRegistry.load(args.coins)
+    if args.metrics:
+        instrumentation.enable()
+    profile = instrumentation.ProfileCapture(args.profile_mode) if args.profile else None
+    if profile is not None:
+        profile.start()
+    try:
+        args.handler(args, registry)
+    except KeyboardInterrupt:
+        return 130
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if profile is not None:
+            profile.stop()
+            profile.save(args.profile)
+        if args.metrics:
+            write_metrics(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
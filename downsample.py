@@ -0,0 +1,21 @@
+import numpy as np
+
+
+def minmax_indices(values, buckets):
+    # Indices of a decimated series that keeps, for each of `buckets` equal
+    # slices, the minimum and maximum sample (plus the first and last point),
+    # so spikes survive decimation. Sized to the canvas pixel width, the line
+    # drawn from these points is visually identical to the full series.
+    count = len(values)
+    if count <= 2 * buckets:
+        return np.arange(count)
+
+    size = -(-count // buckets)  # ceil
+    full = (count // size) * size
+    blocks = values[:full].reshape(-1, size)
+    offsets = np.arange(0, full, size)
+    parts = [[0], offsets + blocks.argmin(axis=1), offsets + blocks.argmax(axis=1), [count - 1]]
+    if full < count:
+        tail = values[full:]
+        parts.append([full + tail.argmin(), full + tail.argmax()])
+    return np.unique(np.concatenate(parts))
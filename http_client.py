@@ -0,0 +1,143 @@
+import datetime
+import email.utils
+import gzip
+import http.client
+import ssl
+import threading
+import urllib.parse
+
+from constants_pyside6 import HTTP_TIMEOUT_S, HTTP_POOL_SIZE
+
+# Errors that mean a pooled keep-alive connection was closed by the server
+# while idle; the request is retried once on a fresh connection.
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                           BrokenPipeError, ConnectionResetError, ConnectionAbortedError)
+
+
+class HTTPStatusError(Exception):
+    def __init__(self, status, reason, headers):
+        super().__init__(f"HTTP Error {status}: {reason}")
+        self.status = status
+        self.headers = headers
+
+
+class RateLimitError(Exception):
+    def __init__(self, retry_after=None):
+        message = "Rate limited by price API"
+        if retry_after is not None:
+            message += f", retry after {retry_after:.0f}s"
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value):
+    # Retry-After is either delta-seconds or an HTTP-date
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+class HttpResponse:
+    def __init__(self, status, reason, headers, body):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+
+
+class HttpClient:
+    # Keeps idle keep-alive connections per (scheme, host, port) and reuses
+    # them across requests, so polling pays the TCP + TLS handshake once.
+    # Certificates are verified with the system trust store. Thread-safe.
+    def __init__(self, timeout=HTTP_TIMEOUT_S, context=None, pool_size=HTTP_POOL_SIZE):
+        self.timeout = timeout
+        self.context = context if context is not None else ssl.create_default_context()
+        self.pool_size = pool_size
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, headers=None):
+        # Returns an HttpResponse for 2xx/3xx; raises HTTPStatusError for 4xx/5xx
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        request_headers = {"Accept-Encoding": "gzip", "Connection": "keep-alive"}
+        request_headers.update(headers or {})
+
+        connection, reused = self._acquire(key)
+        try:
+            response = self._send(connection, path, request_headers)
+        except STALE_CONNECTION_ERRORS:
+            connection.close()
+            if not reused:
+                raise
+            connection, reused = self._new_connection(key), False
+            response = self._send(connection, path, request_headers)
+        except Exception:
+            connection.close()
+            raise
+
+        try:
+            body = response.read()
+        except Exception:
+            connection.close()
+            raise
+
+        if response.will_close:
+            connection.close()
+        else:
+            self._release(key, connection)
+
+        if response.getheader("Content-Encoding", "").lower() == "gzip":
+            body = gzip.decompress(body)
+
+        if response.status >= 400:
+            raise HTTPStatusError(response.status, response.reason, response.headers)
+        return HttpResponse(response.status, response.reason, response.headers, body)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    def _send(self, connection, path, headers):
+        connection.request("GET", path, headers=headers)
+        return connection.getresponse()
+
+    def _acquire(self, key):
+        with self._lock:
+            connections = self._idle.get(key)
+            if connections:
+                return connections.pop(), True
+        return self._new_connection(key), False
+
+    def _release(self, key, connection):
+        with self._lock:
+            connections = self._idle.setdefault(key, [])
+            if len(connections) < self.pool_size:
+                connections.append(connection)
+                return
+        connection.close()
+
+    def _new_connection(self, key):
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout, context=self.context)
+        if scheme == "http":
+            return http.client.HTTPConnection(host, port, timeout=self.timeout)
+        raise ValueError(f"Unsupported URL scheme: {scheme}")
@@ -0,0 +1,323 @@
+# Timers, counters and histograms for the hot paths: price fetches and JSON
+# parsing, scenario valuation and queries, persistence, and the list and
+# chart updates of both UIs. Recording is off by default (INSTRUMENTATION_ENABLED);
+# every probe then costs a global lookup and a branch, and timer() hands back
+# one shared no-op context, so the probes stay in the code for normal use.
+# enable() turns recording on: the GUIs' debug panel does so when opened, the
+# CLI with --metrics.
+#
+# Timings land in fixed-bucket histograms (Prometheus style), so recording
+# is O(1) and memory stays constant however long the app runs. snapshot()
+# returns everything as a dict; to_json() and to_prometheus() serialise it.
+#
+# ProfileCapture is the heavier, opt-in tool for a window the user chooses:
+# cProfile on the calling thread, or a sampler that reads every thread's
+# stack at a fixed interval.
+import bisect
+import collections
+import functools
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from constants_pyside6 import (INSTRUMENTATION_ENABLED, INSTRUMENTATION_BUCKETS_S, METRICS_PREFIX,
+                               PROFILE_SAMPLE_INTERVAL_S, PROFILE_REPORT_LINES)
+
+enabled = INSTRUMENTATION_ENABLED
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+
+class Histogram:
+    def __init__(self, bounds=INSTRUMENTATION_BUCKETS_S):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.last = 0.0
+
+    def observe(self, value):
+        # Buckets are "less than or equal to" their bound, as in Prometheus
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.last = value
+
+    def quantile(self, q):
+        # Interpolated linearly within the bucket holding the q-th observation,
+        # and kept within the observed range
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, bucket in enumerate(self.buckets):
+            if bucket and seen + bucket >= target:
+                low = self.bounds[i - 1] if i > 0 else 0.0
+                high = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(self.max, max(self.min, low + (high - low) * (target - seen) / bucket))
+            seen += bucket
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total_s": self.sum,
+            "mean_s": self.sum / self.count if self.count else None,
+            "p50_s": self.quantile(0.5),
+            "p95_s": self.quantile(0.95),
+            "max_s": self.max,
+            "last_s": self.last,
+        }
+
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def count(name, amount=1):
+    if enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + amount
+
+
+def observe(name, seconds):
+    if enabled:
+        with _lock:
+            histogram = _histograms.get(name)
+            if histogram is None:
+                histogram = _histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        observe(self.name, time.perf_counter() - self.start)
+        if exc_type is not None:
+            count(self.name + ".errors")
+        return False
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name):
+    # with instrumentation.timer("scenarios.calculate"): ...
+    # Failures are timed too, and counted as "<name>.errors".
+    return _Timer(name) if enabled else _NULL_TIMER
+
+
+def timed(name):
+    # Decorator form of timer(); checks `enabled` on every call
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            with _Timer(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def snapshot():
+    with _lock:
+        return {
+            "enabled": enabled,
+            "counters": dict(sorted(_counters.items())),
+            "timers": {name: histogram.as_dict() for name, histogram in sorted(_histograms.items())},
+        }
+
+
+def to_json(extra=None):
+    # extra: more sections to include, e.g. {"sources": CryptoAPI.source_stats()}
+    data = snapshot()
+    data.update(extra or {})
+    return json.dumps(data, indent=2)
+
+
+def to_prometheus(prefix=METRICS_PREFIX):
+    # Text exposition format: counters as <name>_total, timers as
+    # <name>_seconds histograms
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = [(name, histogram.bounds, list(histogram.buckets), histogram.count, histogram.sum)
+                      for name, histogram in sorted(_histograms.items())]
+    lines = []
+    for name, value in counters:
+        metric = _metric_name(prefix, name) + "_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+    for name, bounds, buckets, total, seconds in histograms:
+        metric = _metric_name(prefix, name) + "_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, bucket in zip(bounds, buckets):
+            cumulative += bucket
+            lines.append(f'{metric}_bucket{{le="{bound:g}"}} {cumulative}')
+        lines += [f'{metric}_bucket{{le="+Inf"}} {total}', f"{metric}_sum {seconds!r}", f"{metric}_count {total}"]
+    return "\n".join(lines) + "\n"
+
+
+def _metric_name(prefix, name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", f"{prefix}_{name}")
+
+
+def format_table(sources=None):
+    # Plain-text summary for the debug panels; sources is CryptoAPI.source_stats()
+    data = snapshot()
+    lines = [f"{'timer':<28} {'count':>7} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+    for name, stats in data["timers"].items():
+        values = [stats[key] for key in ("mean_s", "p50_s", "p95_s", "max_s")]
+        lines.append(f"{name:<28} {stats['count']:>7} " +
+                     " ".join(f"{1000 * value:>9.2f}" if value is not None else f"{'-':>9}" for value in values))
+    if data["counters"]:
+        lines += ["", f"{'counter':<28} {'value':>7}"]
+        lines += [f"{name:<28} {value:>7}" for name, value in data["counters"].items()]
+    if not data["timers"] and not data["counters"]:
+        lines.append("(nothing recorded yet)" if enabled else "(recording is off)")
+    if sources:
+        lines += ["", f"{'price source':<28} {'calls':>7} {'errors':>9} {'p50 ms':>9} {'p95 ms':>9} {'timeouts':>9}"]
+        for name, stats in sources.items():
+            latencies = [stats[key] for key in ("latency_p50_s", "latency_p95_s")]
+            lines.append(f"{name:<28} {stats['requests']:>7} {stats['error_rate']:>9.1%} " +
+                         " ".join(f"{1000 * value:>9.2f}" if value is not None else f"{'-':>9}" for value in latencies) +
+                         f" {stats['timeouts']:>9}")
+    return "\n".join(lines)
+
+
+class ProfileCapture:
+    # An opt-in profile of a window the user starts and stops.
+    #   "cprofile": every call on the thread that called start() (the GUI
+    #               thread in the apps); exact counts, but it slows that thread.
+    #   "sampling": a background thread records every other thread's stack each
+    #               `interval`; cheap enough to leave on while reproducing a
+    #               stall, and it sees the worker threads too.
+    MODES = ("sampling", "cprofile")
+    # Innermost frames of threads parked waiting for work, left out of samples
+    IDLE_FRAMES = {"threading.py:wait", "threading.py:_wait_for_tstate_lock", "selectors.py:select",
+                   "queue.py:get"}
+
+    def __init__(self, mode="sampling", interval=PROFILE_SAMPLE_INTERVAL_S):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.mode = mode
+        self.interval = interval
+        self.running = False
+        self.started_at = None
+        self.elapsed = 0.0
+        self._profile = None
+        self._stacks = collections.Counter()  # (outermost, ..., innermost) frame labels -> samples
+        self.idle_samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.started_at = time.perf_counter()
+        if self.mode == "cprofile":
+            import cProfile  # only profiling sessions pay for the import
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._stacks.clear()
+            self.idle_samples = 0
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        # Returns the report text
+        if self.running:
+            self.running = False
+            self.elapsed = time.perf_counter() - self.started_at
+            if self.mode == "cprofile":
+                self._profile.disable()
+            else:
+                self._stop.set()
+                self._thread.join()
+        return self.report()
+
+    def report(self, lines=PROFILE_REPORT_LINES):
+        if self.mode == "cprofile":
+            if self._profile is None:
+                return ""
+            import pstats
+            out = io.StringIO()
+            pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(lines)
+            return out.getvalue()
+
+        samples = sum(self._stacks.values())
+        if not samples:
+            return "No samples recorded."
+        own = collections.Counter()
+        inclusive = collections.Counter()
+        for stack, hits in self._stacks.items():
+            own[stack[-1]] += hits
+            for label in set(stack):
+                inclusive[label] += hits
+        text = [f"{samples} samples over {self.elapsed:.2f}s every {1000 * self.interval:g} ms "
+                f"({self.idle_samples} of idle threads left out)", "",
+                f"{'own %':>7} {'total %':>8}  function"]
+        for label, hits in own.most_common(lines):
+            text.append(f"{100 * hits / samples:>7.1f} {100 * inclusive[label] / samples:>8.1f}  {label}")
+        return "\n".join(text)
+
+    def save(self, path):
+        # cProfile: a .prof file for pstats/snakeviz. Sampling: collapsed
+        # stacks ("a;b;c count" per line), the input of flamegraph.pl.
+        if self.mode == "cprofile":
+            self._profile.dump_stats(path)
+            return
+        with open(path, "w") as f:
+            for stack, hits in self._stacks.most_common():
+                f.write(f"{';'.join(stack)} {hits}\n")
+
+    def _sample(self):
+        own_thread = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if stack[0] in self.IDLE_FRAMES:
+                    self.idle_samples += 1
+                else:
+                    self._stacks[tuple(reversed(stack))] += 1
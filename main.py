@@ -2,9 +2,17 @@ import tkinter as tk
 from tkinter import messagebox, ttk
 
 from constants import *
+from coin_registry import CoinRegistry
+import instrumentation
 from crypto_api import CryptoAPI
 from portfolio_manager import PortfolioManager
-from ui_components import PlotManager, DragDropListbox, UIStyleManager
+from price_history import PriceHistoryStore
+from price_sources import StreamingPriceSource
+from response_cache import ResponseCache
+from sqlite_store import SQLiteStore
+from refresh_scheduler import RefreshScheduler
+from ui_components import (PlotManager, DragDropListbox, UIStyleManager, PriceFetchWorker, PriceStreamWorker,
+                           VirtualListbox, DebugPanel, prewarm_matplotlib)
 
 
 class CryptoPortfolioApp(tk.Tk):
@@ -14,8 +22,20 @@ class CryptoPortfolioApp(tk.Tk):
         self.geometry(WINDOW_GEOMETRY)
 
         # Initialize components
-        self.crypto_api = CryptoAPI()
-        self.portfolio_manager = PortfolioManager()
+        self.coin_registry = CoinRegistry.load()
+        self.store = SQLiteStore(DATABASE_PATH) if DATABASE_PATH else None
+        # With a database it also keeps the price history
+        self.price_history = self.store if self.store is not None else PriceHistoryStore()
+        stream = StreamingPriceSource(PRICE_STREAM_URL, self.coin_registry) if PRICE_STREAM_URL else None
+        self.crypto_api = CryptoAPI(self.coin_registry, self.price_history, ResponseCache(), stream=stream)
+        self.portfolio_manager = PortfolioManager(self.coin_registry, store=self.store)
+        self.fetch_worker = PriceFetchWorker(self, self.crypto_api, self.on_prices_fetched, self.on_fetch_failed)
+        self.refresh_scheduler = RefreshScheduler()
+        self.refresh_job = None
+        # While the live feed delivers ticks, REST polling is suspended
+        self.stream_worker = PriceStreamWorker(self, self.crypto_api, self.on_stream_update, self.on_stream_failed)
+        self.streaming = False
+        self.fetch_notify = None  # "auto" or "manual" when a fetch result should be reported to the user
         
         # ttk Style
         self.style = ttk.Style(self)
@@ -36,16 +56,36 @@ class CryptoPortfolioApp(tk.Tk):
         # Update scroll region when inner frame changes size
         self.inner_frame.bind("<Configure>", self.on_frame_configure)
 
-
-        # Variables for owned amounts
-        self.btc_owned_var = tk.StringVar(value=DEFAULT_ENTRY_VALUE)
-        self.eth_owned_var = tk.StringVar(value=DEFAULT_ENTRY_VALUE)
-        self.xrp_owned_var = tk.StringVar(value=DEFAULT_ENTRY_VALUE)
-
-        # Variables for future prices
-        self.future_btc_price_var = tk.StringVar(value=DEFAULT_ENTRY_VALUE)
-        self.future_eth_price_var = tk.StringVar(value=DEFAULT_ENTRY_VALUE)
-        self.future_xrp_price_var = tk.StringVar(value=DEFAULT_ENTRY_VALUE)
+        # Pause auto-refresh while minimized
+        self.bind("<Unmap>", self.on_unmap)
+        self.bind("<Map>", self.on_map)
+
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Timings and profiling
+        self.debug_panel = None
+        self.bind("<F12>", lambda event: self.show_debug_panel())
+
+
+        # Variables for owned amounts and future prices, one per tracked coin
+        self.owned_vars = {symbol: tk.StringVar(value=DEFAULT_ENTRY_VALUE) for symbol in self.coin_registry.symbols}
+        self.future_price_vars = {symbol: tk.StringVar(value=DEFAULT_ENTRY_VALUE)
+                                  for symbol in self.coin_registry.symbols}
+        # Scenario sort: "Total worth" or "<SYMBOL> price"
+        self.sort_keys = {"Total worth": "worth"}
+        self.sort_keys.update((f"{symbol.upper()} price", symbol) for symbol in self.coin_registry.symbols)
+        self.sort_key_var = tk.StringVar(value="Total worth")
+        self.sort_descending_var = tk.BooleanVar(value=False)
+        # Scenario query: one column for the threshold filter and the sort
+        self.query_columns = {"Total worth": "total"}
+        self.query_columns.update((f"{symbol.upper()} worth", symbol) for symbol in self.coin_registry.symbols)
+        self.query_column_var = tk.StringVar(value="Total worth")
+        self.query_operator_var = tk.StringVar(value="any")
+        self.query_value_var = tk.StringVar()
+        self.query_order_var = tk.StringVar(value="List order")
+        self.query_limit_var = tk.StringVar(value="0")
+        self.scenario_query = None  # query_scenarios arguments while the list shows a query
+        self.query_rows = None
 
         # Frames for layout
         self.left_frame = ttk.Frame(self.inner_frame)
@@ -55,8 +95,9 @@ class CryptoPortfolioApp(tk.Tk):
         self.current_worth_label = ttk.Label(self.left_frame, text="Current Worth: Not fetched yet")
         self.market_info_text = tk.Text(self.left_frame, height=TEXT_WIDGET_HEIGHT, width=TEXT_WIDGET_WIDTH, bg='white',
                                         fg=COLOR_TEXT_DARK)
-        self.scenarios_listbox = tk.Listbox(self.left_frame, height=LISTBOX_HEIGHT, width=LISTBOX_WIDTH, bg='white',
-                                            fg=COLOR_TEXT_DARK)  # Increased width
+        self.scenarios_view = VirtualListbox(self.left_frame, self.format_scenario_row, height=LISTBOX_HEIGHT,
+                                             width=LISTBOX_WIDTH, bg='white', fg=COLOR_TEXT_DARK)  # Increased width
+        self.scenarios_listbox = self.scenarios_view.listbox
 
         # Last fetched label
         self.last_fetched_label = ttk.Label(self.left_frame, text=LAST_FETCHED_DEFAULT)
@@ -71,7 +112,24 @@ class CryptoPortfolioApp(tk.Tk):
         self.create_widgets()
         self.portfolio_manager.load_future_prices()
         self.load_holdings()
+        self.load_cached_prices()
         self.auto_fetch_prices()
+        self.stream_worker.start()
+
+        # Load matplotlib in the background once the window has painted
+        self.after(MATPLOTLIB_PREWARM_DELAY_MS, prewarm_matplotlib)
+
+    def show_debug_panel(self):
+        if self.debug_panel is None or not self.debug_panel.winfo_exists():
+            self.debug_panel = DebugPanel(self, self.crypto_api.source_stats)
+        self.debug_panel.lift()
+
+    def on_close(self):
+        if self.debug_panel is not None and self.debug_panel.winfo_exists():
+            self.debug_panel.close()
+        self.stream_worker.stop()
+        self.portfolio_manager.flush()
+        self.destroy()
 
     def on_frame_configure(self, event):
         self.canvas.configure(scrollregion=self.canvas.bbox("all"))
@@ -81,15 +139,7 @@ class CryptoPortfolioApp(tk.Tk):
         # Holdings section
         ttk.Label(self.left_frame, text="Owned Amounts:", style='Heading.TLabel').grid(row=row, column=0, sticky="w")
         row += 1
-        ttk.Label(self.left_frame, text="BTC:").grid(row=row, column=0)
-        ttk.Entry(self.left_frame, textvariable=self.btc_owned_var).grid(row=row, column=1)
-        row += 1
-        ttk.Label(self.left_frame, text="ETH:").grid(row=row, column=0)
-        ttk.Entry(self.left_frame, textvariable=self.eth_owned_var).grid(row=row, column=1)
-        row += 1
-        ttk.Label(self.left_frame, text="XRP:").grid(row=row, column=0)
-        ttk.Entry(self.left_frame, textvariable=self.xrp_owned_var).grid(row=row, column=1)
-        row += 1
+        row = self.create_coin_entries(row, self.owned_vars)
 
         ttk.Button(self.left_frame, text="Save Holdings", command=self.save_holdings).grid(row=row, column=0)
         ttk.Button(self.left_frame, text="Load Holdings", command=self.load_holdings).grid(row=row, column=1)
@@ -114,15 +164,7 @@ class CryptoPortfolioApp(tk.Tk):
         ttk.Label(self.left_frame, text="Future Scenario Prices:", style='Heading.TLabel').grid(row=row, column=0,
                                                                                                 sticky="w")
         row += 1
-        ttk.Label(self.left_frame, text="BTC:").grid(row=row, column=0)
-        ttk.Entry(self.left_frame, textvariable=self.future_btc_price_var).grid(row=row, column=1)
-        row += 1
-        ttk.Label(self.left_frame, text="ETH:").grid(row=row, column=0)
-        ttk.Entry(self.left_frame, textvariable=self.future_eth_price_var).grid(row=row, column=1)
-        row += 1
-        ttk.Label(self.left_frame, text="XRP:").grid(row=row, column=0)
-        ttk.Entry(self.left_frame, textvariable=self.future_xrp_price_var).grid(row=row, column=1)
-        row += 1
+        row = self.create_coin_entries(row, self.future_price_vars)
 
         ttk.Button(self.left_frame, text="Add Future Scenario", command=self.add_scenario).grid(row=row, column=0,
                                                                                                 columnspan=1)
@@ -133,8 +175,31 @@ class CryptoPortfolioApp(tk.Tk):
         # Scenarios list
         ttk.Label(self.left_frame, text="Scenarios:", style='Heading.TLabel').grid(row=row, column=0, sticky="w")
         row += 1
-        self.scenarios_listbox.grid(row=row, column=0, columnspan=3)
-        self.dnd_listbox = DragDropListbox(self.scenarios_listbox, self.reorder_scenarios)
+        self.scenarios_view.grid(row=row, column=0, columnspan=3)
+        self.dnd_listbox = DragDropListbox(self.scenarios_listbox, self.reorder_scenarios,
+                                           lambda: self.scenarios_view.first_row)
+        row += 1
+        ttk.Combobox(self.left_frame, textvariable=self.sort_key_var, values=list(self.sort_keys),
+                     state="readonly").grid(row=row, column=0)
+        ttk.Checkbutton(self.left_frame, text="Descending", variable=self.sort_descending_var).grid(row=row, column=1)
+        ttk.Button(self.left_frame, text="Sort Scenarios", command=self.sort_scenarios).grid(row=row, column=2)
+        row += 1
+
+        # Find scenarios: filter by a threshold (empty = current worth), order, top k (0 = all)
+        ttk.Combobox(self.left_frame, textvariable=self.query_column_var, values=list(self.query_columns),
+                     state="readonly").grid(row=row, column=0)
+        ttk.Combobox(self.left_frame, textvariable=self.query_operator_var, values=["any", "<", "<=", ">", ">="],
+                     state="readonly", width=5).grid(row=row, column=1)
+        ttk.Entry(self.left_frame, textvariable=self.query_value_var).grid(row=row, column=2)
+        row += 1
+        ttk.Combobox(self.left_frame, textvariable=self.query_order_var,
+                     values=["List order", "Ascending", "Descending"], state="readonly").grid(row=row, column=0)
+        ttk.Spinbox(self.left_frame, textvariable=self.query_limit_var, from_=0, to=10 ** 9,
+                    width=10).grid(row=row, column=1)
+        query_buttons = ttk.Frame(self.left_frame)
+        ttk.Button(query_buttons, text="Find", command=self.apply_scenario_query).pack(side="left")
+        ttk.Button(query_buttons, text="Show All", command=self.clear_scenario_query).pack(side="left")
+        query_buttons.grid(row=row, column=2)
         row += 1
 
         # Plot buttons
@@ -148,17 +213,75 @@ class CryptoPortfolioApp(tk.Tk):
         # Graph display label in plot_frame
         ttk.Label(self.plot_frame, text="Graph Display Area:", style='Heading.TLabel').pack()
 
+    def create_coin_entries(self, row, variables):
+        for symbol, var in variables.items():
+            ttk.Label(self.left_frame, text=f"{symbol.upper()}:").grid(row=row, column=0)
+            ttk.Entry(self.left_frame, textvariable=var).grid(row=row, column=1)
+            row += 1
+        return row
+
+    @staticmethod
+    def get_var_values(variables):
+        return {symbol: var.get() for symbol, var in variables.items()}
+
     def reorder_scenarios(self, from_index, to_index):
+        # Query results can't be rearranged
+        if self.scenario_query is not None:
+            return
+        # Only the order changes: redraw the list window and replot, nothing is revalued
         if self.portfolio_manager.reorder_future_prices(from_index, to_index):
-            self.recalculate_scenarios()
+            self.scenarios_view.move_row(from_index, to_index)
+            self.replot_scenarios()
+
+    def sort_scenarios(self):
+        key = self.sort_keys[self.sort_key_var.get()]
+        if key == "worth" and not self.crypto_api.get_current_prices():
+            messagebox.showerror("Error", "Fetch current prices first.")
+            return
+        if self.portfolio_manager.sort_future_prices(key, self.sort_descending_var.get()):
+            self.update_scenarios_listbox()
+            self.replot_scenarios()
+
+    def apply_scenario_query(self):
+        column = self.query_columns[self.query_column_var.get()]
+        query = {}
+        try:
+            if self.query_operator_var.get() != "any":
+                value = self.query_value_var.get().strip()
+                query["where"] = [(column, self.query_operator_var.get(), float(value) if value else "current")]
+            limit = int(self.query_limit_var.get() or 0)
+        except ValueError:
+            messagebox.showerror("Error", "The threshold and row count must be numbers.")
+            return
+        if self.query_order_var.get() != "List order":
+            query["sort"] = column
+            query["descending"] = self.query_order_var.get() == "Descending"
+        if limit:
+            query["limit"] = limit
+        self.set_scenario_query(query)
+
+    def clear_scenario_query(self):
+        self.set_scenario_query(None)
+
+    def set_scenario_query(self, query):
+        if query is not None and not self.crypto_api.get_current_prices():
+            messagebox.showerror("Error", "Fetch current prices first.")
+            return
+        self.scenario_query = query
+        self.scenarios_view.first_row = 0
+        # Recalculating first means the query always runs on up-to-date worths
+        self.recalculate_scenarios()
+
+    def replot_scenarios(self):
+        self.plot_manager.update_scenarios_plot(self.portfolio_manager.ordered_scenarios(),
+                                                self.portfolio_manager.scenario_name, relabel=True)
 
 
     def load_holdings(self):
         success, message = self.portfolio_manager.load_holdings()
         if success:
-            self.btc_owned_var.set(str(self.portfolio_manager.holdings["btc"]))
-            self.eth_owned_var.set(str(self.portfolio_manager.holdings["eth"]))
-            self.xrp_owned_var.set(str(self.portfolio_manager.holdings["xrp"]))
+            for symbol, amount in self.portfolio_manager.holdings.items():
+                self.owned_vars[symbol].set(str(amount))
             messagebox.showinfo("Success", message)
             current_prices = self.crypto_api.get_current_prices()
             if current_prices:
@@ -167,11 +290,7 @@ class CryptoPortfolioApp(tk.Tk):
             messagebox.showinfo("Info", message)
 
     def save_holdings(self):
-        success, message = self.portfolio_manager.save_holdings(
-            self.btc_owned_var.get(),
-            self.eth_owned_var.get(),
-            self.xrp_owned_var.get()
-        )
+        success, message = self.portfolio_manager.save_holdings(self.get_var_values(self.owned_vars))
         if success:
             messagebox.showinfo("Success", message)
             current_prices = self.crypto_api.get_current_prices()
@@ -181,42 +300,105 @@ class CryptoPortfolioApp(tk.Tk):
             messagebox.showerror("Error", message)
 
     def auto_fetch_prices(self):
-        try:
-            self.fetch_prices()
-        except Exception as e:
-            messagebox.showinfo("Info", f"Auto-fetch failed: {e}. Use the 'Fetch Current Prices' button to retry.")
+        self.fetch_notify = "auto"
+        self.fetch_worker.request()
 
     def fetch_prices(self):
-        try:
-            if self.crypto_api.fetch_prices():
-                self.market_info_text.delete(1.0, tk.END)
-                self.market_info_text.insert(tk.END, self.crypto_api.format_market_info())
-                
-                last_fetched = self.crypto_api.get_last_fetched()
-                if last_fetched:
-                    self.last_fetched_label.config(
-                        text=f"Last Fetched: {last_fetched.strftime('%Y-%m-%d %H:%M:%S')}")
-                
-                self.recalculate_scenarios()
-        except Exception as e:
-            raise e
+        self.fetch_notify = "manual"
+        self.fetch_worker.request()
+
+    def scheduled_refresh(self):
+        self.refresh_job = None
+        if not self.refresh_scheduler.paused and not self.streaming:
+            self.fetch_worker.request()
+
+    def schedule_refresh(self, delay):
+        self.cancel_refresh()
+        if not self.refresh_scheduler.paused and not self.streaming:
+            self.refresh_job = self.after(int(delay * 1000), self.scheduled_refresh)
+
+    def on_stream_update(self):
+        if not self.streaming:
+            self.streaming = True
+            self.cancel_refresh()
+        self.show_prices()
+
+    def on_stream_failed(self, error):
+        # Fall back to polling right away; the stream keeps reconnecting
+        if self.streaming:
+            self.streaming = False
+            self.last_fetched_label.config(text=f"Live feed lost: {error}. Polling instead")
+            self.schedule_refresh(0)
+
+    def cancel_refresh(self):
+        if self.refresh_job is not None:
+            self.after_cancel(self.refresh_job)
+            self.refresh_job = None
+
+    def on_unmap(self, event):
+        # <Unmap> also fires for child widgets via the toplevel bindtag
+        if event.widget is self and self.state() == "iconic":
+            self.refresh_scheduler.pause()
+            self.cancel_refresh()
+
+    def on_map(self, event):
+        if event.widget is self and self.refresh_scheduler.paused:
+            self.schedule_refresh(self.refresh_scheduler.resume())
+
+    def on_prices_fetched(self):
+        self.fetch_notify = None
+        self.schedule_refresh(self.refresh_scheduler.on_success())
+        self.show_prices()
+
+    def load_cached_prices(self):
+        # Render the last cached snapshot right away; the auto-fetch refreshes it
+        cached = self.crypto_api.load_cached_snapshot()
+        if cached:
+            self.crypto_api.apply_snapshot(*cached)
+            self.show_prices()
+
+    def show_prices(self):
+        self.market_info_text.delete(1.0, tk.END)
+        self.market_info_text.insert(tk.END, self.crypto_api.format_market_info())
+
+        last_fetched = self.crypto_api.get_last_fetched()
+        if last_fetched:
+            self.last_fetched_label.config(
+                text=f"Last Fetched: {last_fetched.strftime('%Y-%m-%d %H:%M:%S')}")
+
+        self.recalculate_scenarios()
+
+    def on_fetch_failed(self, error):
+        delay = self.refresh_scheduler.on_failure(error)
+        self.schedule_refresh(delay)
+
+        notify, self.fetch_notify = self.fetch_notify, None
+        if notify == "auto":
+            messagebox.showinfo("Info", f"Auto-fetch failed: {error}. Use the 'Fetch Current Prices' button to retry.")
+        elif notify == "manual":
+            messagebox.showerror("Error", f"Failed to fetch prices: {error}")
+        else:
+            # Background refreshes fail quietly; the label shows when we will try again
+            self.last_fetched_label.config(text=f"Refresh failed: {error}. Retrying in {delay:.0f}s")
 
+    @instrumentation.timed("ui.recalculate")
     def recalculate_scenarios(self):
         current_prices = self.crypto_api.get_current_prices()
         if not current_prices:
             return
 
-        # Update portfolio manager with current holdings
-        self.portfolio_manager.save_holdings(
-            self.btc_owned_var.get(),
-            self.eth_owned_var.get(),
-            self.xrp_owned_var.get()
-        )
+        # Update portfolio manager with current holdings (persisted write-behind)
+        self.portfolio_manager.update_holdings(self.get_var_values(self.owned_vars))
         
         if self.portfolio_manager.calculate_scenarios(current_prices):
             self.current_worth_label.config(
                 text=self.portfolio_manager.get_current_worth_text(current_prices))
             self.update_scenarios_listbox()
+            # Keep whichever chart is on screen live
+            self.plot_manager.update_scenarios_plot(self.portfolio_manager.ordered_scenarios(),
+                                                    self.portfolio_manager.scenario_name)
+            self.plot_manager.update_portfolio_allocation(
+                self.portfolio_manager.get_portfolio_allocation_data(current_prices))
         else:
             messagebox.showerror("Error", "Invalid holdings amounts.")
 
@@ -226,16 +408,11 @@ class CryptoPortfolioApp(tk.Tk):
             messagebox.showerror("Error", "Fetch current prices first.")
             return
 
-        if self.portfolio_manager.add_future_scenario(
-            self.future_btc_price_var.get(),
-            self.future_eth_price_var.get(),
-            self.future_xrp_price_var.get()
-        ):
+        if self.portfolio_manager.add_future_scenario(self.get_var_values(self.future_price_vars)):
             self.recalculate_scenarios()
             # Clear future inputs
-            self.future_btc_price_var.set(DEFAULT_ENTRY_VALUE)
-            self.future_eth_price_var.set(DEFAULT_ENTRY_VALUE)
-            self.future_xrp_price_var.set(DEFAULT_ENTRY_VALUE)
+            for var in self.future_price_vars.values():
+                var.set(DEFAULT_ENTRY_VALUE)
         else:
             messagebox.showerror("Error", "Invalid input for future prices.")
 
@@ -247,21 +424,32 @@ class CryptoPortfolioApp(tk.Tk):
             messagebox.showerror("Error", message)
 
     def load_scenarios(self):
-        if self.portfolio_manager.load_future_prices():
+        success, message = self.portfolio_manager.load_future_prices()
+        if success:
             self.recalculate_scenarios()
-            messagebox.showinfo("Success", "Scenarios loaded from file.")
+            messagebox.showinfo("Success", message)
         else:
-            messagebox.showinfo("Info", "No scenarios file found.")
+            messagebox.showinfo("Info", message)
 
+    @instrumentation.timed("ui.list_update")
     def update_scenarios_listbox(self):
-        self.scenarios_listbox.delete(0, tk.END)
-        current_prices = self.crypto_api.get_current_prices()
-        scenarios_display = self.portfolio_manager.get_scenarios_display_data(current_prices)
-        for display_str in scenarios_display:
-            self.scenarios_listbox.insert(tk.END, display_str)
+        # Only the visible window of rows is formatted. A query is re-run as the worths change.
+        if self.scenario_query is None:
+            self.query_rows = None
+            self.scenarios_view.refresh(len(self.portfolio_manager.scenarios))
+        else:
+            self.query_rows = self.portfolio_manager.query_scenarios(**self.scenario_query)
+            self.scenarios_view.refresh(len(self.query_rows) + 1)
+
+    def format_scenario_row(self, index):
+        if self.query_rows is not None and index > 0:
+            index = int(self.query_rows[index - 1])
+        return self.portfolio_manager.get_scenario_display_row(index, self.crypto_api.get_current_prices())
 
     def plot_scenarios(self):
-        self.plot_manager.embed_scenarios_plot(self.portfolio_manager.scenarios)
+        self.plot_manager.embed_scenarios_plot(self.portfolio_manager.ordered_scenarios(),
+                                               self.coin_registry.labels, self.coin_registry.colors,
+                                               self.portfolio_manager.scenario_name)
 
     def plot_portfolio_allocation(self):
         current_prices = self.crypto_api.get_current_prices()
@@ -1,14 +1,23 @@
 import sys
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QHBoxLayout, 
                               QVBoxLayout, QSplitter, QMessageBox, QGroupBox)
-from PySide6.QtCore import Qt, QTimer
-from PySide6.QtGui import QFont
+from PySide6.QtCore import Qt, QTimer, QEvent
+from PySide6.QtGui import QFont, QKeySequence, QShortcut
 
 from constants_pyside6 import *
+from coin_registry import CoinRegistry
+import instrumentation
 from crypto_api import CryptoAPI
 from portfolio_manager import PortfolioManager
+from price_history import PriceHistoryStore
+from price_sources import StreamingPriceSource
+from response_cache import ResponseCache
+from sqlite_store import SQLiteStore
+from refresh_scheduler import RefreshScheduler
 from ui_components_pyside6 import (HoldingsWidget, ScenariosWidget, InfoDisplayWidget, 
-                                  PlotControlWidget, PlotWidget, DragDropListWidget)
+                                  PlotControlWidget, PlotWidget, DragDropListView, PriceFetcher,
+                                  PriceStream, ScenariosListModel, ScenarioQueryWidget, DebugPanel,
+                                  prewarm_matplotlib)
 
 
 class CryptoPortfolioApp(QMainWindow):
@@ -19,8 +28,23 @@ class CryptoPortfolioApp(QMainWindow):
         self.resize(WINDOW_WIDTH, WINDOW_HEIGHT)
         
         # Initialize components
-        self.crypto_api = CryptoAPI()
-        self.portfolio_manager = PortfolioManager()
+        self.coin_registry = CoinRegistry.load()
+        self.store = SQLiteStore(DATABASE_PATH) if DATABASE_PATH else None
+        # With a database it also keeps the price history
+        self.price_history = self.store if self.store is not None else PriceHistoryStore()
+        stream = StreamingPriceSource(PRICE_STREAM_URL, self.coin_registry) if PRICE_STREAM_URL else None
+        self.crypto_api = CryptoAPI(self.coin_registry, self.price_history, ResponseCache(), stream=stream)
+        self.portfolio_manager = PortfolioManager(self.coin_registry, store=self.store)
+        self.price_fetcher = PriceFetcher(self.crypto_api, self)
+        self.refresh_scheduler = RefreshScheduler()
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        # While the live feed delivers ticks, REST polling is suspended
+        self.price_stream = PriceStream(self.crypto_api, self)
+        self.streaming = False
+        self.fetch_notify = None  # "auto" or "manual" when a fetch result should be reported to the user
+        self.scenario_query = None  # query_scenarios arguments while the list shows a query
+        self.debug_panel = None  # created on first F12
         
         # Setup UI
         self.setup_ui()
@@ -59,7 +83,7 @@ class CryptoPortfolioApp(QMainWindow):
         left_layout.setSpacing(MARGIN_NORMAL)
         
         # Holdings widget
-        self.holdings_widget = HoldingsWidget()
+        self.holdings_widget = HoldingsWidget(self.coin_registry)
         left_layout.addWidget(self.holdings_widget)
         
         # Info display widget
@@ -67,16 +91,21 @@ class CryptoPortfolioApp(QMainWindow):
         left_layout.addWidget(self.info_widget)
         
         # Scenarios widget
-        self.scenarios_widget = ScenariosWidget()
+        self.scenarios_widget = ScenariosWidget(self.coin_registry)
         left_layout.addWidget(self.scenarios_widget)
         
         # Scenarios list
         scenarios_group = QGroupBox("Scenarios List")
         scenarios_layout = QVBoxLayout(scenarios_group)
         
-        self.scenarios_list = DragDropListWidget()
+        self.scenarios_model = ScenariosListModel(self.portfolio_manager, self.crypto_api, self)
+        self.scenarios_list = DragDropListView()
+        self.scenarios_list.setModel(self.scenarios_model)
         scenarios_layout.addWidget(self.scenarios_list)
         
+        self.query_widget = ScenarioQueryWidget(self.coin_registry)
+        scenarios_layout.addWidget(self.query_widget)
+        
         left_layout.addWidget(scenarios_group)
         
         # Plot controls
@@ -121,6 +150,8 @@ class CryptoPortfolioApp(QMainWindow):
         self.scenarios_widget.scenario_added.connect(self.add_scenario)
         self.scenarios_widget.scenarios_saved.connect(self.save_scenarios)
         self.scenarios_widget.scenarios_loaded.connect(self.load_scenarios)
+        self.scenarios_widget.sort_requested.connect(self.sort_scenarios)
+        self.query_widget.query_changed.connect(self.set_scenario_query)
         
         # Plot controls signals
         self.plot_controls.plot_scenarios_requested.connect(self.plot_scenarios)
@@ -129,39 +160,121 @@ class CryptoPortfolioApp(QMainWindow):
         # List reordering signal
         self.scenarios_list.items_reordered.connect(self.reorder_scenarios)
         
+        # Background price fetch signals
+        self.price_fetcher.prices_fetched.connect(self.on_prices_fetched)
+        self.price_fetcher.fetch_failed.connect(self.on_fetch_failed)
+        self.refresh_timer.timeout.connect(self.scheduled_refresh)
+        self.price_stream.prices_updated.connect(self.on_stream_update)
+        self.price_stream.stream_failed.connect(self.on_stream_failed)
+        
+        # Timings and profiling
+        QShortcut(QKeySequence("F12"), self, self.show_debug_panel)
+        
     def load_initial_data(self):
         # Load saved data
         self.portfolio_manager.load_future_prices()
         self.load_holdings()
+        self.load_cached_prices()
         
-        # Auto-fetch prices
+        # Auto-fetch prices, then follow the live feed if one is configured
         QTimer.singleShot(100, self.auto_fetch_prices)
+        self.price_stream.start()
+        
+        # Load matplotlib in the background once the window has painted
+        QTimer.singleShot(MATPLOTLIB_PREWARM_DELAY_MS, prewarm_matplotlib)
         
     def auto_fetch_prices(self):
-        try:
-            self.fetch_prices()
-        except Exception as e:
-            QMessageBox.information(self, "Info", 
-                                   f"Auto-fetch failed: {e}. Use the 'Fetch Current Prices' button to retry.")
+        self.fetch_notify = "auto"
+        self.price_fetcher.request()
     
     def fetch_prices(self):
-        try:
-            if self.crypto_api.fetch_prices():
-                # Update market info display (detailed price/market data)
-                market_info = self.crypto_api.format_market_info()
-                self.info_widget.update_market_info(market_info)
-                
-                # Update last fetched timestamp
-                last_fetched = self.crypto_api.get_last_fetched()
-                if last_fetched:
-                    self.info_widget.update_last_fetched(
-                        f"Last Fetched: {last_fetched.strftime('%Y-%m-%d %H:%M:%S')}")
-                
-                # Recalculate scenarios (this updates the "Current Worth" display)
-                self.recalculate_scenarios()
-                
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to fetch prices: {e}")
+        # Runs on the thread pool; results arrive via on_prices_fetched / on_fetch_failed
+        self.fetch_notify = "manual"
+        self.price_fetcher.request()
+    
+    def scheduled_refresh(self):
+        if not self.refresh_scheduler.paused and not self.streaming:
+            self.price_fetcher.request()
+    
+    def schedule_refresh(self, delay):
+        if not self.refresh_scheduler.paused and not self.streaming:
+            self.refresh_timer.start(int(delay * 1000))
+    
+    def on_stream_update(self):
+        if not self.streaming:
+            self.streaming = True
+            self.refresh_timer.stop()
+        self.show_prices()
+    
+    def on_stream_failed(self, error):
+        # Fall back to polling right away; the stream keeps reconnecting
+        if self.streaming:
+            self.streaming = False
+            self.info_widget.update_last_fetched(f"Live feed lost: {error}. Polling instead")
+            self.schedule_refresh(0)
+    
+    def on_prices_fetched(self):
+        self.fetch_notify = None
+        self.schedule_refresh(self.refresh_scheduler.on_success())
+        self.show_prices()
+    
+    def load_cached_prices(self):
+        # Render the last cached snapshot right away; the auto-fetch refreshes it
+        cached = self.crypto_api.load_cached_snapshot()
+        if cached:
+            self.crypto_api.apply_snapshot(*cached)
+            self.show_prices()
+    
+    def show_prices(self):
+        # Update market info display (detailed price/market data)
+        market_info = self.crypto_api.format_market_info()
+        self.info_widget.update_market_info(market_info)
+        
+        # Update last fetched timestamp
+        last_fetched = self.crypto_api.get_last_fetched()
+        if last_fetched:
+            self.info_widget.update_last_fetched(
+                f"Last Fetched: {last_fetched.strftime('%Y-%m-%d %H:%M:%S')}")
+        
+        # Recalculate scenarios (this updates the "Current Worth" display)
+        self.recalculate_scenarios()
+    
+    def on_fetch_failed(self, error):
+        delay = self.refresh_scheduler.on_failure(error)
+        self.schedule_refresh(delay)
+        
+        notify, self.fetch_notify = self.fetch_notify, None
+        if notify == "auto":
+            QMessageBox.information(self, "Info", 
+                                   f"Auto-fetch failed: {error}. Use the 'Fetch Current Prices' button to retry.")
+        elif notify == "manual":
+            QMessageBox.critical(self, "Error", f"Failed to fetch prices: {error}")
+        else:
+            # Background refreshes fail quietly; the label shows when we will try again
+            self.info_widget.update_last_fetched(f"Refresh failed: {error}. Retrying in {delay:.0f}s")
+    
+    def show_debug_panel(self):
+        if self.debug_panel is None:
+            self.debug_panel = DebugPanel(self.crypto_api.source_stats, self)
+        self.debug_panel.show()
+        self.debug_panel.raise_()
+    
+    def closeEvent(self, event):
+        if self.debug_panel is not None:
+            self.debug_panel.close()
+        self.price_stream.stop()
+        self.portfolio_manager.flush()
+        super().closeEvent(event)
+    
+    def changeEvent(self, event):
+        # Stop polling while minimized and catch up when the window comes back
+        if event.type() == QEvent.Type.WindowStateChange:
+            if self.isMinimized():
+                self.refresh_scheduler.pause()
+                self.refresh_timer.stop()
+            elif self.refresh_scheduler.paused:
+                self.schedule_refresh(self.refresh_scheduler.resume())
+        super().changeEvent(event)
     
     def on_holdings_changed(self):
         # Recalculate when holdings change
@@ -171,8 +284,7 @@ class CryptoPortfolioApp(QMainWindow):
     
     def save_holdings(self):
         holdings = self.holdings_widget.get_holdings()
-        success, message = self.portfolio_manager.save_holdings(
-            holdings['btc'], holdings['eth'], holdings['xrp'])
+        success, message = self.portfolio_manager.save_holdings(holdings)
         
         if success:
             QMessageBox.information(self, "Success", message)
@@ -187,7 +299,7 @@ class CryptoPortfolioApp(QMainWindow):
         if success:
             # Update UI with loaded holdings
             holdings = self.portfolio_manager.holdings
-            self.holdings_widget.set_holdings(holdings['btc'], holdings['eth'], holdings['xrp'])
+            self.holdings_widget.set_holdings(holdings)
             # Only show success message when manually loading, not on startup
             
             current_prices = self.crypto_api.get_current_prices()
@@ -200,7 +312,7 @@ class CryptoPortfolioApp(QMainWindow):
         if success:
             # Update UI with loaded holdings
             holdings = self.portfolio_manager.holdings
-            self.holdings_widget.set_holdings(holdings['btc'], holdings['eth'], holdings['xrp'])
+            self.holdings_widget.set_holdings(holdings)
             QMessageBox.information(self, "Success", message)
             
             current_prices = self.crypto_api.get_current_prices()
@@ -216,8 +328,7 @@ class CryptoPortfolioApp(QMainWindow):
             return
         
         future_prices = self.scenarios_widget.get_future_prices()
-        if self.portfolio_manager.add_future_scenario(
-            future_prices['btc'], future_prices['eth'], future_prices['xrp']):
+        if self.portfolio_manager.add_future_scenario(future_prices):
             self.recalculate_scenarios()
         else:
             QMessageBox.critical(self, "Error", "Invalid input for future prices.")
@@ -230,20 +341,22 @@ class CryptoPortfolioApp(QMainWindow):
             QMessageBox.critical(self, "Error", message)
     
     def load_scenarios(self):
-        if self.portfolio_manager.load_future_prices():
+        success, message = self.portfolio_manager.load_future_prices()
+        if success:
             self.recalculate_scenarios()
-            QMessageBox.information(self, "Success", "Scenarios loaded from file.")
+            QMessageBox.information(self, "Success", message)
         else:
-            QMessageBox.information(self, "Info", "No scenarios file found.")
+            QMessageBox.information(self, "Info", message)
     
+    @instrumentation.timed("ui.recalculate")
     def recalculate_scenarios(self):
         current_prices = self.crypto_api.get_current_prices()
         if not current_prices:
             return
         
-        # Update portfolio manager with current holdings
+        # Update portfolio manager with current holdings (persisted write-behind)
         holdings = self.holdings_widget.get_holdings()
-        self.portfolio_manager.save_holdings(holdings['btc'], holdings['eth'], holdings['xrp'])
+        self.portfolio_manager.update_holdings(holdings)
         
         if self.portfolio_manager.calculate_scenarios(current_prices):
             # Update current worth display
@@ -252,23 +365,56 @@ class CryptoPortfolioApp(QMainWindow):
             
             # Update scenarios list
             self.update_scenarios_list()
+            
+            # Keep whichever chart is on screen live
+            self.plot_widget.update_scenarios(self.portfolio_manager.ordered_scenarios(),
+                                              self.portfolio_manager.scenario_name)
+            self.plot_widget.update_allocation(
+                self.portfolio_manager.get_portfolio_allocation_data(current_prices))
         else:
             QMessageBox.critical(self, "Error", "Invalid holdings amounts.")
     
+    @instrumentation.timed("ui.list_update")
     def update_scenarios_list(self):
-        self.scenarios_list.clear()
-        current_prices = self.crypto_api.get_current_prices()
-        scenarios_display = self.portfolio_manager.get_scenarios_display_data(current_prices)
-        
-        for display_str in scenarios_display:
-            self.scenarios_list.addItem(display_str)
+        # The model repaints only the rows the changed versions or query touch
+        self.scenarios_model.refresh(self.query_rows())
+    
+    def query_rows(self):
+        # Display rows matching the active query, re-run as the worths change
+        if self.scenario_query is None:
+            return None
+        return self.portfolio_manager.query_scenarios(**self.scenario_query)
+    
+    def set_scenario_query(self, query):
+        if query is not None and not self.crypto_api.get_current_prices():
+            QMessageBox.critical(self, "Error", "Fetch current prices first.")
+            return
+        self.scenario_query = query
+        # Recalculating first means the query always runs on up-to-date worths
+        self.recalculate_scenarios()
     
     def reorder_scenarios(self, from_index, to_index):
+        # Only the order changes: move the one row and replot, nothing is revalued
         if self.portfolio_manager.reorder_future_prices(from_index, to_index):
-            self.recalculate_scenarios()
+            self.scenarios_model.move_row(from_index, to_index)
+            self.replot_scenarios()
+    
+    def sort_scenarios(self, key, descending):
+        if key == "worth" and not self.crypto_api.get_current_prices():
+            QMessageBox.critical(self, "Error", "Fetch current prices first.")
+            return
+        if self.portfolio_manager.sort_future_prices(key, descending):
+            self.scenarios_model.reorder(self.query_rows())
+            self.replot_scenarios()
+    
+    def replot_scenarios(self):
+        self.plot_widget.update_scenarios(self.portfolio_manager.ordered_scenarios(),
+                                          self.portfolio_manager.scenario_name, relabel=True)
     
     def plot_scenarios(self):
-        self.plot_widget.plot_scenarios(self.portfolio_manager.scenarios)
+        self.plot_widget.plot_scenarios(self.portfolio_manager.ordered_scenarios(),
+                                        self.coin_registry.labels, self.coin_registry.colors,
+                                        self.portfolio_manager.scenario_name)
     
     def plot_allocation(self):
         current_prices = self.crypto_api.get_current_prices()
@@ -0,0 +1,142 @@
+# Monte Carlo scenario generation: correlated price scenarios drawn either from
+# a geometric Brownian motion fitted to the stored price history, or by
+# bootstrapping that history's daily shocks. Large runs are split into
+# fixed-size chunks filled by a process pool into shared memory; each chunk has
+# its own seed, so a given seed gives the same scenarios whatever the number
+# of workers.
+import functools
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from constants_pyside6 import MONTE_CARLO_CHUNK_SIZE
+
+SECONDS_PER_DAY = 86400.0
+MODELS = ("gbm", "bootstrap")
+
+
+def estimate_parameters(history, symbols):
+    # Returns (drift, shocks): the daily log-price drift per coin and the
+    # (observations x coins) daily-scaled innovations around it, over the
+    # snapshot timestamps all coins with history have in common. Coins
+    # without history get zero drift and zero shocks, i.e. a constant price.
+    series = {symbol: ticks for symbol in symbols
+              if len(ticks := history.ticks(symbol)) > 2}
+    if not series:
+        raise ValueError("Not enough price history to estimate returns.")
+    timestamps = functools.reduce(np.intersect1d, (ticks["timestamp"] for ticks in series.values()))
+    if len(timestamps) < 3:
+        raise ValueError("Not enough common price history across coins to estimate returns.")
+
+    dt = np.diff(timestamps) / SECONDS_PER_DAY
+    drift = np.zeros(len(symbols))
+    shocks = np.zeros((len(dt), len(symbols)))
+    for j, symbol in enumerate(symbols):
+        ticks = series.get(symbol)
+        if ticks is None:
+            continue
+        prices = ticks["price"][np.searchsorted(ticks["timestamp"], timestamps)]
+        if (prices <= 0).any():
+            continue
+        returns = np.diff(np.log(prices))
+        drift[j] = returns.sum() / dt.sum()
+        shocks[:, j] = (returns - drift[j] * dt) / np.sqrt(dt)
+    return drift, shocks
+
+
+def covariance_factor(shocks):
+    # A square root of the shocks' covariance. Unlike Cholesky this works for the
+    # singular matrices that flat or perfectly correlated coins produce.
+    covariance = np.atleast_2d(np.cov(shocks, rowvar=False))
+    values, vectors = np.linalg.eigh(covariance)
+    return vectors * np.sqrt(np.clip(values, 0.0, None))
+
+
+def generate_prices(out, current_prices, drift, shocks, horizon_days, model="gbm", seed=None, workers=None):
+    # Fills `out` (N x coins) with scenario prices `horizon_days` ahead of current_prices
+    if model not in MODELS:
+        raise ValueError(f"Unknown model: {model}")
+    current_prices = np.asarray(current_prices, dtype=np.float64)
+    # GBM draws normal shocks through the covariance factor; bootstrap resamples
+    # whole historical rows, one per day, keeping cross-coin dependence and the
+    # daily fat tails
+    spread = covariance_factor(shocks) if model == "gbm" else shocks
+    count = len(out)
+    bounds = [(start, min(start + MONTE_CARLO_CHUNK_SIZE, count)) for start in range(0, count, MONTE_CARLO_CHUNK_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(bounds))
+    args = (current_prices, drift, spread, horizon_days, model)
+
+    workers = min(workers or os.cpu_count() or 1, len(bounds))
+    if workers <= 1:
+        for (start, stop), chunk_seed in zip(bounds, seeds):
+            _fill_chunk(out[start:stop], np.random.default_rng(chunk_seed), *args)
+        return out
+
+    block = shared_memory.SharedMemory(create=True, size=max(1, out.nbytes))
+    try:
+        # Spawned (not forked) workers: the GUI process has threads running
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(_fill_shared_chunk, block.name, out.shape, start, stop, chunk_seed, *args)
+                       for (start, stop), chunk_seed in zip(bounds, seeds)]
+            for future in futures:
+                future.result()
+        out[:] = np.ndarray(out.shape, dtype=np.float64, buffer=block.buf)
+    finally:
+        block.close()
+        block.unlink()
+    return out
+
+
+def _fill_shared_chunk(name, shape, start, stop, seed, *args):
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        prices = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+        _fill_chunk(prices[start:stop], np.random.default_rng(seed), *args)
+        del prices
+    finally:
+        block.close()
+
+
+def _fill_chunk(out, rng, current_prices, drift, spread, horizon_days, model):
+    if model == "gbm":
+        log_returns = rng.standard_normal((len(out), len(current_prices))) @ spread.T
+        # Shocks are daily; scale to the horizon by the square root of time
+        log_returns *= math.sqrt(horizon_days)
+    else:
+        # One historical day drawn per day of the horizon and summed, so the
+        # outcome is a sum of days rather than a single day stretched. A
+        # fractional horizon is spread evenly over its whole days.
+        days = max(1, round(horizon_days))
+        log_returns = np.zeros((len(out), len(current_prices)))
+        for _ in range(days):
+            log_returns += spread[rng.integers(len(spread), size=len(out))]
+        log_returns *= math.sqrt(horizon_days / days)
+    log_returns += drift * horizon_days
+    np.exp(log_returns, out=log_returns)
+    np.multiply(log_returns, current_prices, out=out)
+
+
+def risk_summary(totals, current_total, confidences, percentiles):
+    # Distribution of scenario total worth: percentile bands, plus value at risk
+    # and conditional value at risk (expected shortfall) as positive losses
+    # relative to the current total.
+    totals = np.asarray(totals, dtype=np.float64)
+    if len(totals) == 0:
+        raise ValueError("No scenarios to summarise.")
+    pnl = totals - current_total
+    bands = np.percentile(totals, percentiles)
+    cutoffs = np.quantile(pnl, [1.0 - confidence for confidence in confidences])
+    risk = {}
+    for confidence, cutoff in zip(confidences, cutoffs.tolist()):
+        risk[confidence] = {"var": -cutoff, "cvar": -float(pnl[pnl <= cutoff].mean())}
+    return {
+        "count": len(totals),
+        "current_total": float(current_total),
+        "mean_total": float(totals.mean()),
+        "percentiles": dict(zip(percentiles, bands.tolist())),
+        "risk": risk,
+    }
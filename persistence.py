@@ -0,0 +1,92 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+import instrumentation
+
+
+def atomic_write(path, write, mode="w", suffix=".tmp"):
+    # Call write(f) on a temp file in the same directory and rename it over the
+    # target, so readers never see a half-written file even if we die mid-write.
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=suffix, dir=directory)
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path, data):
+    atomic_write(path, lambda f: json.dump(data, f), suffix=".json")
+
+
+class WriteBehindWriter:
+    # Debounces and coalesces writes of a JSON document: only the latest
+    # snapshot is kept, and it is written once no new snapshot has arrived
+    # for `delay` seconds, or at the latest `max_delay` seconds after the
+    # first unwritten one. Writes happen on a background daemon thread.
+    def __init__(self, path, delay, max_delay=None):
+        self.path = path
+        self.delay = delay
+        self.max_delay = max_delay if max_delay is not None else 10 * delay
+        self.last_error = None
+        self._pending = None
+        self._first_pending = None
+        self._due = None
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = None
+
+    def schedule(self, data):
+        with self._condition:
+            now = time.monotonic()
+            if self._pending is None:
+                self._first_pending = now
+            self._pending = data
+            # A steady stream of snapshots can't postpone the write forever
+            self._due = min(self._first_pending + self.max_delay, now + self.delay)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def flush(self):
+        # Write any pending snapshot now, on the calling thread
+        self._write_pending()
+        return self.last_error is None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    self._condition.wait()
+                remaining = self._due - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+            self._write_pending()
+
+    def _write_pending(self):
+        # Taking the snapshot under the write lock keeps writes in order:
+        # an older snapshot can never land on disk after a newer one.
+        with self._write_lock:
+            with self._condition:
+                data, self._pending = self._pending, None
+            if data is None:
+                return
+            try:
+                with instrumentation.timer("persist.write_behind"):
+                    atomic_write_json(self.path, data)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
@@ -0,0 +1,167 @@
+# Many client portfolios over one coin registry. Each portfolio is a holdings
+# file in a directory (any format portfolio_io reads, named after the
+# portfolio), loaded the first time it is needed. In memory the holdings form
+# one (portfolios x coins) matrix, so valuing every portfolio is a single
+# matrix product: against current prices a (portfolios,) vector, against
+# scenarios a (portfolios x scenarios) block computed a slab of portfolios at a
+# time so memory stays within PORTFOLIO_BATCH_BYTES however many there are.
+import os
+
+import numpy as np
+
+from constants_pyside6 import (PORTFOLIOS_DIR, PORTFOLIO_BATCH_BYTES, MONTE_CARLO_CONFIDENCES,
+                               MONTE_CARLO_PERCENTILES)
+from coin_registry import CoinRegistry
+import portfolio_io
+
+INITIAL_CAPACITY = 64
+
+
+class PortfolioCollection:
+    def __init__(self, registry=None, directory=PORTFOLIOS_DIR):
+        self.registry = registry if registry is not None else CoinRegistry()
+        self.directory = directory
+        self.names = []  # row order of the holdings matrix
+        self._rows = {}
+        self._paths = {}  # name -> file, for portfolios not loaded yet
+        self._holdings = np.zeros((INITIAL_CAPACITY, len(self.registry)))
+        self._loaded = np.zeros(INITIAL_CAPACITY, dtype=bool)
+
+    def scan(self):
+        # Registers every portfolio file in the directory without reading it
+        if not os.path.isdir(self.directory):
+            return 0
+        found = 0
+        for entry in sorted(os.scandir(self.directory), key=lambda entry: entry.name):
+            name, _ = os.path.splitext(entry.name)
+            if entry.is_file() and portfolio_io.file_format(entry.name) and name not in self._rows:
+                self._add_row(name)
+                self._paths[name] = entry.path
+                found += 1
+        return found
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._rows
+
+    def add(self, name, amounts=None):
+        # A new portfolio held in memory until save()
+        if name in self._rows:
+            raise ValueError(f"Portfolio already exists: {name}")
+        row = self._add_row(name)
+        if amounts is not None:
+            self._holdings[row] = self._vector(amounts)
+        self._loaded[row] = True
+
+    def holdings(self, name):
+        row = self._load(name)
+        return dict(zip(self.registry.symbols, self._holdings[row].tolist()))
+
+    def set_holdings(self, name, amounts):
+        # Raises ValueError on unparseable amounts, KeyError for unknown portfolios
+        row = self._rows[name]
+        self._holdings[row] = self._vector(amounts)
+        self._loaded[row] = True
+        self._paths.pop(name, None)
+
+    def save(self, name, path=None):
+        path = path or os.path.join(self.directory, name + ".json")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        portfolio_io.write_holdings(path, self.holdings(name))
+
+    @property
+    def matrix(self):
+        # (portfolios x coins) holdings, loading any portfolio not read yet
+        for name in list(self._paths):
+            self._load(name)
+        return self._holdings[:len(self.names)]
+
+    def current_totals(self, current_prices):
+        # Total current worth of every portfolio, in `names` order
+        return self.matrix @ self._price_vector(current_prices)
+
+    def scenario_blocks(self, scenario_prices, max_bytes=PORTFOLIO_BATCH_BYTES, rows=None):
+        # Yields (start, stop, totals) where totals[i, j] is the worth of
+        # portfolio start + i under scenario j. Each block is at most max_bytes,
+        # or `rows` portfolios if given.
+        holdings = self.matrix
+        scenario_prices = np.asarray(scenario_prices, dtype=np.float64)
+        rows = rows or self.block_rows(len(scenario_prices), max_bytes)
+        # One transposed copy up front so every block is a plain GEMM
+        prices_t = np.ascontiguousarray(scenario_prices.T)
+        for start in range(0, len(holdings), rows):
+            stop = min(start + rows, len(holdings))
+            yield start, stop, holdings[start:stop] @ prices_t
+
+    @staticmethod
+    def block_rows(scenario_count, max_bytes=PORTFOLIO_BATCH_BYTES, copies=1):
+        # Portfolios per block so that `copies` float64 blocks fit in max_bytes
+        return max(1, max_bytes // (8 * max(1, scenario_count) * copies))
+
+    def risk_summary(self, scenario_prices, current_prices, confidences=MONTE_CARLO_CONFIDENCES,
+                     percentiles=MONTE_CARLO_PERCENTILES, max_bytes=PORTFOLIO_BATCH_BYTES):
+        # monte_carlo.risk_summary for every portfolio at once, as arrays in
+        # `names` order. Each block of totals is sorted in place, which is far
+        # cheaper than np.quantile's partitioning for this many levels, and the
+        # levels are then read off with the same linear interpolation.
+        count = len(scenario_prices)
+        if count == 0:
+            raise ValueError("No scenarios to summarise.")
+        current = self.current_totals(current_prices)
+        quantiles = np.array([p / 100 for p in percentiles] + [1.0 - confidence for confidence in confidences])
+        positions = quantiles * (count - 1)
+        low = np.floor(positions).astype(np.intp)
+        high = np.minimum(low + 1, count - 1)
+        fraction = positions - low
+        mean_total = np.empty(len(self.names))
+        levels = np.empty((len(quantiles), len(self.names)))
+        cvar = np.empty((len(confidences), len(self.names)))
+
+        # Room for the block plus its tail masks
+        rows = self.block_rows(count, max_bytes, copies=2)
+        for start, stop, totals in self.scenario_blocks(scenario_prices, rows=rows):
+            # In place: totals become sorted profit and loss against the current worth
+            pnl = np.subtract(totals, current[start:stop, None], out=totals)
+            mean_total[start:stop] = pnl.mean(axis=1)
+            pnl.sort(axis=1)
+            levels[:, start:stop] = (pnl[:, low] * (1 - fraction) + pnl[:, high] * fraction).T
+            for k, cutoff in enumerate(levels[len(percentiles):, start:stop]):
+                tail = pnl <= cutoff[:, None]
+                cvar[k, start:stop] = -pnl.sum(axis=1, where=tail) / tail.sum(axis=1)
+
+        bands = levels[:len(percentiles)] + current
+        return {
+            "names": list(self.names),
+            "count": count,
+            "current_total": current,
+            "mean_total": mean_total + current,
+            "percentiles": dict(zip(percentiles, bands)),
+            "risk": {confidence: {"var": -levels[len(percentiles) + k], "cvar": cvar[k]}
+                     for k, confidence in enumerate(confidences)},
+        }
+
+    def _add_row(self, name):
+        row = len(self.names)
+        if row == len(self._holdings):
+            self._holdings = np.concatenate([self._holdings, np.zeros_like(self._holdings)])
+            self._loaded = np.concatenate([self._loaded, np.zeros_like(self._loaded)])
+        self.names.append(name)
+        self._rows[name] = row
+        return row
+
+    def _load(self, name):
+        row = self._rows[name]
+        if not self._loaded[row]:
+            self._holdings[row] = self._vector(portfolio_io.read_holdings(self._paths[name]))
+            self._loaded[row] = True
+            del self._paths[name]
+        return row
+
+    def _vector(self, amounts):
+        # Same rules as PortfolioManager.amounts_vector: missing coins count as 0
+        return np.array([float(amounts.get(symbol, 0)) for symbol in self.registry.symbols])
+
+    def _price_vector(self, current_prices):
+        return np.array([current_prices.get(symbol, 0.0) for symbol in self.registry.symbols], dtype=np.float64)
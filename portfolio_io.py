@@ -0,0 +1,337 @@
+# Streaming import/export of scenarios and holdings as JSON, NDJSON or CSV,
+# picked by file extension. Readers hand rows over in fixed-size batches and
+# writers emit them batch by batch, so memory stays bounded by the batch size
+# rather than the file size. Progress callbacks receive (done, total) in bytes.
+#
+# Scenario layouts:
+#   .json    {"coins": [...], "prices": [[...], ...]}, or a legacy bare list of rows
+#   .ndjson  {"coins": [...]} on the first line, then one JSON array of prices per line
+#   .csv     a header of coin symbols, then one row of prices per line
+# Holdings layouts:
+#   .json    {"btc": 1.5, ...}
+#   .ndjson  one {"coin": "btc", "amount": 1.5} per line
+#   .csv     header "coin,amount", then one row per coin
+import csv
+import itertools
+import json
+import os
+
+import numpy as np
+
+from constants_pyside6 import IO_BATCH_ROWS, IO_READ_CHUNK_SIZE
+from persistence import atomic_write
+
+LEGACY_SCENARIO_COINS = ("btc", "eth", "xrp")  # column order of scenario files saved as a bare list
+FORMATS = {".json": "json", ".ndjson": "ndjson", ".jsonl": "ndjson", ".csv": "csv"}
+
+
+def file_format(path):
+    # "json", "ndjson", "csv", or None for anything else
+    return FORMATS.get(os.path.splitext(path)[1].lower())
+
+
+class _CountingFile:
+    # Text file wrapper that counts characters consumed, for progress reports
+    def __init__(self, f):
+        self.f = f
+        self.position = 0
+
+    def read(self, size):
+        data = self.f.read(size)
+        self.position += len(data)
+        return data
+
+    def __iter__(self):
+        for line in self.f:
+            self.position += len(line)
+            yield line
+
+
+class _JsonReader:
+    # Minimal pull parser: values are decoded one at a time with raw_decode from
+    # a buffer refilled in fixed-size chunks, so memory is bounded by the
+    # largest single value (one scenario row) rather than the document.
+    def __init__(self, f, chunk_size=IO_READ_CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.f.read(self.chunk_size)
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        self.eof = not chunk
+
+    def peek(self):
+        # Next non-whitespace character, or "" at end of input
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos:self.pos + 1]
+            self._fill()
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} but found {found or 'end of file'!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number running into the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def items(self):
+        # Yields each element of an array as it is parsed
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self._separator("]"):
+                return
+
+    def row_blocks(self):
+        # Like items() for an array of flat arrays (scenario rows), but yields
+        # lists of rows: everything up to the last complete row in the buffer
+        # is decoded with a single parser call
+        self.expect("[")
+        while True:
+            if self.peek() == "]":
+                self.pos += 1
+                return
+            end = self.buffer.rfind("]", self.pos)
+            if end >= 0:
+                # A "]" right after another "]" closes the outer array, not a row
+                before = end - 1
+                while before > self.pos and self.buffer[before] in " \t\r\n":
+                    before -= 1
+                if self.buffer[before] == "]":
+                    end = before
+            if end < 0 or end == self.pos:
+                if self.eof:
+                    raise ValueError("Unterminated array")
+                self._fill()
+                continue
+            yield json.loads("[" + self.buffer[self.pos:end + 1] + "]")
+            self.pos = end + 1
+            if self.peek() == ",":
+                self.pos += 1
+
+    def members(self):
+        # Yields each key of an object; the caller must consume its value
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self._separator("}"):
+                return
+
+    def _separator(self, close):
+        char = self.peek()
+        self.pos += 1
+        if char == close:
+            return True
+        if char != ",":
+            raise ValueError(f"Expected ',' or {close!r} but found {char or 'end of file'!r}")
+        return False
+
+
+def _row_batches(rows, width, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield np.array(batch, dtype=np.float64).reshape(-1, width)
+            batch = []
+    if batch:
+        yield np.array(batch, dtype=np.float64).reshape(-1, width)
+
+
+def _rows(blocks):
+    return itertools.chain.from_iterable(blocks)
+
+
+def _chunks(lines, size):
+    while True:
+        chunk = list(itertools.islice(lines, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _non_blank(lines):
+    return (line for line in lines if line.strip())
+
+
+class ScenarioReader:
+    # with ScenarioReader(path) as reader:
+    #     reader.coins            -> column symbols, known once opened
+    #     reader.batches()        -> (<= batch_size x coins) float64 arrays
+    def __init__(self, path, batch_size=IO_BATCH_ROWS, progress=None):
+        self.format = file_format(path)
+        if self.format is None:
+            raise ValueError(f"Unsupported scenario file type: {path}")
+        self.batch_size = batch_size
+        self.progress = progress
+        self.total = os.path.getsize(path)
+        self.file = _CountingFile(open(path, "r", newline=""))
+        try:
+            self.coins, self._rows = getattr(self, f"_open_{self.format}")()
+        except BaseException:
+            self.close()
+            raise
+
+    def _open_json(self):
+        reader = _JsonReader(self.file)
+        if reader.peek() == "[":
+            return list(LEGACY_SCENARIO_COINS), self._batches(_rows(reader.row_blocks()), len(LEGACY_SCENARIO_COINS))
+        coins = None
+        for key in reader.members():
+            if key == "coins":
+                coins = reader.value()
+            elif key == "prices":
+                if coins is None:
+                    raise ValueError('"coins" must come before "prices"')
+                return coins, self._batches(_rows(reader.row_blocks()), len(coins))
+            else:
+                reader.value()
+        if coins is None:
+            raise ValueError('Scenario file has no "coins"')
+        return coins, iter(())
+
+    def _open_ndjson(self):
+        lines = _non_blank(self.file)
+        header = json.loads(next(lines, "{}"))
+        coins = header.get("coins") if isinstance(header, dict) else None
+        if coins is None:
+            raise ValueError('First line must be {"coins": [...]}')
+        # Decode a batch of lines with one parser call
+        blocks = (json.loads("[" + ",".join(chunk) + "]") for chunk in _chunks(lines, self.batch_size))
+        return coins, self._batches(_rows(blocks), len(coins))
+
+    def _open_csv(self):
+        lines = _non_blank(self.file)
+        coins = [coin.strip() for coin in next(csv.reader(itertools.islice(lines, 1)), [])]
+        return coins, self._csv_batches(lines, len(coins))
+
+    def _batches(self, rows, width):
+        for batch in _row_batches(rows, width, self.batch_size):
+            yield batch
+            self._report()
+
+    def _csv_batches(self, lines, width):
+        for chunk in _chunks(lines, self.batch_size):
+            yield np.loadtxt(chunk, delimiter=",", dtype=np.float64, ndmin=2).reshape(-1, width)
+            self._report()
+
+    def _report(self):
+        if self.progress is not None:
+            self.progress(min(self.file.position, self.total), self.total)
+
+    def batches(self):
+        return self._rows
+
+    def close(self):
+        self.file.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_scenarios(path, coins, prices, batch_size=IO_BATCH_ROWS, progress=None):
+    # Writes atomically, formatting batch_size rows at a time
+    format = file_format(path)
+    if format is None:
+        raise ValueError(f"Unsupported scenario file type: {path}")
+
+    def write(f):
+        if format == "json":
+            f.write(f'{{"coins": {json.dumps(list(coins))}, "prices": [')
+        elif format == "ndjson":
+            f.write(json.dumps({"coins": list(coins)}) + "\n")
+        else:
+            csv.writer(f, lineterminator="\n").writerow(coins)
+
+        for start in range(0, len(prices), batch_size):
+            rows = prices[start:start + batch_size].tolist()
+            if format == "json":
+                # One encoder call per batch; strip the batch's own brackets
+                f.write((",\n" if start else "\n") + json.dumps(rows)[1:-1])
+            elif format == "ndjson":
+                f.write("".join(json.dumps(row) + "\n" for row in rows))
+            else:
+                f.write("".join(",".join(map(repr, row)) + "\n" for row in rows))
+            if progress is not None:
+                progress(min(start + batch_size, len(prices)), len(prices))
+
+        if format == "json":
+            f.write("\n]}\n")
+
+    atomic_write(path, write, suffix=os.path.splitext(path)[1])
+
+
+def read_holdings(path):
+    # Returns {symbol: amount} with amounts as found (numbers or numeric strings)
+    format = file_format(path)
+    if format is None:
+        raise ValueError(f"Unsupported holdings file type: {path}")
+    holdings = {}
+    with open(path, "r", newline="") as f:
+        if format == "json":
+            if os.fstat(f.fileno()).st_size <= IO_READ_CHUNK_SIZE:
+                # Typical holdings files are tiny: one parser call beats the pull parser
+                holdings = json.load(f)
+                if not isinstance(holdings, dict):
+                    raise ValueError(f"Expected '{{' but found {type(holdings).__name__}")
+                return holdings
+            reader = _JsonReader(f)
+            for key in reader.members():
+                holdings[key] = reader.value()
+        elif format == "ndjson":
+            for line in _non_blank(f):
+                row = json.loads(line)
+                holdings[row["coin"]] = row["amount"]
+        else:
+            for row in csv.DictReader(_non_blank(f)):
+                holdings[row["coin"]] = row["amount"]
+    return holdings
+
+
+def write_holdings(path, holdings):
+    format = file_format(path)
+    if format is None:
+        raise ValueError(f"Unsupported holdings file type: {path}")
+
+    def write(f):
+        if format == "json":
+            json.dump(holdings, f)
+        elif format == "ndjson":
+            f.write("".join(json.dumps({"coin": coin, "amount": amount}) + "\n" for coin, amount in holdings.items()))
+        else:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(["coin", "amount"])
+            writer.writerows(holdings.items())
+
+    atomic_write(path, write, suffix=os.path.splitext(path)[1])
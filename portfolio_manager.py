@@ -1,162 +1,644 @@
+import functools
 import json
 import os
-from constants_pyside6 import HOLDINGS_FILE_PATH, SCENARIOS_FILE_PATH, DEFAULT_ENTRY_VALUE
+from collections.abc import Sequence
+import numpy as np
+from constants_pyside6 import (HOLDINGS_FILE_PATH, SCENARIOS_FILE_PATH, LEGACY_SCENARIOS_FILE_PATH, HOLDINGS_SAVE_DELAY_S,
+                               HOLDINGS_SAVE_MAX_DELAY_S, MONTE_CARLO_HORIZON_DAYS, MONTE_CARLO_CONFIDENCES, MONTE_CARLO_PERCENTILES,
+                               SCENARIO_DISPLAY_CACHE_SIZE, SCENARIO_RESYNC_UPDATES)
+from coin_registry import CoinRegistry
+import instrumentation
+import monte_carlo
+from persistence import WriteBehindWriter
+from scenario_engine import ScenarioEngine
+import portfolio_io
+import scenario_file
+from sqlite_store import DEFAULT_PORTFOLIO
+
+# Comparisons accepted in query_scenarios filters
+QUERY_OPERATORS = {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal,
+                   "==": np.equal, "!=": np.not_equal}
 
 
 class PortfolioManager:
-    def __init__(self):
-        self.holdings = {"btc": 0, "eth": 0, "xrp": 0}
-        self.future_prices = []
-        self.scenarios = []
+    # Persists to the holdings and scenarios files, or, given an SQLiteStore,
+    # to the database under the `portfolio` name with row-level writes
+    def __init__(self, registry=None, holdings_path=HOLDINGS_FILE_PATH, scenarios_path=SCENARIOS_FILE_PATH,
+                 store=None, portfolio=DEFAULT_PORTFOLIO):
+        self.registry = registry if registry is not None else CoinRegistry()
+        self.holdings_path = holdings_path
+        self.scenarios_path = scenarios_path
+        self.store = store
+        self.portfolio = portfolio
+        # Database ids of the first persisted_rows scenarios, in order (store only)
+        self.scenario_ids = []
+        # Holdings and prices are column-indexed by registry position
+        self.holdings_vector = np.zeros(len(self.registry))
+        self.engine = ScenarioEngine(len(self.registry))
+        # Display order of the future scenarios as engine rows, or None while it
+        # is the storage order. An engine row is the scenario's stable id: moves
+        # and sorts only permute this index and never touch prices or worths.
+        self._order = None
+        # Display position of each engine row, for the current _order
+        self._positions = None
+        # Row 0 is the current valuation; column 0 is total worth, then one column per coin;
+        # future rows follow in engine order (see ordered_scenarios() for display order).
+        # A view of the front of _worths, which has spare rows for appended scenarios.
+        self.scenarios = np.empty((0, len(self.registry) + 1))
+        self._worths = self.scenarios
+        # What the future rows of _worths were valued from, so a change to one
+        # holding or a few appended scenarios only revalues what changed
+        self._valued_holdings = None
+        self._valued_prices_version = None
+        self._incremental_updates = 0
+        # (current_prices dict, holdings_version, worths) of the last current valuation
+        self._current_valuation = None
+        # Leading scenario rows known to match the binary scenarios file (or
+        # the store), so a save only has to append what was added since
+        self.persisted_rows = 0
+        # Bumped whenever holdings change or existing scenario rows change
+        # (appends don't count); formatted future rows are cached against the
+        # versions self.scenarios was calculated from
+        self.holdings_version = 0
+        self.scenario_prices_version = 0
+        self.scenarios_versions = (0, 0)
+        self._cached_future_row = functools.lru_cache(maxsize=SCENARIO_DISPLAY_CACHE_SIZE)(self._format_future_row)
+        # Stable argsort of each queried worth column over the future rows, valid
+        # while self.scenarios stays at _sort_key (versions and row count)
+        self._sort_indexes = {}
+        self._sort_key = None
+        self.holdings_writer = WriteBehindWriter(holdings_path, HOLDINGS_SAVE_DELAY_S, HOLDINGS_SAVE_MAX_DELAY_S)
+
+    @property
+    def holdings(self):
+        return dict(zip(self.registry.symbols, self.holdings_vector.tolist()))
+
+    @holdings.setter
+    def holdings(self, amounts):
+        vector = self.amounts_vector(amounts)
+        if not np.array_equal(vector, self.holdings_vector):
+            self.holdings_vector = vector
+            self.holdings_version += 1
+
+    @property
+    def future_prices(self):
+        # (N x coins) float64 future scenario prices in display order: a view
+        # while that is the storage order, else a gathered copy
+        if self._order is None:
+            return self.engine.prices
+        return self.engine.prices[self.order]
+
+    @future_prices.setter
+    def future_prices(self, rows):
+        self.engine.set_prices(rows)
+        self._order = None
+        self.persisted_rows = 0
+        self.scenario_prices_version += 1
+
+    def amounts_vector(self, amounts):
+        # Mapping of symbol -> number (or numeric string) to a registry-ordered vector;
+        # raises ValueError on unparseable input, missing coins count as 0.
+        vector = np.zeros(len(self.registry))
+        for i, symbol in enumerate(self.registry.symbols):
+            vector[i] = float(amounts.get(symbol, 0))
+        return vector
 
+    def price_vector(self, current_prices):
+        return np.array([current_prices.get(symbol, 0.0) for symbol in self.registry.symbols], dtype=np.float64)
+
+    @instrumentation.timed("persist.load_holdings")
     def load_holdings(self):
-        if os.path.exists(HOLDINGS_FILE_PATH):
+        if self.store is not None:
             try:
-                with open(HOLDINGS_FILE_PATH, "r") as f:
+                amounts = self.store.holdings(self.portfolio)
+            except Exception as e:
+                return False, f"Failed to load holdings: {e}"
+            if not amounts:
+                return False, "No holdings stored."
+            self.holdings = amounts
+            return True, "Holdings loaded from database."
+        if os.path.exists(self.holdings_path):
+            try:
+                with open(self.holdings_path, "r") as f:
                     data = json.load(f)
-                self.holdings = {
-                    "btc": data.get("btc", 0),
-                    "eth": data.get("eth", 0),
-                    "xrp": data.get("xrp", 0)
-                }
+                self.holdings = data
                 return True, "Holdings loaded from file."
             except Exception as e:
                 return False, f"Failed to load holdings: {e}"
         else:
             return False, "No holdings file found."
 
-    def save_holdings(self, btc_amount, eth_amount, xrp_amount):
+    @instrumentation.timed("holdings.update")
+    def update_holdings(self, amounts):
+        # Updates in-memory holdings immediately; the file write is debounced
+        # and done on a background thread, so this is safe to call per keystroke.
+        previous = self.holdings_vector
+        version = self.holdings_version
         try:
-            self.holdings = {
-                "btc": float(btc_amount),
-                "eth": float(eth_amount),
-                "xrp": float(xrp_amount)
-            }
-            with open(HOLDINGS_FILE_PATH, "w") as f:
-                json.dump(self.holdings, f)
-            return True, "Holdings saved to file."
+            self.holdings = amounts
         except ValueError:
             return False, "Invalid input for holdings amounts."
-        except Exception as e:
-            return False, f"Failed to save holdings: {e}"
+        if self.store is None:
+            # Price refreshes pass the same amounts again; only edits are written
+            if self.holdings_version != version:
+                self.holdings_writer.schedule(self.holdings)
+            return True, "Holdings updated."
+        # One row per edited coin rather than the whole document
+        changed = np.flatnonzero(previous != self.holdings_vector).tolist()
+        if changed:
+            try:
+                self.store.set_holdings({self.registry.symbols[i]: self.holdings_vector[i] for i in changed},
+                                        self.portfolio)
+            except Exception as e:
+                return False, f"Failed to save holdings: {e}"
+        return True, "Holdings updated."
 
-    def load_future_prices(self):
-        if os.path.exists(SCENARIOS_FILE_PATH):
+    @instrumentation.timed("persist.save_holdings")
+    def save_holdings(self, amounts):
+        success, message = self.update_holdings(amounts)
+        if not success:
+            return success, message
+        # An explicit save writes every coin, even if nothing changed since the last one
+        if self.store is not None:
             try:
-                with open(SCENARIOS_FILE_PATH, "r") as f:
-                    data = json.load(f)
-                self.future_prices = [tuple(d) for d in data]
-                return True
+                self.store.set_holdings(self.holdings, self.portfolio)
             except Exception as e:
-                return False
-        return False
+                return False, f"Failed to save holdings: {e}"
+            return True, "Holdings saved to database."
+        self.holdings_writer.schedule(self.holdings)
+        if not self.flush():
+            return False, f"Failed to save holdings: {self.holdings_writer.last_error}"
+        return True, "Holdings saved to file."
+
+    @instrumentation.timed("persist.flush")
+    def flush(self):
+        # Persist any pending holdings write now; call on exit. Store writes are never pending.
+        if self.store is not None:
+            return True
+        return self.holdings_writer.flush()
+
+    @instrumentation.timed("persist.load_scenarios")
+    def load_future_prices(self, path=None, progress=None):
+        # Returns (success, message). Binary scenario files are memory-mapped;
+        # JSON, NDJSON and CSV are streamed in.
+        if self.store is not None and path is None:
+            return self._load_stored_scenarios()
+        path = path or self.scenarios_path
+        if path == self.scenarios_path and not os.path.exists(path) and os.path.exists(LEGACY_SCENARIOS_FILE_PATH):
+            path = LEGACY_SCENARIOS_FILE_PATH
+        if os.path.exists(path):
+            try:
+                if scenario_file.is_scenario_file(path):
+                    coins, rows = scenario_file.load_scenarios(path)
+                    if list(coins) == self.registry.symbols:
+                        self.engine.adopt(rows)
+                        self._order = None
+                        self.persisted_rows = len(rows) if path == self.scenarios_path else 0
+                        self.scenario_prices_version += 1
+                    else:
+                        self.future_prices = self.remap_columns(coins, rows)
+                else:
+                    self.import_future_prices(path, progress)
+                return True, "Scenarios loaded from file."
+            except (OSError, ValueError) as e:
+                return False, f"Failed to load scenarios: {e}"
+        return False, "No scenarios file found."
 
-    def save_future_prices(self):
+    def _load_stored_scenarios(self):
         try:
-            data = [list(p) for p in self.future_prices]
-            with open(SCENARIOS_FILE_PATH, "w") as f:
-                json.dump(data, f)
+            stored = self.store.load_scenarios(self.portfolio)
+        except Exception as e:
+            return False, f"Failed to load scenarios: {e}"
+        if stored is None:
+            return False, "No scenarios stored."
+        coins, rows, ids = stored
+        self.future_prices = self.remap_columns(coins, rows)
+        # Remapped columns are only written back on the next full save
+        if list(coins) == self.registry.symbols:
+            self.scenario_ids = ids
+            self.persisted_rows = len(ids)
+        else:
+            self.scenario_ids = []
+        return True, "Scenarios loaded from database."
+
+    @instrumentation.timed("io.import_scenarios")
+    def import_future_prices(self, path, progress=None):
+        # Streams a JSON, NDJSON or CSV file in fixed-size batches; raises on bad
+        # input, leaving the current scenarios untouched
+        engine = ScenarioEngine(len(self.registry))
+        with portfolio_io.ScenarioReader(path, progress=progress) as reader:
+            for batch in reader.batches():
+                engine.extend(self.remap_columns(reader.coins, batch))
+        self.engine = engine
+        self._order = None
+        self.persisted_rows = 0
+        self.scenario_prices_version += 1
+
+    @instrumentation.timed("io.export_scenarios")
+    def export_future_prices(self, path, progress=None):
+        portfolio_io.write_scenarios(path, self.registry.symbols, self.future_prices, progress=progress)
+
+    def import_holdings(self, path):
+        return self.update_holdings(portfolio_io.read_holdings(path))
+
+    def export_holdings(self, path):
+        portfolio_io.write_holdings(path, self.holdings)
+
+    def remap_columns(self, coins, rows):
+        # Reorders file columns into registry columns; coins the file lacks get price 0
+        if list(coins) == self.registry.symbols:
+            return rows
+        prices = np.zeros((len(rows), len(self.registry)))
+        for j, symbol in enumerate(coins):
+            if symbol in self.registry:
+                prices[:, self.registry.index_of(symbol)] = rows[:, j]
+        return prices
+
+    @instrumentation.timed("persist.save_scenarios")
+    def save_future_prices(self, path=None):
+        # .json, .ndjson and .csv paths are exported as text; otherwise the binary
+        # format is written, appending to the existing file when only new rows were added
+        if self.store is not None and path is None:
+            return self._save_stored_scenarios()
+        path = path or self.scenarios_path
+        try:
+            symbols = self.registry.symbols
+            if portfolio_io.file_format(path):
+                self.export_future_prices(path)
+            elif path == self.scenarios_path and self._can_append():
+                scenario_file.append_scenarios(path, symbols, self.future_prices[self.persisted_rows:])
+                self.persisted_rows = len(self.engine)
+            else:
+                if isinstance(self.engine.prices, np.memmap):
+                    # Detach from the mapped file first; it can't be replaced while mapped on Windows
+                    self.engine.detach()
+                scenario_file.write_scenarios(path, symbols, self.future_prices)
+                if path == self.scenarios_path:
+                    self.persisted_rows = len(self.engine)
             return True, "Scenarios saved to file."
         except Exception as e:
             return False, f"Failed to save scenarios: {e}"
 
-    def add_future_scenario(self, btc_price, eth_price, xrp_price):
+    def _save_stored_scenarios(self):
+        # Rows past persisted_rows are dropped from the database and re-added;
+        # the persisted prefix is left alone
+        try:
+            stale = self.scenario_ids[self.persisted_rows:]
+            if self.persisted_rows == 0:
+                self.scenario_ids = self.store.replace_scenarios(self.registry.symbols, self.future_prices,
+                                                                 self.portfolio)
+            else:
+                if stale:
+                    self.store.delete_scenarios(stale)
+                self.scenario_ids = self.scenario_ids[:self.persisted_rows] + self.store.append_scenarios(
+                    self.registry.symbols, self.future_prices[self.persisted_rows:], self.portfolio)
+            self.persisted_rows = len(self.engine)
+            return True, "Scenarios saved to database."
+        except Exception as e:
+            return False, f"Failed to save scenarios: {e}"
+
+    def _can_append(self):
+        if self.persisted_rows == 0 or not os.path.exists(self.scenarios_path):
+            return False
+        try:
+            coins, data_offset = scenario_file.read_header(self.scenarios_path)
+        except (OSError, ValueError):
+            return False
+        return coins == self.registry.symbols and \
+            scenario_file.row_count(self.scenarios_path, len(coins), data_offset) == self.persisted_rows
+
+    def add_future_scenario(self, prices):
         try:
-            future_btc_price = float(btc_price)
-            future_eth_price = float(eth_price)
-            future_xrp_price = float(xrp_price)
-            self.future_prices.append((future_btc_price, future_eth_price, future_xrp_price))
+            self.engine.append(self.amounts_vector(prices))
             return True
         except ValueError:
             return False
 
+    @instrumentation.timed("scenarios.generate")
+    def generate_scenarios(self, current_prices, count, history, model="gbm", horizon_days=MONTE_CARLO_HORIZON_DAYS,
+                           seed=None, workers=None):
+        # Appends `count` Monte Carlo scenarios fitted to the stored price history.
+        # Raises ValueError if there isn't enough history or no current prices.
+        if not current_prices:
+            raise ValueError("Current prices are needed to generate scenarios.")
+        drift, shocks = monte_carlo.estimate_parameters(history, self.registry.symbols)
+        start = len(self.engine)
+        try:
+            monte_carlo.generate_prices(self.engine.allocate(count), self.price_vector(current_prices), drift, shocks,
+                                        horizon_days, model, seed, workers)
+        except Exception:
+            self.engine.truncate(start)
+            self.scenario_prices_version += 1
+            raise
+
+    @instrumentation.timed("scenarios.risk_summary")
+    def risk_summary(self, confidences=MONTE_CARLO_CONFIDENCES, percentiles=MONTE_CARLO_PERCENTILES):
+        # Percentile bands and VaR/CVaR of the future scenarios' total worth;
+        # call calculate_scenarios first
+        return monte_carlo.risk_summary(self.scenarios[1:, 0], self.scenarios[0, 0], confidences, percentiles)
+
+    @instrumentation.timed("scenarios.calculate")
     def calculate_scenarios(self, current_prices):
         if not current_prices:
             return
 
         try:
-            btc_owned = self.holdings["btc"]
-            eth_owned = self.holdings["eth"]
-            xrp_owned = self.holdings["xrp"]
+            self._revalue_future_rows()
+            self.scenarios = self._worths[:len(self.engine) + 1]
+            self.scenarios[0, 1:] = self.current_worths(current_prices)
+            self.scenarios[0, 0] = self.scenarios[0, 1:].sum()
+            self.scenarios_versions = (self.holdings_version, self.scenario_prices_version)
+            return True
+        except Exception:
+            return False
 
-            current_btc_worth = btc_owned * current_prices["btc"]
-            current_eth_worth = eth_owned * current_prices["eth"]
-            current_xrp_worth = xrp_owned * current_prices["xrp"]
-            current_total_worth = current_btc_worth + current_eth_worth + current_xrp_worth
+    def _revalue_future_rows(self):
+        # Future rows depend only on the holdings and the scenario prices, so a
+        # price tick costs nothing here. A full pass runs when scenario rows
+        # changed; otherwise each changed holding rewrites one column (adjusting
+        # the totals by the difference) and appended rows are valued on their own.
+        count = len(self.engine)
+        holdings = self.holdings_vector
+        valued_rows = len(self.scenarios) - 1 if self._valued_holdings is not None else 0
+        full = (self._valued_holdings is None or self._valued_prices_version != self.scenario_prices_version
+                or count < valued_rows)
+        if not full:
+            changed = np.flatnonzero(holdings != self._valued_holdings)
+            # Past a third of the coins a single pass is cheaper
+            full = 3 * len(changed) > len(holdings) or \
+                self._incremental_updates + len(changed) > SCENARIO_RESYNC_UPDATES
 
-            self.scenarios = [(current_total_worth, current_btc_worth, current_eth_worth, current_xrp_worth)]
+        width = len(self.registry) + 1
+        if full:
+            # Reuse the buffer unless it is too small or far too big
+            if not count + 1 <= len(self._worths) <= 4 * (count + 1):
+                self._worths = np.empty((count + 1, width))
+        elif len(self._worths) < count + 1:
+            grown = np.empty((max(count + 1, 2 * len(self._worths)), width))
+            grown[:valued_rows + 1] = self._worths[:valued_rows + 1]
+            self._worths = grown
 
-            for future_btc_price, future_eth_price, future_xrp_price in self.future_prices:
-                future_btc_worth = btc_owned * future_btc_price
-                future_eth_worth = eth_owned * future_eth_price
-                future_xrp_worth = xrp_owned * future_xrp_price
-                future_total_worth = future_btc_worth + future_eth_worth + future_xrp_worth
-                self.scenarios.append((future_total_worth, future_btc_worth, future_eth_worth, future_xrp_worth))
+        instrumentation.count("scenarios.revalue_full" if full else "scenarios.revalue_incremental")
+        if full:
+            self.engine.evaluate_rows(holdings, self._worths, 0)
+            self._incremental_updates = 0
+        else:
+            for column in changed.tolist():
+                self.engine.revalue_coin(self._worths, column, holdings[column])
+            self._incremental_updates += len(changed)
+            if count > valued_rows:
+                self.engine.evaluate_rows(holdings, self._worths, valued_rows)
+        self._valued_holdings = holdings.copy()
+        self._valued_prices_version = self.scenario_prices_version
 
-            return True
-        except Exception:
-            return False
+    def current_worths(self, current_prices):
+        # Per-coin worth of the current holdings, registry-ordered. Shared by the
+        # scenario table, the worth text and the allocation chart: recomputed
+        # only when the holdings or the prices dict change (CryptoAPI replaces
+        # the dict on every update rather than mutating it).
+        cached = self._current_valuation
+        if cached is not None and cached[0] is current_prices and cached[1] == self.holdings_version:
+            return cached[2]
+        worths = self.holdings_vector * self.price_vector(current_prices)
+        self._current_valuation = (current_prices, self.holdings_version, worths)
+        return worths
 
     def get_current_worth_text(self, current_prices):
         if not current_prices:
             return "Current Worth: Not fetched yet"
-        
-        btc_owned = self.holdings["btc"]
-        eth_owned = self.holdings["eth"]
-        xrp_owned = self.holdings["xrp"]
 
-        current_btc_worth = btc_owned * current_prices["btc"]
-        current_eth_worth = eth_owned * current_prices["eth"]
-        current_xrp_worth = xrp_owned * current_prices["xrp"]
-        current_total_worth = current_btc_worth + current_eth_worth + current_xrp_worth
+        worths = self.current_worths(current_prices)
+        parts = [f"{label} ${worth:.2f}" for label, worth in zip(self.registry.labels, worths.tolist())]
+        return f"Current Worth: {', '.join(parts)}, Total ${worths.sum():.2f}"
 
-        return f"Current Worth: BTC ${current_btc_worth:.2f}, ETH ${current_eth_worth:.2f}, XRP ${current_xrp_worth:.2f}, Total ${current_total_worth:.2f}"
+    def format_scenario(self, name, prices, worths):
+        # prices: per-coin prices, worths: (total, per-coin worths...) as plain floats
+        price_parts = ", ".join(f"{coin.symbol.upper()} ${price:.{coin.precision}f}"
+                                for coin, price in zip(self.registry, prices))
+        worth_parts = ", ".join(f"{label} ${worth:.2f}" for label, worth in zip(self.registry.labels, worths[1:]))
+        return f"{name}: Prices ({price_parts}) | Worth: Total ${worths[0]:.2f}, {worth_parts}"
 
     def get_scenarios_display_data(self, current_prices):
-        scenarios_display = []
-        for i, (total, btc_worth, eth_worth, xrp_worth) in enumerate(self.scenarios):
-            if i == 0:
-                btc_price = current_prices.get('btc', 0)
-                eth_price = current_prices.get('eth', 0)
-                xrp_price = current_prices.get('xrp', 0)
-                display_str = f"Current: Prices (BTC ${btc_price:.2f}, ETH ${eth_price:.2f}, XRP ${xrp_price:.4f}) | Worth: Total ${total:.2f}, BTC ${btc_worth:.2f}, ETH ${eth_worth:.2f}, XRP ${xrp_worth:.2f}"
-            else:
-                future_btc_price, future_eth_price, future_xrp_price = self.future_prices[i - 1]
-                display_str = f"Future {i}: Prices (BTC ${future_btc_price:.2f}, ETH ${future_eth_price:.2f}, XRP ${future_xrp_price:.4f}) | Worth: Total ${total:.2f}, BTC ${btc_worth:.2f}, ETH ${eth_worth:.2f}, XRP ${xrp_worth:.2f}"
-            scenarios_display.append(display_str)
-        return scenarios_display
+        # Lazy: rows are formatted (or fetched from the cache) as they are indexed
+        return ScenarioDisplayRows(self, current_prices)
+
+    def get_scenario_display_row(self, index, current_prices):
+        # Formats a single row, so views can format only what they show. Future
+        # rows depend only on their prices and the holdings, so they come from an
+        # LRU cache that survives price ticks; the current row is always formatted.
+        if index == 0:
+            return self.format_scenario("Current", self.price_vector(current_prices).tolist(),
+                                        self.scenarios[0].tolist())
+        # Keyed by engine row, so moving a scenario keeps its cached text
+        return self._cached_future_row(self.engine_row(index), *self.scenarios_versions)
+
+    def _format_future_row(self, row, holdings_version, prices_version):
+        # The versions only form part of the cache key
+        return self.format_scenario(f"Future {row + 1}", self.engine.prices[row].tolist(),
+                                    self.scenarios[row + 1].tolist())
+
+    def scenario_name(self, index):
+        # Display label of a row; future scenarios keep theirs when moved
+        return "Current" if index == 0 else f"Future {self.engine_row(index) + 1}"
+
+    @property
+    def order(self):
+        # Engine row shown at each future position
+        count = len(self.engine)
+        if self._order is None:
+            return np.arange(count)
+        if len(self._order) != count:
+            # Rows appended since the last reorder go at the end; truncated ones drop out
+            kept = self._order[self._order < count]
+            self._order = np.concatenate([kept, np.arange(len(kept), count)])
+        return self._order
+
+    def engine_row(self, index):
+        # Engine row of display row `index` (1 = first future scenario)
+        return index - 1 if self._order is None else int(self.order[index - 1])
+
+    def ordered_scenarios(self):
+        # self.scenarios with future rows in display order (a copy once reordered)
+        if self._order is None:
+            return self.scenarios
+        order = self.order
+        order = order[order < len(self.scenarios) - 1]
+        return self.scenarios[np.concatenate(([0], order + 1))]
+
+    def get_scenario_row_values(self, current_prices):
+        # Every row as one (rows x values) array: worths followed by the row's
+        # prices, in display order. For exports; views format rows one at a time.
+        if len(self.scenarios) == 0:
+            return np.empty((0, 2 * len(self.registry) + 1))
+        prices = np.vstack([self.price_vector(current_prices), self.future_prices])
+        scenarios = self.ordered_scenarios()
+        return np.hstack([scenarios, prices[:len(scenarios)]])
 
     def reorder_future_prices(self, from_index, to_index):
-        if from_index < 1 or to_index < 1:
+        # Moves display row from_index to to_index (1-based; row 0 is "Current").
+        # Only the order index changes, so nothing needs revaluing.
+        count = len(self.engine)
+        if not (1 <= from_index <= count and 1 <= to_index <= count):
             return False
-        
-        fp_from_index = from_index - 1
-        fp_to_index = to_index - 1
-        
-        if 0 <= fp_from_index < len(self.future_prices) and 0 <= fp_to_index < len(self.future_prices):
-            fp_item = self.future_prices.pop(fp_from_index)
-            self.future_prices.insert(fp_to_index, fp_item)
-            return True
-        return False
+
+        order = self._order = self.order
+        row = order[from_index - 1]
+        if from_index < to_index:
+            order[from_index - 1:to_index - 1] = order[from_index:to_index]
+        else:
+            order[to_index:from_index] = order[to_index - 1:from_index - 1]
+        order[to_index - 1] = row
+        self._positions = None
+
+        if self.store is not None and max(from_index, to_index) <= self.persisted_rows:
+            self._move_stored_scenario(from_index - 1, to_index - 1)
+        else:
+            # Rows from the first moved one on no longer match the file
+            self.persisted_rows = min(self.persisted_rows, min(from_index, to_index) - 1)
+        return True
+
+    @instrumentation.timed("scenarios.query")
+    def query_scenarios(self, sort=None, descending=False, where=(), limit=None):
+        # Display rows (1-based, as get_scenario_display_row takes them) of the
+        # future scenarios passing every (column, operator, value) filter in
+        # `where`, ordered by the `sort` column or else in display order, at
+        # most `limit` of them. Columns are "total" or a coin symbol (that
+        # coin's worth); value is a number or "current" for the current row's
+        # worth, so ("total", "<", "current") finds the losing scenarios.
+        # Runs on the numeric worths, so calculate_scenarios first.
+        count = len(self.engine)
+        if self.scenarios_versions != (self.holdings_version, self.scenario_prices_version) or \
+                len(self.scenarios) != count + 1:
+            raise ValueError("Scenarios are out of date; calculate them first")
+        worths = self.scenarios[1:]
+
+        mask = None
+        for column, op, value in where:
+            if op not in QUERY_OPERATORS:
+                raise ValueError(f"Unknown operator: {op}")
+            column = self._query_column(column)
+            threshold = self.scenarios[0, column] if value == "current" else float(value)
+            passed = QUERY_OPERATORS[op](worths[:, column], threshold)
+            mask = passed if mask is None else np.logical_and(mask, passed, out=mask)
+
+        if sort is None:
+            if self._order is not None:
+                mask = None if mask is None else mask[self.order]
+            rows = np.arange(count) if mask is None else np.flatnonzero(mask)
+            return rows[:limit] + 1
+
+        column = self._query_column(sort)
+        candidates = count if mask is None else np.count_nonzero(mask)
+        if limit is not None and limit < candidates // 8 and column not in self._sort_indexes_for_current():
+            # Top or bottom k by partial selection, without a full sort
+            rows = np.arange(count) if mask is None else np.flatnonzero(mask)
+            values = worths[rows, column] if mask is not None else worths[:, column]
+            if descending:
+                values = -values
+            picked = np.argpartition(values, limit)[:limit] if limit else np.empty(0, dtype=np.intp)
+            rows = rows[picked[np.argsort(values[picked], kind="stable")]]
+        else:
+            rows = self._sorted_rows(column)
+            if descending:
+                rows = rows[::-1]
+            if mask is not None:
+                rows = rows[mask[rows]]
+            rows = rows[:limit]
+        return self.display_rows(rows)
+
+    def display_rows(self, rows):
+        # 1-based display rows of the given engine rows
+        if self._order is None:
+            return rows + 1
+        if self._positions is None or len(self._positions) != len(self.engine):
+            order = self.order
+            self._positions = np.empty(len(order), dtype=np.intp)
+            self._positions[order] = np.arange(len(order))
+        return self._positions[rows] + 1
+
+    def _query_column(self, name):
+        if name == "total":
+            return 0
+        if name in self.registry:
+            return self.registry.index_of(name) + 1
+        raise ValueError(f"Unknown column: {name}")
+
+    def _sort_indexes_for_current(self):
+        # Drops the cached sorts once holdings or scenarios have changed
+        key = (*self.scenarios_versions, len(self.scenarios))
+        if self._sort_key != key:
+            self._sort_indexes = {}
+            self._sort_key = key
+        return self._sort_indexes
+
+    def _sorted_rows(self, column):
+        indexes = self._sort_indexes_for_current()
+        if column not in indexes:
+            indexes[column] = np.argsort(self.scenarios[1:, column], kind="stable")
+        return indexes[column]
+
+    @instrumentation.timed("scenarios.sort")
+    def sort_future_prices(self, key, descending=False):
+        # Bulk reorder by "worth" (scenario total worth; calculate_scenarios
+        # first) or by a coin symbol's price, as one stable argsort
+        if key == "worth":
+            if len(self.scenarios) - 1 != len(self.engine):
+                return False
+            values = self.scenarios[1:, 0]
+        elif key in self.registry:
+            values = self.engine.prices[:, self.registry.index_of(key)]
+        else:
+            raise ValueError(f"Unknown sort key: {key}")
+        self._order = np.argsort(-values if descending else values, kind="stable")
+        self._positions = None
+        self.persisted_rows = 0
+        return True
+
+    def _move_stored_scenario(self, from_row, to_row):
+        # One database row rewritten, however far it moved
+        ids = self.scenario_ids
+        ids.insert(to_row, ids.pop(from_row))
+        try:
+            self.store.move_scenario(ids[to_row], ids[to_row - 1] if to_row > 0 else None,
+                                     ids[to_row + 1] if to_row + 1 < len(ids) else None, self.portfolio)
+        except Exception:
+            # Leave it to the next save to rewrite from here on
+            self.persisted_rows = min(from_row, to_row)
 
     def get_portfolio_allocation_data(self, current_prices):
         if not current_prices:
             return None
-        
-        btc_owned = self.holdings["btc"]
-        eth_owned = self.holdings["eth"]
-        xrp_owned = self.holdings["xrp"]
 
-        current_btc_worth = btc_owned * current_prices["btc"]
-        current_eth_worth = eth_owned * current_prices["eth"]
-        current_xrp_worth = xrp_owned * current_prices["xrp"]
-        total_worth = current_btc_worth + current_eth_worth + current_xrp_worth
+        worths = self.current_worths(current_prices)
+        total_worth = worths.sum()
 
         if total_worth == 0:
             return None
 
+        # Only coins actually held get a wedge
+        held = np.flatnonzero(worths)
         return {
-            "labels": ['BTC', 'ETH', 'XRP'],
-            "sizes": [current_btc_worth, current_eth_worth, current_xrp_worth],
-            "total": total_worth
-        }
\ No newline at end of file
+            "labels": [self.registry.labels[i] for i in held],
+            "sizes": worths[held].tolist(),
+            "colors": [self.registry[i].color for i in held],
+            "total": float(total_worth)
+        }
+
+
+class ScenarioDisplayRows(Sequence):
+    # Read-only sequence of display strings for every scenario row
+    def __init__(self, portfolio_manager, current_prices):
+        self.portfolio_manager = portfolio_manager
+        self.current_prices = current_prices
+
+    def __len__(self):
+        return len(self.portfolio_manager.scenarios)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("scenario row out of range")
+        return self.portfolio_manager.get_scenario_display_row(index, self.current_prices)
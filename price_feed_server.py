@@ -0,0 +1,147 @@
+# Local stand-in for an exchange WebSocket ticker feed, for tests and benchmarks:
+#
+#     python price_feed_server.py --port 8765 --rate 20
+#
+# then set PRICE_STREAM_URL = "ws://127.0.0.1:8765/ticker". Each subscribed
+# client gets one ticker per 1/rate seconds, cycling through its symbols, with
+# prices on a seeded random walk. Speaks just enough RFC 6455 for
+# StreamingPriceSource (see price_sources.py for the message format).
+import argparse
+import json
+import math
+import random
+import socket
+import socketserver
+import threading
+import time
+
+from coin_registry import CoinRegistry
+from constants_pyside6 import COINS_FILE_PATH
+from websocket_client import (OPCODE_CLOSE, OPCODE_TEXT, WebSocketError, accept_key, encode_frame,
+                              read_frame)
+
+START_PRICES = {"btc": 60000.0, "eth": 3000.0, "xrp": 0.5}
+
+
+class _FeedHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        feed = self.server.feed
+        headers = {}
+        self.rfile.readline()
+        while True:
+            line = self.rfile.readline().decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key")
+        if key is None or headers.get("upgrade", "").lower() != "websocket":
+            self.wfile.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+            return
+        self.wfile.write((f"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                          f"Sec-WebSocket-Accept: {accept_key(key)}\r\n\r\n").encode())
+
+        try:
+            _, opcode, payload = read_frame(self.rfile)
+            symbols = json.loads(payload).get("symbols", []) if opcode == OPCODE_TEXT else []
+        except (WebSocketError, ValueError):
+            return
+        symbols = [symbol for symbol in symbols if symbol in feed.prices] or list(feed.prices)
+        # Watch for the client going away while we are busy sending
+        closed = threading.Event()
+        threading.Thread(target=self._drain, args=(closed,), daemon=True).start()
+
+        interval = 1.0 / feed.rate
+        next_send = time.perf_counter()
+        index = 0
+        try:
+            while not closed.is_set() and not feed.stopped.is_set():
+                message = feed.tick(symbols[index % len(symbols)])
+                index += 1
+                self.wfile.write(encode_frame(OPCODE_TEXT, json.dumps(message).encode()))
+                next_send += interval
+                closed.wait(max(0.0, next_send - time.perf_counter()))
+        except OSError:
+            pass
+        finally:
+            # Unblocks the drain thread, which holds rfile until it sees EOF
+            try:
+                self.request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _drain(self, closed):
+        try:
+            while read_frame(self.rfile)[1] != OPCODE_CLOSE:
+                pass
+        except (OSError, WebSocketError):
+            pass
+        closed.set()
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class PriceFeedServer:
+    def __init__(self, symbols, host="127.0.0.1", port=0, rate=20.0, volatility=0.001, seed=None,
+                 on_send=None):
+        self.prices = {symbol: START_PRICES.get(symbol, 100.0) for symbol in symbols}
+        self.rate = rate
+        self.volatility = volatility  # per-tick log-price standard deviation
+        self.random = random.Random(seed)
+        self.on_send = on_send  # called with (symbol, price, sent_at) for each tick
+        self.stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _FeedHandler)
+        self._server.feed = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"ws://{host}:{port}/ticker"
+
+    def tick(self, symbol):
+        with self._lock:
+            price = self.prices[symbol] * math.exp(self.random.gauss(0.0, self.volatility))
+            self.prices[symbol] = price
+        sent_at = time.time()
+        if self.on_send is not None:
+            self.on_send(symbol, price, sent_at)
+        return {"type": "ticker", "symbol": symbol, "price": price, "market_cap": 0.0,
+                "volume_24h": 0.0, "change_24h": 0.0, "time": sent_at}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in WebSocket ticker feed")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate", type=float, default=20.0, help="ticks per second per client")
+    parser.add_argument("--coins", default=COINS_FILE_PATH, help="coin registry file")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    server = PriceFeedServer(CoinRegistry.load(args.coins).symbols, args.host, args.port, args.rate, seed=args.seed)
+    print(f"Serving ticks on {server.url}")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
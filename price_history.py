@@ -0,0 +1,150 @@
+import bisect
+import contextlib
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+
+from constants_pyside6 import PRICE_HISTORY_DIR
+
+HISTORY_MAGIC = b"CPHIST01"
+HISTORY_HEADER_SIZE = 16  # magic + little-endian record size, padded
+
+# One fixed-width record per fetch; timestamps are epoch seconds
+TICK_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("price", "<f8"),
+    ("market_cap", "<f8"),
+    ("volume", "<f8"),
+    ("change_24h", "<f8"),
+])
+
+
+class _TimestampColumn:
+    # Sequence view over a memmapped file's timestamp field, so bisect only
+    # touches the O(log n) records it probes instead of copying the column.
+    def __init__(self, ticks):
+        self.ticks = ticks
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def __getitem__(self, index):
+        return self.ticks[index]["timestamp"]
+
+
+@contextlib.contextmanager
+def _file_lock(f):
+    # Exclusive lock held while appending, so two processes (say the GUI and
+    # the daemon) recording the same coin can't interleave their writes
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class PriceHistoryStore:
+    # Append-only tick files, one per coin (<dir>/<symbol>.ticks). Records are
+    # kept in timestamp order, which doubles as the index for range lookups.
+    def __init__(self, directory=PRICE_HISTORY_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def path_for(self, symbol):
+        return os.path.join(self.directory, f"{symbol}.ticks")
+
+    def append_snapshot(self, timestamp, current_prices, market_info):
+        for symbol, price in current_prices.items():
+            info = market_info.get(symbol, {})
+            record = np.array([(timestamp, price, info.get("market_cap", 0.0),
+                                info.get("24h_vol", 0.0), info.get("24h_change", 0.0))], dtype=TICK_DTYPE)
+            self.append(symbol, record)
+
+    def append(self, symbol, records):
+        records = np.asarray(records, dtype=TICK_DTYPE)
+        if len(records) == 0:
+            return 0
+        # Keep the file sorted: order the batch and drop anything not newer than what is stored
+        records = np.sort(records, order="timestamp", kind="stable")
+        path = self.path_for(symbol)
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, open(os.open(path, os.O_RDWR | os.O_CREAT, 0o666), "r+b") as f, _file_lock(f):
+            size = f.seek(0, os.SEEK_END)
+            if size < HISTORY_HEADER_SIZE:
+                # New, or torn while its header was being written
+                f.seek(0)
+                f.truncate()
+                f.write(self._header())
+                count = 0
+            else:
+                f.seek(0)
+                if f.read(len(HISTORY_MAGIC)) != HISTORY_MAGIC:
+                    raise ValueError(f"Not a price history file: {path}")
+                # Cut off a torn record left by an interrupted append, so
+                # new records start on a record boundary
+                count = (size - HISTORY_HEADER_SIZE) // TICK_DTYPE.itemsize
+                f.truncate(HISTORY_HEADER_SIZE + count * TICK_DTYPE.itemsize)
+
+            # The newest stored tick is read from the file under the lock, as
+            # another process may have appended since this one last looked
+            if count:
+                f.seek(HISTORY_HEADER_SIZE + (count - 1) * TICK_DTYPE.itemsize)
+                last = np.frombuffer(f.read(TICK_DTYPE.itemsize), dtype=TICK_DTYPE)[0]["timestamp"]
+                records = records[records["timestamp"] > last]
+            if len(records) == 0:
+                return 0
+            f.seek(0, os.SEEK_END)
+            f.write(records.tobytes())
+            return len(records)
+
+    def ticks(self, symbol):
+        # Zero-copy, read-only view of every record for the coin
+        path = self.path_for(symbol)
+        if not os.path.exists(path):
+            return np.empty(0, dtype=TICK_DTYPE)
+        size = os.path.getsize(path) - HISTORY_HEADER_SIZE
+        count = max(0, size // TICK_DTYPE.itemsize)  # ignore a torn trailing record
+        if count == 0:
+            return np.empty(0, dtype=TICK_DTYPE)
+        with open(path, "rb") as f:
+            if f.read(len(HISTORY_MAGIC)) != HISTORY_MAGIC:
+                raise ValueError(f"Not a price history file: {path}")
+        return np.memmap(path, dtype=TICK_DTYPE, mode="r", offset=HISTORY_HEADER_SIZE, shape=(count,))
+
+    def range(self, symbol, start=None, end=None):
+        # Records with start <= timestamp < end, located by binary search
+        ticks = self.ticks(symbol)
+        column = _TimestampColumn(ticks)
+        lo = 0 if start is None else bisect.bisect_left(column, start)
+        hi = len(ticks) if end is None else bisect.bisect_left(column, end, lo)
+        return ticks[lo:hi]
+
+    def latest(self, symbol):
+        ticks = self.ticks(symbol)
+        return ticks[-1] if len(ticks) else None
+
+    def symbols(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-len(".ticks")] for name in os.listdir(self.directory) if name.endswith(".ticks"))
+
+    @staticmethod
+    def _header():
+        header = HISTORY_MAGIC + TICK_DTYPE.itemsize.to_bytes(4, "little")
+        return header.ljust(HISTORY_HEADER_SIZE, b"\0")
@@ -0,0 +1,482 @@
+# Where prices come from. Every source speaks in snapshots:
+#     ({symbol: price}, {symbol: {"market_cap", "24h_vol", "24h_change"}})
+# Pull sources implement fetch() and are polled on a schedule; streaming
+# sources push partial snapshots (just the coins that ticked) from their own
+# thread. CryptoAPI owns one of each: the pull source named by PRICE_SOURCES
+# (CoinGecko alone by default, several behind an AggregatePriceSource), plus
+# an optional WebSocket ticker feed that, while it is up, replaces polling.
+import collections
+import datetime
+import json
+import statistics
+import threading
+import time
+import urllib.parse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from constants_pyside6 import (COINGECKO_API_URL, COINGECKO_PRICE_PARAMS, COINGECKO_MAX_URL_LENGTH,
+                               BINANCE_API_URL, BINANCE_QUOTE_ASSET, PRICE_SOURCES, PRICE_AGGREGATION,
+                               PRICE_SOURCE_TIMEOUT_S, PRICE_SOURCE_STATS_WINDOW, PRICE_STREAM_TIMEOUT_S,
+                               AUTO_REFRESH_BACKOFF_BASE_S)
+from http_client import HTTPStatusError, RateLimitError, parse_retry_after
+import instrumentation
+from websocket_client import WebSocketClient
+
+
+class PriceSourceError(Exception):
+    # Every source of an aggregate failed; errors maps source name -> exception
+    def __init__(self, errors):
+        super().__init__("All price sources failed: " +
+                         "; ".join(f"{name}: {error}" for name, error in errors.items()))
+        self.errors = errors
+
+
+class PriceSource:
+    name = "source"
+
+    def fetch(self):
+        # Returns (snapshot, fresh); fresh is False when nothing new came off
+        # the network (a cache hit or a 304), so there is no tick to record
+        raise NotImplementedError
+
+    def cached_snapshot(self):
+        # (snapshot, fetched_at) from a local cache, however old, or None
+        return None
+
+
+class HttpPriceSource(PriceSource):
+    # REST source: one or more GETs whose decoded JSON bodies parse_prices()
+    # turns into a snapshot. Responses go through the optional ResponseCache.
+    def __init__(self, registry, http_client, cache=None, base_url=None):
+        self.registry = registry
+        self.http = http_client
+        self.cache = cache  # optional ResponseCache shared between processes
+        self.base_url = base_url
+
+    def build_request_urls(self):
+        raise NotImplementedError
+
+    def parse_prices(self, responses):
+        raise NotImplementedError
+
+    def fetch(self):
+        # Performs the HTTP round trips and JSON parsing without touching any
+        # mutable instance state, so it is safe to run on a worker thread.
+        responses = []
+        fresh = False
+        for url in self.build_request_urls():
+            with instrumentation.timer("fetch.http"):
+                body, from_network = self._get(url)
+            with instrumentation.timer("fetch.parse_json"):
+                responses.append(json.loads(body))
+            fresh = fresh or from_network
+        with instrumentation.timer("fetch.parse_prices"):
+            return self.parse_prices(responses), fresh
+
+    def _get(self, url):
+        # Returns (body, from_network). Fresh cache entries skip the network;
+        # stale ones are revalidated with If-None-Match / If-Modified-Since.
+        entry = self.cache.get(url) if self.cache is not None else None
+        if self.cache is not None and self.cache.is_fresh(entry):
+            return entry["body"], False
+
+        headers = self.cache.conditional_headers(entry) if self.cache is not None else {}
+        try:
+            response = self.http.get(url, headers)
+        except HTTPStatusError as e:
+            if e.status == 429:
+                raise RateLimitError(parse_retry_after(e.headers.get("Retry-After"))) from e
+            raise
+
+        if response.status == 304 and entry is not None:
+            self.cache.revalidated(entry)
+            return entry["body"], False
+
+        body = response.body.decode()
+        if self.cache is not None:
+            self.cache.put(url, body, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return body, True
+
+    def cached_snapshot(self):
+        # Returns None unless every request is cached
+        if self.cache is None:
+            return None
+        responses = []
+        fetched_at = None
+        for url in self.build_request_urls():
+            entry = self.cache.get(url)
+            if entry is None:
+                return None
+            responses.append(json.loads(entry["body"]))
+            fetched_at = entry["fetched_at"] if fetched_at is None else min(fetched_at, entry["fetched_at"])
+        return self.parse_prices(responses), datetime.datetime.fromtimestamp(fetched_at)
+
+
+class CoinGeckoSource(HttpPriceSource):
+    name = "coingecko"
+
+    def __init__(self, registry, http_client, cache=None, base_url=COINGECKO_API_URL):
+        super().__init__(registry, http_client, cache, base_url)
+
+    def build_request_urls(self):
+        # Pack as many ids into each simple/price call as the URL length limit allows
+        prefix = f"{self.base_url}?ids="
+        suffix = f"&{COINGECKO_PRICE_PARAMS}"
+        budget = COINGECKO_MAX_URL_LENGTH - len(prefix) - len(suffix)
+
+        urls = []
+        batch = []
+        batch_length = 0
+        for coin in self.registry:
+            coin_id = urllib.parse.quote(coin.coingecko_id, safe="-")
+            added_length = len(coin_id) + (1 if batch else 0)
+            if batch and batch_length + added_length > budget:
+                urls.append(prefix + ",".join(batch) + suffix)
+                batch = []
+                added_length = len(coin_id)
+                batch_length = 0
+            batch.append(coin_id)
+            batch_length += added_length
+        if batch:
+            urls.append(prefix + ",".join(batch) + suffix)
+        return urls
+
+    def parse_prices(self, responses):
+        data = {}
+        for response in responses:
+            data.update(response)
+        current_prices = {}
+        market_info = {}
+        for coin in self.registry:
+            # Unknown or delisted ids are simply absent from the response
+            quote = data.get(coin.coingecko_id)
+            if not quote or 'usd' not in quote:
+                continue
+            current_prices[coin.symbol] = quote['usd']
+            market_info[coin.symbol] = {
+                "market_cap": quote.get('usd_market_cap', 0.0),
+                "24h_vol": quote.get('usd_24h_vol', 0.0),
+                "24h_change": quote.get('usd_24h_change', 0.0)
+            }
+
+        return current_prices, market_info
+
+
+class BinanceSource(HttpPriceSource):
+    # 24h tickers quoted in BINANCE_QUOTE_ASSET (a USD stablecoin), all coins in
+    # one request. Binance reports no market cap. It rejects the whole request
+    # if any pair is unlisted, so it suits registries of major coins.
+    name = "binance"
+
+    def __init__(self, registry, http_client, cache=None, base_url=BINANCE_API_URL, quote_asset=BINANCE_QUOTE_ASSET):
+        super().__init__(registry, http_client, cache, base_url)
+        self.quote_asset = quote_asset
+
+    def build_request_urls(self):
+        pairs = [symbol.upper() + self.quote_asset for symbol in self.registry.symbols]
+        return [f"{self.base_url}?symbols={urllib.parse.quote(json.dumps(pairs, separators=(',', ':')))}"]
+
+    def parse_prices(self, responses):
+        tickers = {ticker["symbol"]: ticker for response in responses for ticker in response}
+        current_prices = {}
+        market_info = {}
+        for symbol in self.registry.symbols:
+            ticker = tickers.get(symbol.upper() + self.quote_asset)
+            if ticker is None:
+                continue
+            current_prices[symbol] = float(ticker["lastPrice"])
+            market_info[symbol] = {
+                "market_cap": 0.0,
+                "24h_vol": float(ticker.get("quoteVolume", 0.0)),
+                "24h_change": float(ticker.get("priceChangePercent", 0.0)),
+            }
+        return current_prices, market_info
+
+
+SOURCE_TYPES = {source.name: source for source in (CoinGeckoSource, BinanceSource)}
+
+
+class SourceStats:
+    # Per-source health for an aggregate: totals plus the latency of the
+    # most recent calls
+    def __init__(self, window=PRICE_SOURCE_STATS_WINDOW):
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0  # rounds that ended before this source answered
+        self.latencies = collections.deque(maxlen=window)
+        self.last_error = None
+
+    def as_dict(self):
+        latencies = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "error_rate": self.errors / self.requests if self.requests else 0.0,
+            "latency_p50_s": latencies[len(latencies) // 2] if latencies else None,
+            "latency_p95_s": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else None,
+            "last_error": None if self.last_error is None else str(self.last_error),
+        }
+
+
+class AggregatePriceSource(PriceSource):
+    # Queries several pull sources concurrently, one thread each, and merges
+    # what comes back before the timeout:
+    #   "median"  each coin's price is the median over the sources that
+    #             answered; market info comes from the first source, in
+    #             configured order, that has the coin
+    #   "first"   each coin comes from whichever source answered first, and
+    #             the round ends as soon as every coin has a price
+    # A straggler keeps running in the background; later rounds don't query it
+    # again but use its answer if it lands in time, so a hung source never
+    # ties up more than one thread or holds up more than one round.
+    name = "aggregate"
+
+    def __init__(self, sources, registry, strategy=PRICE_AGGREGATION, timeout=PRICE_SOURCE_TIMEOUT_S):
+        if strategy not in ("median", "first"):
+            raise ValueError(f"Unknown aggregation strategy: {strategy}")
+        self.sources = list(sources)
+        self.registry = registry
+        self.strategy = strategy
+        self.timeout = timeout
+        self.stats = {source.name: SourceStats() for source in self.sources}
+        self._lock = threading.Lock()
+        self._running = {}
+        self._executor = ThreadPoolExecutor(max_workers=len(self.sources), thread_name_prefix="price-source")
+
+    def fetch(self):
+        deadline = time.perf_counter() + self.timeout
+        futures = {}
+        started = set()
+        with self._lock:
+            for source in self.sources:
+                # A straggler from an earlier round is not queried twice: its
+                # request counts for this round too, if it answers in time
+                future = self._running.get(source.name)
+                if future is None or future.done():
+                    future = self._executor.submit(self._timed_fetch, source)
+                    self._running[source.name] = future
+                    started.add(future)
+                futures[future] = source
+
+        answered = []  # (source, snapshot, fresh) in arrival order
+        errors = {}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, max(0.0, deadline - time.perf_counter()), FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                source = futures[future]
+                try:
+                    snapshot, fresh = future.result()
+                except Exception as e:
+                    errors[source.name] = e
+                    continue
+                answered.append((source, snapshot, fresh))
+            # Stop early when the rest aren't needed: every coin is priced
+            # ("first"), or only known stragglers are left to wait for
+            if answered and (self.strategy == "first" and self._covered(answered) or not pending & started):
+                pending = set()
+                break
+        with self._lock:
+            for future in pending:
+                name = futures[future].name
+                self.stats[name].timeouts += 1
+                errors[name] = TimeoutError(f"no answer within {self.timeout:g}s")
+
+        if not answered:
+            raise self._failure(errors)
+        return self._combine(answered), any(fresh for _, _, fresh in answered)
+
+    def cached_snapshot(self):
+        for source in self.sources:
+            cached = source.cached_snapshot()
+            if cached is not None:
+                return cached
+        return None
+
+    def source_stats(self):
+        # {source name: SourceStats.as_dict()}
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _timed_fetch(self, source):
+        start = time.perf_counter()
+        try:
+            return source.fetch()
+        except Exception as e:
+            with self._lock:
+                self.stats[source.name].errors += 1
+                self.stats[source.name].last_error = e
+            raise
+        finally:
+            with self._lock:
+                self.stats[source.name].requests += 1
+                self.stats[source.name].latencies.append(time.perf_counter() - start)
+
+    def _covered(self, answered):
+        priced = set()
+        for _, (prices, _), _ in answered:
+            priced.update(prices)
+        return all(symbol in priced for symbol in self.registry.symbols)
+
+    def _combine(self, answered):
+        current_prices = {}
+        market_info = {}
+        if self.strategy == "first":
+            for _, (prices, info), _ in answered:
+                for symbol, price in prices.items():
+                    if symbol not in current_prices:
+                        current_prices[symbol] = price
+                        market_info[symbol] = info[symbol]
+            return current_prices, market_info
+
+        order = {source.name: index for index, source in enumerate(self.sources)}
+        quotes = collections.defaultdict(list)
+        for _, (prices, info), _ in sorted(answered, key=lambda answer: order[answer[0].name]):
+            for symbol, price in prices.items():
+                quotes[symbol].append(price)
+                market_info.setdefault(symbol, info[symbol])
+        for symbol, prices in quotes.items():
+            current_prices[symbol] = statistics.median(prices)
+        return current_prices, market_info
+
+    @staticmethod
+    def _failure(errors):
+        # If every source was rate limited, surface the shortest Retry-After so
+        # the refresh scheduler still honours it
+        if all(isinstance(error, RateLimitError) for error in errors.values()):
+            waits = [error.retry_after for error in errors.values() if error.retry_after is not None]
+            return RateLimitError(min(waits) if waits else None)
+        return PriceSourceError(errors)
+
+
+def build_price_source(registry, http_client, cache=None, names=PRICE_SOURCES, strategy=PRICE_AGGREGATION,
+                       timeout=PRICE_SOURCE_TIMEOUT_S):
+    # A single name gives that source itself; several are queried through an aggregate
+    unknown = [name for name in names if name not in SOURCE_TYPES]
+    if unknown or not names:
+        raise ValueError(f"Unknown price source: {', '.join(unknown) or '(none given)'} "
+                         f"(available: {', '.join(SOURCE_TYPES)})")
+    sources = [SOURCE_TYPES[name](registry, http_client, cache) for name in dict.fromkeys(names)]
+    if len(sources) == 1:
+        return sources[0]
+    return AggregatePriceSource(sources, registry, strategy, timeout)
+
+
+class StreamingPriceSource:
+    # Exchange-style WebSocket ticker feed. After start(), a daemon thread keeps
+    # a connection open, subscribes to the registry's symbols, and calls
+    # on_update(partial snapshot) for every message. A dropped or silent
+    # connection is reported through on_error(exception) and retried with
+    # exponential backoff until stop().
+    #
+    # Client -> server: {"type": "subscribe", "symbols": ["btc", ...]}
+    # Server -> client: a ticker object, or a JSON array of them:
+    #     {"type": "ticker", "symbol": "btc", "price": 1.0,
+    #      "market_cap": 0.0, "volume_24h": 0.0, "change_24h": 0.0}
+    name = "stream"
+
+    def __init__(self, url, registry, timeout=PRICE_STREAM_TIMEOUT_S, context=None):
+        self.url = url
+        self.registry = registry
+        self.timeout = timeout  # no message for this long counts as a dead feed
+        self.context = context
+        self._stop = threading.Event()
+        self._thread = None
+        self._client = None
+
+    def start(self, on_update, on_error):
+        if self._thread is not None:
+            return
+        # Each run gets its own stop event: a reader that is still winding down
+        # after stop() must not be revived by the next start()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop, on_update, on_error), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        client = self._client
+        if client is not None:
+            client.close()  # unblocks the reader thread
+        self._thread = None
+
+    def _run(self, stop, on_update, on_error):
+        failures = 0
+        while not stop.is_set():
+            client = None
+            try:
+                client = WebSocketClient(self.url, self.timeout, self.context).connect()
+                if stop.is_set():
+                    break
+                self._client = client
+                client.send(json.dumps({"type": "subscribe", "symbols": self.registry.symbols}))
+                while not stop.is_set():
+                    message = client.recv()
+                    if message is None:
+                        raise ConnectionError("Price stream closed by server")
+                    with instrumentation.timer("stream.parse"):
+                        update = self.parse_message(message)
+                    if update is not None and not stop.is_set():
+                        failures = 0
+                        on_update(update)
+            except Exception as e:
+                if stop.is_set():
+                    break
+                on_error(e)
+                failures += 1
+            finally:
+                if client is not None:
+                    client.close()
+                    if self._client is client:
+                        self._client = None
+            stop.wait(min(AUTO_REFRESH_BACKOFF_BASE_S * 2 ** min(failures - 1, 6), self.timeout))
+
+    def parse_message(self, message):
+        # Partial snapshot of the registered coins in the message, or None
+        data = json.loads(message)
+        tickers = data if isinstance(data, list) else [data]
+        current_prices = {}
+        market_info = {}
+        for ticker in tickers:
+            symbol = ticker.get("symbol", "").lower()
+            if ticker.get("type") != "ticker" or symbol not in self.registry or "price" not in ticker:
+                continue
+            current_prices[symbol] = float(ticker["price"])
+            market_info[symbol] = {
+                "market_cap": float(ticker.get("market_cap", 0.0)),
+                "24h_vol": float(ticker.get("volume_24h", 0.0)),
+                "24h_change": float(ticker.get("change_24h", 0.0)),
+            }
+        return (current_prices, market_info) if current_prices else None
+
+
+class TickBuffer:
+    # Collects partial snapshots pushed from a stream thread until the GUI
+    # thread drains them, so a burst of ticks costs one redraw.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._prices = {}
+        self._market_info = {}
+
+    def add(self, update):
+        # Returns True if the buffer was empty, i.e. the GUI needs waking up
+        with self._lock:
+            was_empty = not self._prices
+            self._prices.update(update[0])
+            self._market_info.update(update[1])
+            return was_empty
+
+    def drain(self):
+        with self._lock:
+            if not self._prices:
+                return None
+            update = (self._prices, self._market_info)
+            self._prices = {}
+            self._market_info = {}
+            return update
@@ -0,0 +1,49 @@
+import random
+import time
+
+from constants_pyside6 import (AUTO_REFRESH_INTERVAL_S, AUTO_REFRESH_BACKOFF_BASE_S,
+                               AUTO_REFRESH_MAX_BACKOFF_S, AUTO_REFRESH_JITTER)
+from http_client import RateLimitError
+
+
+# Decides when the next price refresh should run. It does no timing itself: each UI
+# feeds it fetch outcomes and drives its own timer (QTimer / after()) with the returned delays.
+class RefreshScheduler:
+    def __init__(self, interval=AUTO_REFRESH_INTERVAL_S, backoff_base=AUTO_REFRESH_BACKOFF_BASE_S,
+                 max_backoff=AUTO_REFRESH_MAX_BACKOFF_S, jitter=AUTO_REFRESH_JITTER):
+        self.interval = interval
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.failures = 0
+        self.paused = False
+        self.next_due = None
+
+    def on_success(self):
+        self.failures = 0
+        return self._schedule(self.interval)
+
+    def on_failure(self, error):
+        self.failures += 1
+        backoff = self.backoff_base * 2 ** min(self.failures - 1, 30)
+        delay = min(self.max_backoff, backoff * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+        # Never come back before the server said we may
+        if isinstance(error, RateLimitError) and error.retry_after is not None:
+            delay = max(delay, error.retry_after)
+
+        return self._schedule(delay)
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        # Returns the delay until the next refresh, or 0 if it fell due while paused
+        self.paused = False
+        if self.next_due is None:
+            return 0
+        return max(0.0, self.next_due - time.monotonic())
+
+    def _schedule(self, delay):
+        self.next_due = time.monotonic() + delay
+        return delay
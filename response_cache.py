@@ -0,0 +1,60 @@
+import hashlib
+import json
+import os
+import time
+
+from constants_pyside6 import RESPONSE_CACHE_DIR, RESPONSE_CACHE_TTL_S
+from persistence import atomic_write_json
+
+
+class ResponseCache:
+    # On-disk HTTP response cache keyed by request URL, one JSON file per URL.
+    # Entries are replaced atomically (temp file + rename), so any number of
+    # processes can share the directory; the last writer wins.
+    def __init__(self, directory=RESPONSE_CACHE_DIR, ttl=RESPONSE_CACHE_TTL_S):
+        self.directory = directory
+        self.ttl = ttl
+
+    def path_for(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+    def get(self, url):
+        try:
+            with open(self.path_for(url), "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Guard against hash collisions and foreign files
+        if entry.get("url") != url:
+            return None
+        return entry
+
+    def is_fresh(self, entry):
+        return entry is not None and time.time() - entry["fetched_at"] < self.ttl
+
+    def put(self, url, body, etag=None, last_modified=None):
+        os.makedirs(self.directory, exist_ok=True)
+        entry = {
+            "url": url,
+            "fetched_at": time.time(),
+            "etag": etag,
+            "last_modified": last_modified,
+            "body": body,
+        }
+        atomic_write_json(self.path_for(url), entry)
+        return entry
+
+    def revalidated(self, entry):
+        # The server answered 304: the cached body is current as of now
+        return self.put(entry["url"], entry["body"], entry.get("etag"), entry.get("last_modified"))
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
@@ -0,0 +1,79 @@
+import numpy as np
+
+INITIAL_CAPACITY = 64
+
+
+class ScenarioEngine:
+    # Stores future scenario prices as one contiguous (N x coins) float64 block
+    # that grows geometrically, and values them against a holdings vector.
+    def __init__(self, n_coins):
+        self.n_coins = n_coins
+        self._prices = np.empty((INITIAL_CAPACITY, n_coins), dtype=np.float64)
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def prices(self):
+        return self._prices[:self._count]
+
+    def set_prices(self, rows):
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, self.n_coins)
+        self._count = 0
+        self._reserve(len(rows))
+        self._prices[:len(rows)] = rows
+        self._count = len(rows)
+
+    def adopt(self, rows):
+        # Uses `rows` itself as the buffer (e.g. a memory-mapped file) instead of
+        # copying it; the first append after this grows into a new array
+        self._prices = rows
+        self._count = len(rows)
+
+    def detach(self):
+        # Moves the rows into a buffer of their own, e.g. to let go of a
+        # memory-mapped file before that file is replaced
+        self._prices = np.array(self.prices)
+
+    def append(self, row):
+        self.extend([row])
+
+    def extend(self, rows):
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, self.n_coins)
+        self._reserve(self._count + len(rows))
+        self._prices[self._count:self._count + len(rows)] = rows
+        self._count += len(rows)
+
+    def allocate(self, count):
+        # Appends `count` uninitialised rows and returns them as a writable view,
+        # so bulk producers can fill the buffer in place
+        self._reserve(self._count + count)
+        self._count += count
+        return self._prices[self._count - count:self._count]
+
+    def truncate(self, count):
+        self._count = min(self._count, count)
+
+    def evaluate_rows(self, holdings, worths, start):
+        # Fills worths rows start + 1.. for scenarios start.., e.g. after appends
+        prices = self.prices[start:]
+        np.multiply(prices, holdings, out=worths[start + 1:self._count + 1, 1:])
+        np.matmul(prices, holdings, out=worths[start + 1:self._count + 1, 0])
+
+    def revalue_coin(self, worths, column, amount):
+        # One coin's amount changed: rewrite its worth column and shift the
+        # totals by the difference, O(N) rather than O(N x coins)
+        coin_worths = worths[1:self._count + 1, column + 1]
+        totals = worths[1:self._count + 1, 0]
+        totals -= coin_worths
+        np.multiply(self.prices[:, column], amount, out=coin_worths)
+        totals += coin_worths
+
+    def _reserve(self, size):
+        if size <= len(self._prices):
+            return
+        capacity = max(size, 2 * len(self._prices))
+        grown = np.empty((capacity, self.n_coins), dtype=np.float64)
+        grown[:self._count] = self._prices[:self._count]
+        self._prices = grown
@@ -0,0 +1,90 @@
+# Binary scenario file: a small header naming the coin columns, followed by one
+# contiguous little-endian float64 (rows x coins) block. The block is mapped,
+# not parsed, on load, and new scenarios are appended to the end of the file.
+#
+# Header: magic (8) | version u32 | coin count u32 | data offset u32 | reserved u32
+#         | coin symbols, utf-8, newline-separated | zero padding to the data offset
+import os
+
+import numpy as np
+
+from persistence import atomic_write
+
+SCENARIO_MAGIC = b"CPSCEN01"
+SCENARIO_FORMAT_VERSION = 1
+SCENARIO_FIXED_HEADER_SIZE = 24
+SCENARIO_DATA_ALIGNMENT = 64  # data block starts on a cache-line boundary
+PRICE_DTYPE = np.dtype("<f8")
+
+
+def is_scenario_file(path):
+    with open(path, "rb") as f:
+        return f.read(len(SCENARIO_MAGIC)) == SCENARIO_MAGIC
+
+
+def read_header(path):
+    # Returns (coins, data_offset); raises ValueError for anything that isn't a
+    # scenario file this version can read
+    with open(path, "rb") as f:
+        fixed = f.read(SCENARIO_FIXED_HEADER_SIZE)
+        if len(fixed) < SCENARIO_FIXED_HEADER_SIZE or fixed[:len(SCENARIO_MAGIC)] != SCENARIO_MAGIC:
+            raise ValueError(f"Not a scenario file: {path}")
+        version, n_coins, data_offset = np.frombuffer(fixed, dtype="<u4", count=3, offset=len(SCENARIO_MAGIC))
+        if version > SCENARIO_FORMAT_VERSION:
+            raise ValueError(f"Scenario file version {version} is newer than supported ({SCENARIO_FORMAT_VERSION})")
+        names = f.read(int(data_offset) - SCENARIO_FIXED_HEADER_SIZE).rstrip(b"\0").decode("utf-8")
+    coins = names.split("\n") if names else []
+    if len(coins) != n_coins:
+        raise ValueError(f"Corrupt scenario file header: {path}")
+    return coins, int(data_offset)
+
+
+def row_count(path, n_coins, data_offset):
+    # Whole rows only: a torn trailing row from an interrupted append is ignored
+    row_size = n_coins * PRICE_DTYPE.itemsize
+    return max(0, os.path.getsize(path) - data_offset) // row_size if row_size else 0
+
+
+def load_scenarios(path):
+    # Returns (coins, prices) where prices is a copy-on-write memmap of the
+    # data block: nothing is read until touched, and in-memory edits (e.g.
+    # reordering) never write through to the file.
+    coins, data_offset = read_header(path)
+    rows = row_count(path, len(coins), data_offset)
+    if rows == 0:
+        return coins, np.empty((0, len(coins)), dtype=np.float64)
+    return coins, np.memmap(path, dtype=PRICE_DTYPE, mode="c", offset=data_offset, shape=(rows, len(coins)))
+
+
+def write_scenarios(path, coins, prices):
+    prices = np.ascontiguousarray(prices, dtype=PRICE_DTYPE)
+    atomic_write(path, lambda f: (f.write(_header(coins)), _write_rows(f, prices)), mode="wb", suffix=".scen")
+
+
+def append_scenarios(path, coins, prices):
+    # Adds rows at the end without rewriting the file; the file's columns must match
+    file_coins, data_offset = read_header(path)
+    if list(file_coins) != list(coins):
+        raise ValueError("Scenario file columns don't match")
+    prices = np.ascontiguousarray(prices, dtype=PRICE_DTYPE)
+    with open(path, "r+b") as f:
+        # Drop any torn row left by an earlier interrupted append
+        f.truncate(data_offset + row_count(path, len(coins), data_offset) * len(coins) * PRICE_DTYPE.itemsize)
+        f.seek(0, os.SEEK_END)
+        _write_rows(f, prices)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _write_rows(f, prices):
+    # Through a memoryview, so a large block isn't duplicated by tobytes()
+    if prices.size:
+        f.write(memoryview(prices).cast("B"))
+
+
+def _header(coins):
+    names = "\n".join(coins).encode("utf-8")
+    size = SCENARIO_FIXED_HEADER_SIZE + len(names)
+    data_offset = -(-size // SCENARIO_DATA_ALIGNMENT) * SCENARIO_DATA_ALIGNMENT
+    fixed = SCENARIO_MAGIC + np.array([SCENARIO_FORMAT_VERSION, len(coins), data_offset, 0], dtype="<u4").tobytes()
+    return (fixed + names).ljust(data_offset, b"\0")
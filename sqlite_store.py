@@ -0,0 +1,225 @@
+# Optional SQLite storage for holdings, scenarios and price history, in place
+# of the JSON holdings file, the binary scenarios file and the .ticks files.
+# Edits are row-level: changing one holding upserts one row, and moving a
+# scenario rewrites only that scenario's sort key. The database runs in WAL
+# mode, so the CLI or a second GUI can read while another process writes.
+#
+# Several portfolios can share one database; rows are keyed by portfolio name.
+# Scenario prices are stored one row per scenario as a float64 blob, in the
+# column order recorded for the portfolio in scenario_sets. Statements are
+# fixed strings, so sqlite3's per-connection cache prepares each one once.
+import json
+import sqlite3
+import threading
+
+import numpy as np
+
+from price_history import TICK_DTYPE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS holdings (
+    portfolio TEXT NOT NULL,
+    coin TEXT NOT NULL,
+    amount REAL NOT NULL,
+    PRIMARY KEY (portfolio, coin)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS scenario_sets (
+    portfolio TEXT PRIMARY KEY,
+    coins TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scenarios (
+    id INTEGER PRIMARY KEY,
+    portfolio TEXT NOT NULL,
+    position REAL NOT NULL,
+    prices BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scenarios_by_position ON scenarios (portfolio, position);
+CREATE TABLE IF NOT EXISTS prices (
+    coin TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    price REAL NOT NULL,
+    market_cap REAL NOT NULL,
+    volume REAL NOT NULL,
+    change_24h REAL NOT NULL,
+    PRIMARY KEY (coin, timestamp)
+) WITHOUT ROWID;
+"""
+
+DEFAULT_PORTFOLIO = "default"
+BUSY_TIMEOUT_S = 10  # how long a writer waits for another process's write to finish
+INSERT_BATCH_ROWS = 8192
+
+
+class SQLiteStore:
+    # One connection shared by every thread of the process (price fetches
+    # record history from worker threads), serialised by a lock
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=BUSY_TIMEOUT_S, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # Durable at checkpoints; a crash can lose only the last transactions, never corrupt
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so id and position
+        # allocation can't race another process
+        return _Transaction(self._db, self._lock)
+
+    # Holdings
+
+    def holdings(self, portfolio=DEFAULT_PORTFOLIO):
+        with self._lock:
+            rows = self._db.execute("SELECT coin, amount FROM holdings WHERE portfolio = ?", (portfolio,))
+            return dict(rows.fetchall())
+
+    def set_holdings(self, amounts, portfolio=DEFAULT_PORTFOLIO):
+        # Upserts just the given coins
+        with self._transaction():
+            self._db.executemany(
+                "INSERT INTO holdings (portfolio, coin, amount) VALUES (?, ?, ?) "
+                "ON CONFLICT (portfolio, coin) DO UPDATE SET amount = excluded.amount",
+                [(portfolio, coin, float(amount)) for coin, amount in amounts.items()])
+
+    # Scenarios
+
+    def load_scenarios(self, portfolio=DEFAULT_PORTFOLIO):
+        # Returns (coins, (N x coins) prices, ids in the same order), or None
+        with self._lock:
+            row = self._db.execute("SELECT coins FROM scenario_sets WHERE portfolio = ?", (portfolio,)).fetchone()
+            if row is None:
+                return None
+            coins = json.loads(row[0])
+            rows = self._db.execute("SELECT id, prices FROM scenarios WHERE portfolio = ? ORDER BY position",
+                                    (portfolio,)).fetchall()
+        ids = [scenario_id for scenario_id, _ in rows]
+        prices = np.frombuffer(b"".join(blob for _, blob in rows), dtype="<f8").reshape(-1, len(coins))
+        return coins, prices.astype(np.float64), ids
+
+    def append_scenarios(self, coins, rows, portfolio=DEFAULT_PORTFOLIO):
+        # Adds rows after the existing ones and returns their ids. Raises
+        # ValueError if the stored scenarios have different columns.
+        with self._transaction():
+            return self._append_scenarios(coins, rows, portfolio)
+
+    def _append_scenarios(self, coins, rows, portfolio):
+        rows = np.ascontiguousarray(rows, dtype="<f8")
+        stored = self._db.execute("SELECT coins FROM scenario_sets WHERE portfolio = ?", (portfolio,)).fetchone()
+        if stored is None:
+            self._db.execute("INSERT INTO scenario_sets (portfolio, coins) VALUES (?, ?)",
+                             (portfolio, json.dumps(list(coins))))
+        elif json.loads(stored[0]) != list(coins):
+            raise ValueError("Stored scenarios have different coins")
+        next_id, next_position = self._db.execute(
+            "SELECT (SELECT COALESCE(MAX(id), 0) + 1 FROM scenarios), "
+            "COALESCE(MAX(position), 0) + 1 FROM scenarios WHERE portfolio = ?", (portfolio,)).fetchone()
+        for start in range(0, len(rows), INSERT_BATCH_ROWS):
+            batch = rows[start:start + INSERT_BATCH_ROWS]
+            self._db.executemany(
+                "INSERT INTO scenarios (id, portfolio, position, prices) VALUES (?, ?, ?, ?)",
+                [(next_id + start + i, portfolio, next_position + start + i, row.tobytes())
+                 for i, row in enumerate(batch)])
+        return list(range(next_id, next_id + len(rows)))
+
+    def delete_scenarios(self, ids):
+        with self._transaction():
+            self._db.executemany("DELETE FROM scenarios WHERE id = ?", [(scenario_id,) for scenario_id in ids])
+
+    def replace_scenarios(self, coins, rows, portfolio=DEFAULT_PORTFOLIO):
+        with self._transaction():
+            self._db.execute("DELETE FROM scenarios WHERE portfolio = ?", (portfolio,))
+            self._db.execute("DELETE FROM scenario_sets WHERE portfolio = ?", (portfolio,))
+            return self._append_scenarios(coins, rows, portfolio)
+
+    def move_scenario(self, scenario_id, before_id, after_id, portfolio=DEFAULT_PORTFOLIO):
+        # Places a scenario between two neighbours (either may be None at the
+        # ends) by giving it the midpoint of their positions: one row written.
+        # Only when repeated moves have used up the float gap between two
+        # neighbours are the positions renumbered.
+        with self._transaction():
+            lookup = "SELECT position FROM scenarios WHERE id = ?"
+            low = self._db.execute(lookup, (before_id,)).fetchone()[0] if before_id is not None else None
+            high = self._db.execute(lookup, (after_id,)).fetchone()[0] if after_id is not None else None
+            if low is None and high is None:
+                return
+            position = (low + high) / 2 if low is not None and high is not None else \
+                low + 1 if high is None else high - 1
+            if low is not None and high is not None and not low < position < high:
+                self._renumber(portfolio)
+                low = self._db.execute(lookup, (before_id,)).fetchone()[0]
+                high = self._db.execute(lookup, (after_id,)).fetchone()[0]
+                position = (low + high) / 2
+            self._db.execute("UPDATE scenarios SET position = ? WHERE id = ?", (position, scenario_id))
+
+    def _renumber(self, portfolio):
+        ids = self._db.execute("SELECT id FROM scenarios WHERE portfolio = ? ORDER BY position", (portfolio,))
+        self._db.executemany("UPDATE scenarios SET position = ? WHERE id = ?",
+                             [(float(i), scenario_id) for i, (scenario_id,) in enumerate(ids.fetchall())])
+
+    # Price history, with the same interface as PriceHistoryStore
+
+    def append_snapshot(self, timestamp, current_prices, market_info):
+        records = []
+        for symbol, price in current_prices.items():
+            info = market_info.get(symbol, {})
+            records.append((symbol, timestamp, price, info.get("market_cap", 0.0), info.get("24h_vol", 0.0),
+                            info.get("24h_change", 0.0)))
+        with self._transaction():
+            self._db.executemany("INSERT OR IGNORE INTO prices VALUES (?, ?, ?, ?, ?, ?)", records)
+
+    def append(self, symbol, records):
+        records = np.asarray(records, dtype=TICK_DTYPE)
+        with self._transaction():
+            before = self._db.total_changes
+            self._db.executemany("INSERT OR IGNORE INTO prices VALUES (?, ?, ?, ?, ?, ?)",
+                                 [(symbol, *record) for record in records.tolist()])
+            return self._db.total_changes - before
+
+    def ticks(self, symbol):
+        return self.range(symbol)
+
+    def range(self, symbol, start=None, end=None):
+        # Records with start <= timestamp < end, in timestamp order
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT timestamp, price, market_cap, volume, change_24h FROM prices "
+                "WHERE coin = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp",
+                (symbol, float("-inf") if start is None else start, float("inf") if end is None else end)).fetchall()
+        return np.array(rows, dtype=TICK_DTYPE)
+
+    def latest(self, symbol):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT timestamp, price, market_cap, volume, change_24h FROM prices "
+                "WHERE coin = ? ORDER BY timestamp DESC LIMIT 1", (symbol,)).fetchone()
+        return None if row is None else np.array([row], dtype=TICK_DTYPE)[0]
+
+    def symbols(self):
+        with self._lock:
+            return [coin for coin, in self._db.execute("SELECT DISTINCT coin FROM prices ORDER BY coin")]
+
+
+class _Transaction:
+    def __init__(self, db, lock):
+        self.db = db
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            self.db.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self.lock.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.lock.release()
@@ -0,0 +1,127 @@
+# HttpClient against a local http.server: keep-alive reuse, a retry when the
+# server has dropped an idle connection, gzip bodies and HTTP errors; plus
+# Retry-After parsing and how a 429 reaches the price sources.
+import datetime
+import email.utils
+import gzip
+import threading
+import unittest
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from coin_registry import CoinRegistry
+from http_client import HTTPStatusError, HttpClient, RateLimitError, parse_retry_after
+from price_sources import CoinGeckoSource
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        stub = self.server.stub
+        with stub.lock:
+            stub.connections.add(self.client_address)
+            stub.requests += 1
+        status, headers, body = stub.responses.get(self.path, (200, {}, b"ok"))
+        if "gzip" in self.headers.get("Accept-Encoding", "") and headers.get("Content-Encoding") == "gzip":
+            body = gzip.compress(body)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        # Drop the connection without announcing it, as servers do with idle keep-alives
+        self.close_connection = stub.drop_after_response
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = set()
+        self.requests = 0
+        self.responses = {}  # path -> (status, headers, body)
+        self.drop_after_response = False
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def url(self, path="/"):
+        return f"http://127.0.0.1:{self.server.server_address[1]}{path}"
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class HttpClientTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = StubServer()
+        self.client = HttpClient(timeout=5)
+
+    def tearDown(self):
+        self.client.close()
+        self.stub.stop()
+
+    def test_connection_is_reused(self):
+        for _ in range(5):
+            self.assertEqual(self.client.get(self.stub.url()).body, b"ok")
+        self.assertEqual(self.stub.requests, 5)
+        self.assertEqual(len(self.stub.connections), 1)
+
+    def test_dropped_idle_connection_is_retried(self):
+        self.stub.drop_after_response = True
+        for _ in range(3):
+            self.assertEqual(self.client.get(self.stub.url()).body, b"ok")
+        self.assertEqual(self.stub.requests, 3)
+        self.assertEqual(len(self.stub.connections), 3)
+
+    def test_gzip_body_is_decoded(self):
+        self.stub.responses["/zipped"] = (200, {"Content-Encoding": "gzip"}, b'{"a": 1}' * 100)
+        self.assertEqual(self.client.get(self.stub.url("/zipped")).body, b'{"a": 1}' * 100)
+
+    def test_error_status_raises(self):
+        self.stub.responses["/missing"] = (404, {}, b"")
+        with self.assertRaises(HTTPStatusError) as raised:
+            self.client.get(self.stub.url("/missing"))
+        self.assertEqual(raised.exception.status, 404)
+        # The connection survives an error response
+        self.client.get(self.stub.url())
+        self.assertEqual(len(self.stub.connections), 1)
+
+    def test_unsupported_scheme(self):
+        with self.assertRaises(ValueError):
+            self.client.get("ftp://127.0.0.1/")
+
+    def test_rate_limit_reaches_price_source(self):
+        source = CoinGeckoSource(CoinRegistry(), self.client, base_url=self.stub.url("/price"))
+        for url in source.build_request_urls():
+            parts = urllib.parse.urlsplit(url)
+            self.stub.responses[f"{parts.path}?{parts.query}"] = (429, {"Retry-After": "42"}, b"")
+        with self.assertRaises(RateLimitError) as raised:
+            source.fetch()
+        self.assertEqual(raised.exception.retry_after, 42.0)
+
+
+class RetryAfterTest(unittest.TestCase):
+    def test_seconds(self):
+        self.assertEqual(parse_retry_after("120"), 120.0)
+        self.assertEqual(parse_retry_after("-5"), 0.0)
+
+    def test_http_date(self):
+        later = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=90)
+        self.assertAlmostEqual(parse_retry_after(email.utils.format_datetime(later, usegmt=True)), 90, delta=2)
+        earlier = later - datetime.timedelta(hours=1)
+        self.assertEqual(parse_retry_after(email.utils.format_datetime(earlier, usegmt=True)), 0.0)
+
+    def test_missing_or_garbage(self):
+        for value in (None, "", "soon"):
+            self.assertIsNone(parse_retry_after(value))
+
+
+if __name__ == "__main__":
+    unittest.main()
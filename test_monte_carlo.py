@@ -0,0 +1,47 @@
+# Scenario generation: how the outcome spread grows with the horizon for both
+# models, and seeds giving the same scenarios however the work is split.
+import unittest
+
+import numpy as np
+
+import monte_carlo
+
+
+class GeneratePricesTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        # Skewed, fat-tailed daily shocks for two correlated coins
+        base = rng.standard_exponential(500) - 1.0
+        self.shocks = np.column_stack([0.02 * base, 0.01 * base + 0.01 * rng.standard_normal(500)])
+        self.drift = np.zeros(2)
+        self.current = np.array([100.0, 10.0])
+
+    def log_returns(self, model, horizon_days, count=40000, seed=1):
+        out = np.empty((count, 2))
+        monte_carlo.generate_prices(out, self.current, self.drift, self.shocks, horizon_days, model, seed, workers=1)
+        return np.log(out / self.current)
+
+    def test_variance_scales_with_horizon(self):
+        for model in monte_carlo.MODELS:
+            one_day = self.log_returns(model, 1).var(axis=0)
+            for horizon in (4, 16):
+                ratio = self.log_returns(model, horizon).var(axis=0) / one_day
+                np.testing.assert_allclose(ratio, horizon, rtol=0.1, err_msg=f"{model}, {horizon} days")
+
+    def test_bootstrap_sums_days(self):
+        # A sum of skewed days is less skewed than one day scaled up
+        def skew(values):
+            centred = values - values.mean()
+            return (centred ** 3).mean() / centred.var() ** 1.5
+
+        one_day = skew(self.log_returns("bootstrap", 1)[:, 0])
+        sixteen_days = skew(self.log_returns("bootstrap", 16)[:, 0])
+        self.assertLess(sixteen_days, one_day / 2)
+
+    def test_seed_is_reproducible(self):
+        np.testing.assert_array_equal(self.log_returns("bootstrap", 5, count=1000, seed=7),
+                                      self.log_returns("bootstrap", 5, count=1000, seed=7))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+# Write-behind saving of the holdings document: debouncing, the cap on how
+# long a steady stream of edits can hold a write back, and explicit flushes.
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from persistence import WriteBehindWriter
+from portfolio_manager import PortfolioManager
+from sqlite_store import SQLiteStore
+
+
+class WriteBehindWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "holdings.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+    def test_writes_latest_after_delay(self):
+        writer = WriteBehindWriter(self.path, 0.05)
+        for i in range(5):
+            writer.schedule({"btc": i})
+        time.sleep(0.3)
+        self.assertEqual(self.read(), {"btc": 4})
+
+    def test_repeated_schedules_still_flush(self):
+        # Schedules every 20 ms never leave a quiet 100 ms gap, yet the write
+        # must land within max_delay of the first one
+        writer = WriteBehindWriter(self.path, 0.1, max_delay=0.3)
+        deadline = time.monotonic() + 1.0
+        i = 0
+        while time.monotonic() < deadline and not os.path.exists(self.path):
+            writer.schedule({"btc": i})
+            i += 1
+            time.sleep(0.02)
+        self.assertTrue(os.path.exists(self.path))
+        self.assertLess(i, 40)
+
+    def test_flush_writes_now(self):
+        writer = WriteBehindWriter(self.path, 60)
+        writer.schedule({"btc": 1})
+        self.assertTrue(writer.flush())
+        self.assertEqual(self.read(), {"btc": 1})
+
+
+class HoldingsSaveTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "holdings.json")
+        self.manager = PortfolioManager(holdings_path=self.path,
+                                        scenarios_path=os.path.join(self.directory.name, "scenarios.bin"))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_unchanged_holdings_are_not_rescheduled(self):
+        self.manager.update_holdings({"btc": 1})
+        self.assertTrue(self.manager.flush())
+        os.remove(self.path)
+        self.manager.update_holdings({"btc": 1})
+        self.assertTrue(self.manager.flush())
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_explicit_save_writes_unchanged_holdings(self):
+        self.manager.update_holdings({"btc": 1})
+        self.manager.flush()
+        os.remove(self.path)
+        self.assertTrue(self.manager.save_holdings({"btc": 1})[0])
+        with open(self.path) as f:
+            self.assertEqual(json.load(f)["btc"], 1)
+
+    def test_explicit_save_to_store_writes_every_coin(self):
+        store = SQLiteStore(os.path.join(self.directory.name, "portfolio.db"))
+        manager = PortfolioManager(store=store)
+        # Set in memory only, so the store has nothing yet and nothing is "changed"
+        manager.holdings = {"btc": 1, "eth": 2}
+        self.assertEqual(manager.save_holdings({"btc": 1, "eth": 2}), (True, "Holdings saved to database."))
+        self.assertEqual(store.holdings(), {"btc": 1.0, "eth": 2.0, "xrp": 0.0})
+        store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
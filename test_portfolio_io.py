@@ -0,0 +1,157 @@
+# Scenario and holdings import/export: round-trips through every text format,
+# the streaming JSON parser against json.loads, and malformed input.
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import portfolio_io
+
+COINS = ["btc", "eth", "xrp"]
+
+
+class TempFiles(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name, text=None):
+        path = os.path.join(self.directory.name, name)
+        if text is not None:
+            with open(path, "w") as f:
+                f.write(text)
+        return path
+
+
+def read_scenarios(path, batch_size=portfolio_io.IO_BATCH_ROWS, progress=None):
+    with portfolio_io.ScenarioReader(path, batch_size, progress) as reader:
+        batches = list(reader.batches())
+        rows = np.vstack(batches) if batches else np.empty((0, len(reader.coins)))
+        return reader.coins, rows
+
+
+class JsonReaderTest(unittest.TestCase):
+    DOCUMENT = {"coins": ["btc", "eth"], "name": "a \"quoted\" ] name", "nested": {"x": [1, [2, 3]], "y": None},
+                "prices": [[1.5, 2e-3], [123456789.125, -4], [0, 1e10]]}
+
+    def reader(self, text, chunk_size):
+        return portfolio_io._JsonReader(io.StringIO(text), chunk_size)
+
+    def test_members_match_json_loads_at_any_chunk_size(self):
+        text = json.dumps(self.DOCUMENT, indent=1)
+        for chunk_size in (1, 2, 3, 7, 64):
+            reader = self.reader(text, chunk_size)
+            parsed = {}
+            for key in reader.members():
+                parsed[key] = reader.value()
+            self.assertEqual(parsed, self.DOCUMENT, f"chunk size {chunk_size}")
+
+    def test_row_blocks_match_json_loads_at_any_chunk_size(self):
+        rows = np.random.default_rng(0).uniform(-1e6, 1e6, (40, 3)).tolist()
+        text = json.dumps(rows)
+        for chunk_size in (1, 5, 16, 1000):
+            reader = self.reader(text, chunk_size)
+            parsed = [row for block in reader.row_blocks() for row in block]
+            self.assertEqual(parsed, rows, f"chunk size {chunk_size}")
+            self.assertEqual(reader.peek(), "")
+
+    def test_items(self):
+        self.assertEqual(list(self.reader('[1, "two", [3], {"4": 5}]', 3).items()), [1, "two", [3], {"4": 5}])
+        self.assertEqual(list(self.reader("[ ]", 1).items()), [])
+
+    def test_errors(self):
+        with self.assertRaisesRegex(ValueError, r"Expected '\{'"):
+            list(self.reader("[1]", 4).members())
+        with self.assertRaisesRegex(ValueError, "Expected ',' or"):
+            list(self.reader("[1 2]", 4).items())
+        with self.assertRaisesRegex(ValueError, "Unterminated"):
+            list(self.reader("[[1, 2], [3", 4).row_blocks())
+        with self.assertRaises(ValueError):
+            self.reader('{"a": tru', 4).value()
+
+
+class ScenarioFormatsTest(TempFiles):
+    def test_round_trip_every_format(self):
+        rows = np.random.default_rng(0).uniform(0, 1e5, (25, 3))
+        for extension in (".json", ".ndjson", ".jsonl", ".csv"):
+            path = self.path("scenarios" + extension)
+            written = []
+            portfolio_io.write_scenarios(path, COINS, rows, batch_size=4, progress=lambda done, total: written.append(done))
+            self.assertEqual(written[-1], len(rows))
+            reported = []
+            coins, loaded = read_scenarios(path, batch_size=4, progress=lambda done, total: reported.append((done, total)))
+            self.assertEqual(coins, COINS, extension)
+            np.testing.assert_array_equal(loaded, rows, extension)
+            self.assertEqual(reported[-1][0], reported[-1][1])
+
+    def test_empty_round_trip(self):
+        for extension in (".json", ".ndjson", ".csv"):
+            path = self.path("scenarios" + extension)
+            portfolio_io.write_scenarios(path, COINS, np.empty((0, 3)))
+            coins, loaded = read_scenarios(path)
+            self.assertEqual((coins, loaded.shape), (COINS, (0, 3)), extension)
+
+    def test_legacy_bare_list(self):
+        coins, rows = read_scenarios(self.path("old.json", "[[1, 2, 3], [4, 5, 6]]"))
+        self.assertEqual(coins, list(portfolio_io.LEGACY_SCENARIO_COINS))
+        np.testing.assert_array_equal(rows, [[1, 2, 3], [4, 5, 6]])
+
+    def test_other_members_are_skipped(self):
+        text = '{"version": 2, "coins": ["btc"], "meta": {"a": [1]}, "prices": [[1], [2]]}'
+        coins, rows = read_scenarios(self.path("s.json", text))
+        self.assertEqual(coins, ["btc"])
+        np.testing.assert_array_equal(rows, [[1], [2]])
+
+    def test_malformed_files(self):
+        cases = {
+            "prices_first.json": '{"prices": [[1]], "coins": ["btc"]}',
+            "no_coins.json": '{"prices": []}',
+            "truncated.json": '{"coins": ["btc"], "prices": [[1], [2',
+            "no_header.ndjson": "[1, 2, 3]\n",
+            "bad_row.ndjson": '{"coins": ["btc", "eth"]}\n[1, 2]\n[1, "x"]\n',
+            "bad_value.csv": "btc,eth\n1,2\n3,abc\n",
+            "scenarios.txt": "",
+        }
+        for name, text in cases.items():
+            with self.assertRaises(ValueError, msg=name):
+                read_scenarios(self.path(name, text))
+
+
+class HoldingsFileTest(TempFiles):
+    HOLDINGS = {"btc": 1.5, "eth": 0.0, "xrp": 1000.0}
+
+    def test_round_trip_every_format(self):
+        for extension in (".json", ".ndjson", ".csv"):
+            path = self.path("holdings" + extension)
+            portfolio_io.write_holdings(path, self.HOLDINGS)
+            loaded = portfolio_io.read_holdings(path)
+            self.assertEqual({coin: float(amount) for coin, amount in loaded.items()}, self.HOLDINGS, extension)
+
+    def test_streamed_json_matches_fast_path(self):
+        path = self.path("holdings.json")
+        portfolio_io.write_holdings(path, self.HOLDINGS)
+        with mock.patch.object(portfolio_io, "IO_READ_CHUNK_SIZE", 0):
+            self.assertEqual(portfolio_io.read_holdings(path), self.HOLDINGS)
+
+    def test_json_holdings_must_be_an_object(self):
+        for text in ("[1, 2]", "5", '"btc"'):
+            with self.assertRaises(ValueError):
+                portfolio_io.read_holdings(self.path("holdings.json", text))
+            with mock.patch.object(portfolio_io, "IO_READ_CHUNK_SIZE", 0), self.assertRaises(ValueError):
+                portfolio_io.read_holdings(self.path("holdings.json", text))
+
+    def test_unsupported_extension(self):
+        with self.assertRaises(ValueError):
+            portfolio_io.read_holdings(self.path("holdings.txt", "{}"))
+        with self.assertRaises(ValueError):
+            portfolio_io.write_holdings(self.path("holdings.txt"), self.HOLDINGS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+# PortfolioManager valuation and queries, checked against plain NumPy
+# references: incremental revaluation after edits and appends, and sort,
+# filter and top-k queries over reordered scenarios.
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from portfolio_manager import PortfolioManager
+
+CURRENT_PRICES = {"btc": 50000.0, "eth": 3000.0, "xrp": 0.5}
+
+
+class ManagerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.manager = PortfolioManager(holdings_path=os.path.join(self.directory.name, "holdings.json"),
+                                        scenarios_path=os.path.join(self.directory.name, "scenarios.bin"))
+        self.rng = np.random.default_rng(0)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def expected_worths(self):
+        # Row 0 current, then future rows in engine order
+        holdings = self.manager.holdings_vector
+        prices = np.vstack([self.manager.price_vector(CURRENT_PRICES), self.manager.engine.prices])
+        worths = prices * holdings
+        return np.column_stack([worths.sum(axis=1), worths])
+
+    def calculate(self):
+        self.assertTrue(self.manager.calculate_scenarios(CURRENT_PRICES))
+
+
+class RevaluationTest(ManagerTestCase):
+    def test_edits_and_appends_match_full_valuation(self):
+        self.manager.holdings = {"btc": 1, "eth": 2, "xrp": 3}
+        self.manager.future_prices = self.rng.uniform(0, 1e5, (200, 3))
+        self.calculate()
+        random_ops = random.Random(0)
+        for step in range(100):
+            op = random_ops.choice(["one", "one", "all", "append", "replace"])
+            if op == "one":
+                symbol = random_ops.choice(["btc", "eth", "xrp"])
+                self.manager.holdings = dict(self.manager.holdings, **{symbol: random_ops.uniform(0, 10)})
+            elif op == "all":
+                self.manager.holdings = {symbol: random_ops.uniform(0, 10) for symbol in ("btc", "eth", "xrp")}
+            elif op == "append":
+                for _ in range(random_ops.randrange(1, 80)):
+                    self.manager.add_future_scenario(dict(zip(("btc", "eth", "xrp"), self.rng.uniform(0, 1e5, 3))))
+            else:
+                self.manager.future_prices = self.rng.uniform(0, 1e5, (random_ops.randrange(0, 300), 3))
+            self.calculate()
+            np.testing.assert_allclose(self.manager.scenarios, self.expected_worths(), rtol=1e-9,
+                                       err_msg=f"step {step}: {op}")
+
+
+class QueryTest(ManagerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.manager.holdings = {"btc": 1, "eth": 2, "xrp": 3}
+        self.manager.future_prices = self.rng.uniform(0, 1e5, (500, 3))
+        # Scramble the display order so display rows and engine rows differ
+        moves = random.Random(1)
+        for _ in range(50):
+            self.manager.reorder_future_prices(moves.randrange(1, 501), moves.randrange(1, 501))
+        self.calculate()
+
+    def reference(self, sort=None, descending=False, where=(), limit=None):
+        # Display rows by brute force over the rows in display order
+        worths = self.manager.ordered_scenarios()
+        columns = {"total": 0, "btc": 1, "eth": 2, "xrp": 3}
+        operators = {"<": float.__lt__, "<=": float.__le__, ">": float.__gt__, ">=": float.__ge__}
+        rows = []
+        for row in range(1, len(worths)):
+            if all(operators[op](float(worths[row, columns[column]]),
+                                 float(worths[0, columns[column]]) if value == "current" else float(value))
+                   for column, op, value in where):
+                rows.append(row)
+        if sort is not None:
+            rows.sort(key=lambda row: worths[row, columns[sort]], reverse=descending)
+        return rows[:limit]
+
+    def check(self, **query):
+        self.assertEqual(self.manager.query_scenarios(**query).tolist(), self.reference(**query), query)
+
+    def test_queries_match_reference(self):
+        median = float(np.median(self.manager.scenarios[1:, 0]))
+        queries = [
+            {},
+            {"limit": 10},
+            {"where": [("total", "<", "current")]},
+            {"where": [("total", ">=", median), ("btc", "<", 30000)], "limit": 7},
+            {"sort": "total"},
+            {"sort": "total", "descending": True, "limit": 5},
+            {"sort": "eth", "limit": 3},
+            {"sort": "xrp", "descending": True, "where": [("btc", ">", 20000)]},
+            {"sort": "total", "limit": 0},
+        ]
+        for query in queries:
+            self.check(**query)
+        # Again, now that full sorts are cached
+        for query in queries:
+            self.check(**query)
+
+    def test_queries_follow_sorts_and_edits(self):
+        self.manager.sort_future_prices("btc", descending=True)
+        self.calculate()
+        self.check(sort="total", limit=5)
+        self.check(where=[("eth", "<", 50000)], limit=20)
+        # Changed holdings invalidate the cached sorts
+        self.manager.holdings = {"btc": 0, "eth": 5, "xrp": 1}
+        self.calculate()
+        self.check(sort="total")
+        self.check(sort="total", descending=True, limit=4)
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            self.manager.query_scenarios(sort="doge")
+        with self.assertRaises(ValueError):
+            self.manager.query_scenarios(where=[("total", "~", 1)])
+        self.manager.holdings = {"btc": 2}
+        with self.assertRaisesRegex(ValueError, "out of date"):
+            self.manager.query_scenarios()
+
+
+if __name__ == "__main__":
+    unittest.main()
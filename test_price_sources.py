@@ -0,0 +1,191 @@
+# Multi-source price fetching against local stub HTTP servers: the aggregate's
+# median and first strategies, its fallback when sources fail or stall, and
+# CoinGecko's splitting of long id lists across requests.
+#
+#   python -m pytest test_price_sources.py   (or python -m unittest test_price_sources)
+import json
+import threading
+import time
+import unittest
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from coin_registry import Coin, CoinRegistry
+from constants_pyside6 import COINGECKO_MAX_URL_LENGTH
+from http_client import HttpClient
+from price_sources import AggregatePriceSource, BinanceSource, CoinGeckoSource, PriceSourceError
+
+PRICES = {"btc": 60000.0, "eth": 3000.0, "xrp": 0.5}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        stub = self.server.stub
+        with stub.lock:
+            stub.paths.append(self.path)
+        time.sleep(stub.delay)
+        if stub.fail:
+            self.send_error(500)
+            return
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        body = json.dumps(stub.payload(query)).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer:
+    # Answers simple/price (kind "coingecko") or ticker/24hr ("binance")
+    # requests with PRICES scaled by `factor`, after `delay` seconds
+    def __init__(self, kind, registry, factor=1.0, delay=0.0, fail=False):
+        self.kind = kind
+        self.registry = registry
+        self.factor = factor
+        self.delay = delay
+        self.fail = fail
+        self.lock = threading.Lock()
+        self.paths = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/price"
+
+    def source(self, http, name):
+        source_type = CoinGeckoSource if self.kind == "coingecko" else BinanceSource
+        source = source_type(self.registry, http, base_url=self.url)
+        source.name = name
+        return source
+
+    def payload(self, query):
+        if self.kind == "coingecko":
+            ids = query["ids"][0].split(",")
+            return {coin.coingecko_id: {"usd": self.price(coin.symbol), "usd_market_cap": 1e9,
+                                        "usd_24h_vol": 1e8, "usd_24h_change": 0.5}
+                    for coin in self.registry if coin.coingecko_id in ids}
+        pairs = json.loads(query["symbols"][0])
+        return [{"symbol": coin.symbol.upper() + "USDT", "lastPrice": str(self.price(coin.symbol)),
+                 "quoteVolume": "1e8", "priceChangePercent": "0.5"}
+                for coin in self.registry if coin.symbol.upper() + "USDT" in pairs]
+
+    def price(self, symbol):
+        return PRICES.get(symbol, 100.0) * self.factor
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class AggregatePriceSourceTest(unittest.TestCase):
+    def setUp(self):
+        self.registry = CoinRegistry()
+        self.http = HttpClient(timeout=5)
+        self.stubs = []
+        self.aggregates = []
+
+    def tearDown(self):
+        for aggregate in self.aggregates:
+            aggregate.close()
+        for stub in self.stubs:
+            stub.stop()
+
+    def aggregate(self, strategy, stubs, timeout=2.0):
+        self.stubs += stubs
+        sources = [stub.source(self.http, f"{stub.kind}-{i}") for i, stub in enumerate(stubs)]
+        aggregate = AggregatePriceSource(sources, self.registry, strategy, timeout)
+        self.aggregates.append(aggregate)
+        return aggregate
+
+    def test_median_of_all_sources(self):
+        aggregate = self.aggregate("median", [StubServer("coingecko", self.registry, 0.99),
+                                              StubServer("binance", self.registry, 1.00),
+                                              StubServer("coingecko", self.registry, 1.03)])
+        (prices, market_info), fresh = aggregate.fetch()
+        self.assertTrue(fresh)
+        self.assertEqual(prices, PRICES)
+        # Market info comes from the first configured source with the coin
+        self.assertEqual(market_info["btc"]["market_cap"], 1e9)
+
+    def test_median_skips_failed_source(self):
+        aggregate = self.aggregate("median", [StubServer("coingecko", self.registry, 1.00, fail=True),
+                                              StubServer("binance", self.registry, 1.00),
+                                              StubServer("coingecko", self.registry, 1.10)])
+        (prices, market_info), _ = aggregate.fetch()
+        self.assertAlmostEqual(prices["btc"], 60000.0 * 1.05)
+        # Binance reports no market cap; it is the first source that answered
+        self.assertEqual(market_info["btc"]["market_cap"], 0.0)
+        stats = aggregate.source_stats()
+        self.assertEqual(stats["coingecko-0"]["errors"], 1)
+        self.assertEqual(stats["binance-1"]["errors"], 0)
+
+    def test_median_does_not_wait_past_timeout(self):
+        aggregate = self.aggregate("median", [StubServer("coingecko", self.registry, 2.0, delay=3.0),
+                                              StubServer("binance", self.registry, 1.0)], timeout=0.5)
+        start = time.perf_counter()
+        (prices, _), _ = aggregate.fetch()
+        self.assertLess(time.perf_counter() - start, 2.0)
+        self.assertEqual(prices, PRICES)
+        self.assertEqual(aggregate.source_stats()["coingecko-0"]["timeouts"], 1)
+
+    def test_first_answer_wins(self):
+        aggregate = self.aggregate("first", [StubServer("coingecko", self.registry, 2.0, delay=1.5),
+                                             StubServer("binance", self.registry, 1.0)])
+        start = time.perf_counter()
+        (prices, _), _ = aggregate.fetch()
+        # Every coin is priced by the fast source, so the slow one isn't awaited
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual(prices, PRICES)
+
+    def test_first_falls_back_to_next_source(self):
+        aggregate = self.aggregate("first", [StubServer("binance", self.registry, fail=True),
+                                             StubServer("coingecko", self.registry, 1.0, delay=0.2)])
+        (prices, _), _ = aggregate.fetch()
+        self.assertEqual(prices, PRICES)
+
+    def test_all_sources_failing_raises(self):
+        aggregate = self.aggregate("median", [StubServer("coingecko", self.registry, fail=True),
+                                              StubServer("binance", self.registry, fail=True)])
+        with self.assertRaises(PriceSourceError) as raised:
+            aggregate.fetch()
+        self.assertEqual(set(raised.exception.errors), {"coingecko-0", "binance-1"})
+
+
+class CoinGeckoBatchingTest(unittest.TestCase):
+    def setUp(self):
+        # Enough long ids that one simple/price URL can't hold them all
+        coins = [Coin(f"c{i}", f"coin-with-a-rather-long-identifier-{i:04d}", 2, "#000000") for i in range(300)]
+        self.registry = CoinRegistry(coins)
+        self.stub = StubServer("coingecko", self.registry)
+        self.source = self.stub.source(HttpClient(timeout=5), "coingecko")
+
+    def tearDown(self):
+        self.stub.stop()
+
+    def test_urls_stay_within_limit(self):
+        urls = self.source.build_request_urls()
+        self.assertGreater(len(urls), 1)
+        self.assertTrue(all(len(url) <= COINGECKO_MAX_URL_LENGTH for url in urls))
+        ids = [coin_id for url in urls
+               for coin_id in urllib.parse.parse_qs(urllib.parse.urlsplit(url).query)["ids"][0].split(",")]
+        self.assertEqual(ids, [coin.coingecko_id for coin in self.registry])
+
+    def test_fetch_merges_batches(self):
+        (prices, market_info), fresh = self.source.fetch()
+        self.assertTrue(fresh)
+        self.assertEqual(len(self.stub.paths), len(self.source.build_request_urls()))
+        self.assertEqual(prices, {coin.symbol: 100.0 for coin in self.registry})
+        self.assertEqual(len(market_info), len(self.registry))
+
+
+if __name__ == "__main__":
+    unittest.main()
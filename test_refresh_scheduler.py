@@ -0,0 +1,49 @@
+# RefreshScheduler: the delays it hands the UIs after successes, failures and
+# rate limits, and resuming after a pause.
+import time
+import unittest
+
+from http_client import RateLimitError
+from refresh_scheduler import RefreshScheduler
+
+
+class RefreshSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = RefreshScheduler(interval=60, backoff_base=5, max_backoff=300, jitter=0.2)
+
+    def test_success_uses_interval(self):
+        self.assertEqual(self.scheduler.on_success(), 60)
+
+    def test_backoff_doubles_within_jitter_and_caps(self):
+        for failures in range(1, 12):
+            delay = self.scheduler.on_failure(ConnectionError())
+            expected = 5 * 2 ** (failures - 1)
+            self.assertLessEqual(delay, 300)
+            self.assertGreaterEqual(delay, min(300, 0.8 * expected))
+            self.assertLessEqual(delay, 1.2 * expected)
+        self.assertEqual(self.scheduler.failures, 11)
+        # A success resets the backoff
+        self.scheduler.on_success()
+        self.assertLessEqual(self.scheduler.on_failure(ConnectionError()), 6)
+
+    def test_retry_after_is_honoured(self):
+        self.assertEqual(self.scheduler.on_failure(RateLimitError(1000)), 1000)
+        # A shorter Retry-After doesn't cut the backoff
+        self.assertGreaterEqual(self.scheduler.on_failure(RateLimitError(1)), 8)
+        self.assertGreaterEqual(self.scheduler.on_failure(RateLimitError()), 16)
+
+    def test_resume(self):
+        self.assertEqual(self.scheduler.resume(), 0)
+        self.scheduler.on_success()
+        self.scheduler.pause()
+        self.assertTrue(self.scheduler.paused)
+        remaining = self.scheduler.resume()
+        self.assertFalse(self.scheduler.paused)
+        self.assertTrue(59 <= remaining <= 60)
+        # Fell due while paused
+        self.scheduler.next_due = time.monotonic() - 1
+        self.assertEqual(self.scheduler.resume(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+# ResponseCache: fresh entries served without a request, stale ones
+# revalidated with If-None-Match / If-Modified-Since, and a 304 keeping the
+# cached body; run through CoinGeckoSource against a local http.server.
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from coin_registry import CoinRegistry
+from http_client import HttpClient
+from price_sources import CoinGeckoSource
+from response_cache import ResponseCache
+
+LAST_MODIFIED = "Wed, 21 Oct 2015 07:28:00 GMT"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        stub = self.server.stub
+        stub.requests.append(dict(self.headers))
+        etag = f'"v{stub.version}"'
+        if self.headers.get("If-None-Match") == etag or \
+                (stub.use_last_modified and self.headers.get("If-Modified-Since") == LAST_MODIFIED):
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = json.dumps({"bitcoin": {"usd": stub.price}}).encode()
+        self.send_response(200)
+        if stub.use_last_modified:
+            self.send_header("Last-Modified", LAST_MODIFIED)
+        else:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.version = 1
+        self.price = 60000.0
+        self.use_last_modified = False
+        self.requests = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.http = HttpClient(timeout=5)
+        self.cache = ResponseCache(self.directory.name, ttl=60)
+        self.source = CoinGeckoSource(CoinRegistry(), self.http, self.cache,
+                                      base_url=f"http://127.0.0.1:{self.server.server_address[1]}/price")
+
+    def tearDown(self):
+        self.http.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    def fetch(self):
+        (prices, _), fresh = self.source.fetch()
+        return prices["btc"], fresh
+
+    def test_fresh_entry_skips_request(self):
+        self.assertEqual(self.fetch(), (60000.0, True))
+        self.assertEqual(self.fetch(), (60000.0, False))
+        self.assertEqual(len(self.requests), 1)
+
+    def test_stale_entry_revalidated_with_etag(self):
+        self.assertEqual(self.fetch(), (60000.0, True))
+        self.cache.ttl = 0
+        url = self.source.build_request_urls()[0]
+        before = self.cache.get(url)["fetched_at"]
+        time.sleep(0.01)
+        # Unchanged: a 304, the cached body, and the entry is fresh again
+        self.assertEqual(self.fetch(), (60000.0, False))
+        self.assertEqual(self.requests[-1].get("If-None-Match"), '"v1"')
+        self.assertGreater(self.cache.get(url)["fetched_at"], before)
+        # Changed: a full response replaces the entry
+        self.version, self.price = 2, 61000.0
+        self.assertEqual(self.fetch(), (61000.0, True))
+        self.assertEqual(self.cache.get(url)["etag"], '"v2"')
+        self.assertEqual(len(self.requests), 3)
+
+    def test_stale_entry_revalidated_with_last_modified(self):
+        self.use_last_modified = True
+        self.fetch()
+        self.cache.ttl = 0
+        self.assertEqual(self.fetch(), (60000.0, False))
+        self.assertEqual(self.requests[-1].get("If-Modified-Since"), LAST_MODIFIED)
+        self.assertNotIn("If-None-Match", self.requests[-1])
+
+    def test_cached_snapshot(self):
+        self.assertIsNone(self.source.cached_snapshot())
+        self.fetch()
+        (prices, _), fetched_at = self.source.cached_snapshot()
+        self.assertEqual(prices, {"btc": 60000.0})
+        self.assertLess(abs(fetched_at.timestamp() - time.time()), 5)
+
+    def test_unreadable_or_foreign_entries_are_misses(self):
+        url = self.source.build_request_urls()[0]
+        with open(self.cache.path_for(url), "w") as f:
+            f.write("{not json")
+        self.assertIsNone(self.cache.get(url))
+        self.cache.put("http://elsewhere/", "{}")
+        os.replace(self.cache.path_for("http://elsewhere/"), self.cache.path_for(url))
+        self.assertIsNone(self.cache.get(url))
+
+    def test_conditional_headers(self):
+        self.assertEqual(ResponseCache.conditional_headers(None), {})
+        entry = {"etag": '"x"', "last_modified": LAST_MODIFIED}
+        self.assertEqual(ResponseCache.conditional_headers(entry),
+                         {"If-None-Match": '"x"', "If-Modified-Since": LAST_MODIFIED})
+
+
+if __name__ == "__main__":
+    unittest.main()
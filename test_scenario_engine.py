@@ -0,0 +1,85 @@
+# ScenarioEngine: the growable price buffer, and valuation checked against a
+# plain per-row loop.
+import unittest
+
+import numpy as np
+
+from scenario_engine import INITIAL_CAPACITY, ScenarioEngine
+
+
+def naive_worths(prices, holdings):
+    # (rows + 1) x (1 + coins) like the engine's worths; row 0 is left at zero
+    worths = np.zeros((len(prices) + 1, len(holdings) + 1))
+    for i, row in enumerate(prices, start=1):
+        for j, (price, amount) in enumerate(zip(row, holdings), start=1):
+            worths[i, j] = price * amount
+        worths[i, 0] = worths[i, 1:].sum()
+    return worths
+
+
+class ScenarioEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+        self.engine = ScenarioEngine(3)
+
+    def test_extend_grows_past_initial_capacity(self):
+        rows = self.rng.uniform(0, 100, (3 * INITIAL_CAPACITY + 5, 3))
+        for start in range(0, len(rows), 7):
+            self.engine.extend(rows[start:start + 7])
+        self.assertEqual(len(self.engine), len(rows))
+        np.testing.assert_array_equal(self.engine.prices, rows)
+
+    def test_append_allocate_truncate(self):
+        self.engine.append([1, 2, 3])
+        self.engine.allocate(2)[:] = [[4, 5, 6], [7, 8, 9]]
+        np.testing.assert_array_equal(self.engine.prices, [[1, 2, 3], [4, 5, 6], [7, 8, 9]])
+        self.engine.truncate(1)
+        np.testing.assert_array_equal(self.engine.prices, [[1, 2, 3]])
+        self.engine.truncate(5)
+        self.assertEqual(len(self.engine), 1)
+
+    def test_adopt_uses_buffer_until_it_grows(self):
+        rows = np.ones((4, 3))
+        self.engine.adopt(rows)
+        self.assertIs(self.engine.prices.base, rows)
+        self.engine.append([2, 2, 2])
+        rows[0] = 9
+        np.testing.assert_array_equal(self.engine.prices[0], [1, 1, 1])
+        self.assertEqual(len(self.engine), 5)
+
+    def test_detach_copies(self):
+        rows = np.ones((4, 3))
+        self.engine.adopt(rows)
+        self.engine.detach()
+        rows[:] = 0
+        np.testing.assert_array_equal(self.engine.prices, np.ones((4, 3)))
+
+    def test_evaluate_rows_matches_naive(self):
+        prices = self.rng.uniform(0, 100, (50, 3))
+        holdings = np.array([0.5, 2.0, 0.0])
+        self.engine.set_prices(prices)
+        worths = np.zeros((51, 4))
+        self.engine.evaluate_rows(holdings, worths, 0)
+        np.testing.assert_allclose(worths, naive_worths(prices, holdings))
+
+        # Appended rows only
+        more = self.rng.uniform(0, 100, (10, 3))
+        self.engine.extend(more)
+        grown = np.zeros((61, 4))
+        grown[:51] = worths
+        self.engine.evaluate_rows(holdings, grown, 50)
+        np.testing.assert_allclose(grown, naive_worths(np.vstack([prices, more]), holdings))
+
+    def test_revalue_coin_matches_naive(self):
+        prices = self.rng.uniform(0, 100, (50, 3))
+        holdings = np.array([0.5, 2.0, 1.0])
+        self.engine.set_prices(prices)
+        worths = np.zeros((51, 4))
+        self.engine.evaluate_rows(holdings, worths, 0)
+        holdings[1] = 7.25
+        self.engine.revalue_coin(worths, 1, holdings[1])
+        np.testing.assert_allclose(worths, naive_worths(prices, holdings))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+# Binary scenario files: write/load/append round-trips, torn rows, and
+# saving over a file the scenarios are still mapped from.
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import scenario_file
+from portfolio_manager import PortfolioManager
+
+
+class ScenarioFileTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "scenarios.bin")
+        self.coins = ["btc", "eth", "xrp"]
+        self.rows = np.random.default_rng(0).uniform(0, 100, (10, 3))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def load(self):
+        coins, rows = scenario_file.load_scenarios(self.path)
+        # Copy out of the mapping so the temporary directory can be removed
+        return coins, np.array(rows)
+
+    def test_round_trip(self):
+        scenario_file.write_scenarios(self.path, self.coins, self.rows)
+        self.assertTrue(scenario_file.is_scenario_file(self.path))
+        coins, data_offset = scenario_file.read_header(self.path)
+        self.assertEqual(coins, self.coins)
+        self.assertEqual(data_offset % scenario_file.SCENARIO_DATA_ALIGNMENT, 0)
+        coins, rows = self.load()
+        self.assertEqual(coins, self.coins)
+        np.testing.assert_array_equal(rows, self.rows)
+
+    def test_empty_file_loads_no_rows(self):
+        scenario_file.write_scenarios(self.path, self.coins, np.empty((0, 3)))
+        coins, rows = self.load()
+        self.assertEqual(coins, self.coins)
+        self.assertEqual(rows.shape, (0, 3))
+
+    def test_append(self):
+        scenario_file.write_scenarios(self.path, self.coins, self.rows[:4])
+        scenario_file.append_scenarios(self.path, self.coins, self.rows[4:])
+        np.testing.assert_array_equal(self.load()[1], self.rows)
+
+    def test_append_drops_torn_row(self):
+        scenario_file.write_scenarios(self.path, self.coins, self.rows[:4])
+        with open(self.path, "ab") as f:
+            f.write(b"\x01" * 11)  # an interrupted append
+        # A torn row is ignored on load, and cut off by the next append
+        np.testing.assert_array_equal(self.load()[1], self.rows[:4])
+        scenario_file.append_scenarios(self.path, self.coins, self.rows[4:])
+        np.testing.assert_array_equal(self.load()[1], self.rows)
+
+    def test_append_rejects_other_columns(self):
+        scenario_file.write_scenarios(self.path, self.coins, self.rows)
+        with self.assertRaises(ValueError):
+            scenario_file.append_scenarios(self.path, ["btc", "eth"], self.rows[:, :2])
+
+    def test_bad_headers(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a scenario file at all")
+        self.assertFalse(scenario_file.is_scenario_file(self.path))
+        with self.assertRaises(ValueError):
+            scenario_file.read_header(self.path)
+
+        header = scenario_file._header(self.coins)
+        newer = header[:8] + (scenario_file.SCENARIO_FORMAT_VERSION + 1).to_bytes(4, "little") + header[12:]
+        with open(self.path, "wb") as f:
+            f.write(newer)
+        with self.assertRaisesRegex(ValueError, "newer"):
+            scenario_file.read_header(self.path)
+
+        corrupt = header[:12] + (5).to_bytes(4, "little") + header[16:]
+        with open(self.path, "wb") as f:
+            f.write(corrupt)
+        with self.assertRaisesRegex(ValueError, "Corrupt"):
+            scenario_file.read_header(self.path)
+
+
+class ScenarioSaveTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "scenarios.bin")
+        self.manager = PortfolioManager(holdings_path=os.path.join(self.directory.name, "holdings.json"),
+                                        scenarios_path=self.path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_full_save_detaches_from_mapped_file(self):
+        rows = np.arange(12, dtype=np.float64).reshape(4, 3)
+        scenario_file.write_scenarios(self.path, self.manager.registry.symbols, rows)
+        self.assertTrue(self.manager.load_future_prices()[0])
+        self.assertIsInstance(self.manager.engine.prices, np.memmap)
+        # A reorder rules out appending, so the file is rewritten
+        self.manager.reorder_future_prices(1, 4)
+        self.assertTrue(self.manager.save_future_prices()[0])
+        self.assertNotIsInstance(self.manager.engine.prices, np.memmap)
+        _, saved = scenario_file.load_scenarios(self.path)
+        np.testing.assert_array_equal(saved, rows[[1, 2, 3, 0]])
+
+    def test_save_appends_new_rows(self):
+        rows = np.arange(12, dtype=np.float64).reshape(4, 3)
+        scenario_file.write_scenarios(self.path, self.manager.registry.symbols, rows)
+        self.manager.load_future_prices()
+        self.manager.add_future_scenario({"btc": 1, "eth": 2, "xrp": 3})
+        size = os.path.getsize(self.path)
+        self.assertTrue(self.manager.save_future_prices()[0])
+        self.assertEqual(os.path.getsize(self.path), size + 3 * 8)
+        _, saved = scenario_file.load_scenarios(self.path)
+        np.testing.assert_array_equal(saved, np.vstack([rows, [[1, 2, 3]]]))
+
+
+if __name__ == "__main__":
+    unittest.main()
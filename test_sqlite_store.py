@@ -0,0 +1,122 @@
+# SQLiteStore: holdings and scenario round-trips, midpoint reordering checked
+# against a plain list, and the price history interface.
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from portfolio_manager import PortfolioManager
+from sqlite_store import SQLiteStore
+
+COINS = ["btc", "eth", "xrp"]
+
+
+class SQLiteStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "portfolio.db")
+        self.store = SQLiteStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def move(self, ids, from_row, to_row):
+        # Mirrors PortfolioManager._move_stored_scenario on a plain list
+        ids.insert(to_row, ids.pop(from_row))
+        self.store.move_scenario(ids[to_row], ids[to_row - 1] if to_row > 0 else None,
+                                 ids[to_row + 1] if to_row + 1 < len(ids) else None)
+
+    def test_holdings_upsert_per_portfolio(self):
+        self.store.set_holdings({"btc": 1, "eth": 2})
+        self.store.set_holdings({"eth": 3})
+        self.store.set_holdings({"btc": 9}, "other")
+        self.assertEqual(self.store.holdings(), {"btc": 1.0, "eth": 3.0})
+        self.assertEqual(self.store.holdings("other"), {"btc": 9.0})
+        self.assertEqual(self.store.holdings("missing"), {})
+
+    def test_scenarios_round_trip(self):
+        self.assertIsNone(self.store.load_scenarios())
+        rows = np.random.default_rng(0).uniform(0, 100, (20, 3))
+        ids = self.store.append_scenarios(COINS, rows[:12])
+        ids += self.store.append_scenarios(COINS, rows[12:])
+        coins, loaded, loaded_ids = self.store.load_scenarios()
+        self.assertEqual(coins, COINS)
+        np.testing.assert_array_equal(loaded, rows)
+        self.assertEqual(loaded_ids, ids)
+
+        self.store.delete_scenarios(ids[5:])
+        np.testing.assert_array_equal(self.store.load_scenarios()[1], rows[:5])
+        with self.assertRaises(ValueError):
+            self.store.append_scenarios(["btc"], rows[:, :1])
+
+        new_ids = self.store.replace_scenarios(["btc"], rows[:3, :1])
+        coins, loaded, loaded_ids = self.store.load_scenarios()
+        self.assertEqual((coins, loaded_ids), (["btc"], new_ids))
+        np.testing.assert_array_equal(loaded, rows[:3, :1])
+
+    def test_moves_match_list_reference(self):
+        rows = np.arange(30, dtype=np.float64).reshape(10, 3)
+        ids = self.store.append_scenarios(COINS, rows)
+        expected = list(ids)
+        rng = random.Random(0)
+        for _ in range(200):
+            self.move(expected, rng.randrange(len(expected)), rng.randrange(len(expected)))
+            self.assertEqual(self.store.load_scenarios()[2], expected)
+
+    def test_repeated_moves_into_one_gap_renumber(self):
+        # Each move halves the gap between rows 0 and 1; float precision runs
+        # out after about 50, which forces a renumbering
+        ids = self.store.append_scenarios(COINS, np.zeros((4, 3)))
+        expected = list(ids)
+        for _ in range(120):
+            self.move(expected, len(expected) - 1, 1)
+            self.assertEqual(self.store.load_scenarios()[2], expected)
+
+    def test_price_history(self):
+        self.store.append_snapshot(1.0, {"btc": 100.0, "eth": 10.0}, {"btc": {"market_cap": 5.0}})
+        self.store.append_snapshot(2.0, {"btc": 101.0}, {})
+        self.store.append_snapshot(2.0, {"btc": 999.0}, {})  # same timestamp is ignored
+        self.assertEqual(self.store.append("btc", [(3.0, 102.0, 0, 0, 0), (2.0, 0, 0, 0, 0)]), 1)
+        ticks = self.store.ticks("btc")
+        self.assertEqual(ticks["timestamp"].tolist(), [1.0, 2.0, 3.0])
+        self.assertEqual(ticks["price"].tolist(), [100.0, 101.0, 102.0])
+        self.assertEqual(ticks["market_cap"][0], 5.0)
+        self.assertEqual(self.store.range("btc", 2.0, 3.0)["price"].tolist(), [101.0])
+        self.assertEqual(self.store.latest("btc")["price"], 102.0)
+        self.assertIsNone(self.store.latest("xrp"))
+        self.assertEqual(self.store.symbols(), ["btc", "eth"])
+
+
+class StoredPortfolioTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = SQLiteStore(os.path.join(self.directory.name, "portfolio.db"))
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_reorder_persists_through_store(self):
+        manager = PortfolioManager(store=self.store)
+        rows = np.arange(18, dtype=np.float64).reshape(6, 3)
+        manager.future_prices = rows
+        self.assertTrue(manager.save_future_prices()[0])
+        manager.reorder_future_prices(1, 5)
+        manager.reorder_future_prices(6, 2)
+        expected = manager.future_prices.copy()
+
+        reloaded = PortfolioManager(store=self.store)
+        self.assertEqual(reloaded.load_future_prices(), (True, "Scenarios loaded from database."))
+        np.testing.assert_array_equal(reloaded.future_prices, expected)
+
+        # Rows added after a reload are appended behind the stored ones
+        reloaded.add_future_scenario({"btc": 1, "eth": 1, "xrp": 1})
+        self.assertTrue(reloaded.save_future_prices()[0])
+        np.testing.assert_array_equal(self.store.load_scenarios()[1], np.vstack([expected, [[1, 1, 1]]]))
+
+
+if __name__ == "__main__":
+    unittest.main()
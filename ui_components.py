@@ -1,78 +1,224 @@
+import queue
+import threading
 import tkinter as tk
-from tkinter import ttk, messagebox
-import matplotlib.pyplot as plt
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from tkinter import ttk, messagebox, filedialog
 from constants import *
+import instrumentation
+from persistence import atomic_write
+from price_sources import TickBuffer
+
+
+def load_matplotlib():
+    # matplotlib is imported on first use rather than at startup; it costs more
+    # to import than the rest of the app. Repeat calls hit the module cache.
+    import charts
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+    return charts, FigureCanvasTkAgg, NavigationToolbar2Tk
+
+
+def prewarm_matplotlib():
+    # Import matplotlib on a background thread once the window is up, so the
+    # first "Plot" click doesn't pay for it either
+    threading.Thread(target=load_matplotlib, daemon=True).start()
 
 
 class PlotManager:
+    # Keeps one persistent figure + canvas per chart type and swaps which one is
+    # packed; plotting again, or a live update, only rewrites artist data.
     def __init__(self, plot_frame):
         self.plot_frame = plot_frame
+        self.charts = {}
+        self.pages = {}
+        self.current_chart = None
 
-    def clear_plot_frame(self):
-        for widget in self.plot_frame.winfo_children()[1:]:
-            widget.destroy()
+    def show_chart(self, name, create, toolbar=False):
+        if name not in self.charts:
+            charts, FigureCanvasTkAgg, NavigationToolbar2Tk = load_matplotlib()
+            chart = create(charts)
+            page = ttk.Frame(self.plot_frame)
+            chart.attach(FigureCanvasTkAgg(chart.figure, master=page))
+            if toolbar:
+                NavigationToolbar2Tk(chart.canvas, page, pack_toolbar=False).pack(side=tk.BOTTOM, fill=tk.X)
+            chart.canvas.get_tk_widget().pack()
+            self.charts[name] = chart
+            self.pages[name] = page
 
-    def embed_scenarios_plot(self, scenarios):
+        if self.current_chart != name:
+            if self.current_chart is not None:
+                self.pages[self.current_chart].pack_forget()
+            self.pages[name].pack()
+            self.current_chart = name
+        return self.charts[name]
+
+    def embed_scenarios_plot(self, scenarios, labels, colors, names=None):
         if len(scenarios) < 2:
             messagebox.showinfo("Info", "Add at least one future scenario to plot.")
             return
 
-        self.clear_plot_frame()
-
-        times = list(range(len(scenarios)))
-        totals = [s[0] for s in scenarios]
-        btc_worths = [s[1] for s in scenarios]
-        eth_worths = [s[2] for s in scenarios]
-        xrp_worths = [s[3] for s in scenarios]
-
-        fig = Figure(figsize=FIGURE_SIZE_LARGE)
-        fig.patch.set_facecolor(COLOR_BACKGROUND_LIGHT)
-        ax = fig.add_subplot(111)
-        ax.plot(times, totals, marker='o', label='Total Portfolio', color=COLOR_PRIMARY)
-        ax.plot(times, btc_worths, marker='o', label='BTC', color=COLOR_SUCCESS_GREEN)
-        ax.plot(times, eth_worths, marker='o', label='ETH', color=COLOR_NEUTRAL_GRAY)
-        ax.plot(times, xrp_worths, marker='o', label='XRP', color=COLOR_WARNING_RED)
-
-        ax.set_xticks(times)
-        ax.set_xticklabels(['Current'] + [f'Future {i}' for i in range(1, len(scenarios))])
-        ax.set_xlabel('Scenarios')
-        ax.set_ylabel('Worth ($)')
-        ax.set_title('Portfolio Worth Over Scenarios')
-        ax.legend()
-        ax.grid(True)
-
-        canvas = FigureCanvasTkAgg(fig, master=self.plot_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack()
+        # Zoom/pan toolbar: large scenario sets are decimated and re-sampled per view
+        chart = self.show_chart("scenarios", lambda charts: charts.ScenarioChart(
+            FIGURE_SIZE_LARGE, labels, colors, COLOR_PRIMARY, COLOR_BACKGROUND_LIGHT), toolbar=True)
+        chart.update(scenarios, names, relabel=True)
+
+    def update_scenarios_plot(self, scenarios, names=None, relabel=False):
+        # Live refresh (e.g. on a price tick) if the scenario chart is on screen
+        if self.current_chart == "scenarios" and len(scenarios) >= 2:
+            self.charts["scenarios"].update(scenarios, names, relabel)
 
     def embed_portfolio_allocation(self, allocation_data):
         if not allocation_data:
             messagebox.showinfo("Info", "No holdings to plot.")
             return
 
-        labels = allocation_data["labels"]
-        sizes = allocation_data["sizes"]
-        colors = [COLOR_SUCCESS_GREEN, COLOR_NEUTRAL_GRAY, COLOR_WARNING_RED]
+        chart = self.show_chart("allocation", lambda charts: charts.AllocationChart(
+            FIGURE_SIZE_MEDIUM, COLOR_BACKGROUND_LIGHT))
+        chart.update(allocation_data)
+
+    def update_portfolio_allocation(self, allocation_data):
+        if self.current_chart == "allocation" and allocation_data:
+            self.charts["allocation"].update(allocation_data)
+
+
+class PriceFetchWorker:
+    def __init__(self, root, crypto_api, on_success, on_error):
+        self.root = root
+        self.crypto_api = crypto_api
+        self.on_success = on_success
+        self.on_error = on_error
+        self.results = queue.Queue()
+        self.in_flight = False
+
+    def request(self):
+        # Coalesce: a click while a fetch is running piggybacks on that fetch
+        if self.in_flight:
+            return False
+
+        self.in_flight = True
+        threading.Thread(target=self._run, daemon=True).start()
+        self.root.after(FETCH_POLL_INTERVAL_MS, self._poll)
+        return True
+
+    def _run(self):
+        try:
+            self.results.put((True, self.crypto_api.request_prices()))
+        except Exception as e:
+            self.results.put((False, e))
+
+    def _poll(self):
+        try:
+            success, payload = self.results.get_nowait()
+        except queue.Empty:
+            self.root.after(FETCH_POLL_INTERVAL_MS, self._poll)
+            return
+
+        self.in_flight = False
+        if success:
+            self.crypto_api.apply_snapshot(payload)
+            self.on_success()
+        else:
+            self.on_error(payload)
+
+
+class PriceStreamWorker:
+    # Bridges CryptoAPI's streaming source to the Tk thread: ticks are merged in
+    # a TickBuffer and applied by an after() poll, so a burst costs one redraw.
+    def __init__(self, root, crypto_api, on_update, on_error):
+        self.root = root
+        self.crypto_api = crypto_api
+        self.on_update = on_update
+        self.on_error = on_error
+        self.buffer = TickBuffer()
+        self.errors = queue.Queue()
+        self.poll_job = None
+
+    def start(self):
+        if not self.crypto_api.start_stream(self.buffer.add, self.errors.put):
+            return False
+        self.poll_job = self.root.after(FETCH_POLL_INTERVAL_MS, self._poll)
+        return True
+
+    def stop(self):
+        self.crypto_api.stop_stream()
+        if self.poll_job is not None:
+            self.root.after_cancel(self.poll_job)
+            self.poll_job = None
 
-        self.clear_plot_frame()
+    def _poll(self):
+        self.poll_job = self.root.after(FETCH_POLL_INTERVAL_MS, self._poll)
+        update = self.buffer.drain()
+        if update is not None:
+            self.crypto_api.apply_update(update)
+            self.on_update()
+        while not self.errors.empty():
+            self.on_error(self.errors.get_nowait())
 
-        fig = Figure(figsize=FIGURE_SIZE_MEDIUM)
-        fig.patch.set_facecolor(COLOR_BACKGROUND_LIGHT)
-        ax = fig.add_subplot(111)
-        ax.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%', startangle=140)
-        ax.set_title('Current Portfolio Allocation')
 
-        canvas = FigureCanvasTkAgg(fig, master=self.plot_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack()
+class VirtualListbox(ttk.Frame):
+    # A Listbox that only ever holds the visible window of rows. Rows are
+    # produced on demand by format_row(index), so a list of a million
+    # scenarios costs the same to redraw as a list of ten.
+    def __init__(self, master, format_row, height=LISTBOX_HEIGHT, **listbox_options):
+        super().__init__(master)
+        self.format_row = format_row
+        self.height = height
+        self.row_count = 0
+        self.first_row = 0
+
+        self.listbox = tk.Listbox(self, height=height, **listbox_options)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.on_scroll)
+        self.listbox.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+
+        self.listbox.bind("<MouseWheel>", lambda e: self.scroll_rows(-1 if e.delta > 0 else 1))
+        self.listbox.bind("<Button-4>", lambda e: self.scroll_rows(-1))
+        self.listbox.bind("<Button-5>", lambda e: self.scroll_rows(1))
+
+    def refresh(self, row_count):
+        self.row_count = row_count
+        self.first_row = max(0, min(self.first_row, row_count - self.height))
+        self.redraw()
+
+    @instrumentation.timed("ui.list_redraw")
+    def redraw(self):
+        last_row = min(self.first_row + self.height, self.row_count)
+        self.listbox.delete(0, tk.END)
+        for index in range(self.first_row, last_row):
+            self.listbox.insert(tk.END, self.format_row(index))
+
+        if self.row_count:
+            self.scrollbar.set(self.first_row / self.row_count, last_row / self.row_count)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def move_row(self, from_row, to_row):
+        # Rows between the two shift by one; redraw only if any are on screen
+        last_row = self.first_row + self.height
+        if min(from_row, to_row) < last_row and max(from_row, to_row) >= self.first_row:
+            self.redraw()
+
+    def scroll_rows(self, delta):
+        self.scroll_to(self.first_row + delta)
+        return "break"
+
+    def scroll_to(self, first_row):
+        first_row = max(0, min(first_row, self.row_count - self.height))
+        if first_row != self.first_row:
+            self.first_row = first_row
+            self.redraw()
+
+    def on_scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * self.row_count))
+        elif action == "scroll":
+            step = self.height if unit == "pages" else 1
+            self.scroll_rows(int(amount) * step)
 
 
 class DragDropListbox:
-    def __init__(self, listbox, reorder_callback):
+    def __init__(self, listbox, reorder_callback, row_offset=lambda: 0):
         self.listbox = listbox
         self.reorder_callback = reorder_callback
+        self.row_offset = row_offset  # first absolute row shown, for windowed listboxes
         self.drag_start_index = None
         self.setup_dnd()
 
@@ -82,7 +228,7 @@ class DragDropListbox:
         self.listbox.bind("<ButtonRelease-1>", self.drop)
 
     def start_drag(self, event):
-        index = self.listbox.nearest(event.y)
+        index = self.listbox.nearest(event.y) + self.row_offset()
         if index > 0:
             self.drag_start_index = index
             self.listbox.config(cursor="hand2")
@@ -97,22 +243,120 @@ class DragDropListbox:
         if self.drag_start_index is None:
             return
 
-        new_index = self.listbox.nearest(event.y)
+        new_index = self.listbox.nearest(event.y) + self.row_offset()
         if new_index <= 0 or new_index == self.drag_start_index:
             self.listbox.config(cursor="")
             self.drag_start_index = None
             return
 
-        item = self.listbox.get(self.drag_start_index)
-        self.listbox.delete(self.drag_start_index)
-        self.listbox.insert(new_index, item)
-
+        # The callback moves the row in the data and redraws the window if needed
         self.reorder_callback(self.drag_start_index, new_index)
 
         self.listbox.config(cursor="")
         self.drag_start_index = None
 
 
+class DebugPanel(tk.Toplevel):
+    # Live timings and counters from instrumentation, metric dumps, and an
+    # opt-in profile capture. Opening the panel turns recording on; it stays
+    # on (at the cost of a clock read per probe) until unticked.
+    def __init__(self, master, source_stats=None):
+        super().__init__(master)
+        self.title("Debug: Timings and Profiling")
+        self.source_stats = source_stats  # callable, e.g. CryptoAPI.source_stats
+        self.profile = None
+        self.refresh_job = None
+        self.recording_var = tk.BooleanVar(value=True)
+        self.profile_mode_var = tk.StringVar(value=instrumentation.ProfileCapture.MODES[0])
+        instrumentation.enable()
+
+        controls = ttk.Frame(self)
+        ttk.Checkbutton(controls, text="Record timings", variable=self.recording_var,
+                        command=lambda: instrumentation.enable(self.recording_var.get())).pack(side="left")
+        ttk.Button(controls, text="Reset", command=self.reset).pack(side="left")
+        ttk.Button(controls, text="Copy JSON", command=self.copy_json).pack(side="left")
+        ttk.Button(controls, text="Save Metrics...", command=self.save_metrics).pack(side="left")
+        controls.pack(fill=tk.X)
+
+        self.stats_text = tk.Text(self, height=20, width=90, font="TkFixedFont", bg='white', fg=COLOR_TEXT_DARK)
+        self.stats_text.pack(fill=tk.BOTH, expand=True)
+
+        profile_controls = ttk.Frame(self)
+        ttk.Combobox(profile_controls, textvariable=self.profile_mode_var, values=instrumentation.ProfileCapture.MODES,
+                     state="readonly", width=10).pack(side="left")
+        self.profile_button = ttk.Button(profile_controls, text="Start Profile", command=self.toggle_profile)
+        self.profile_button.pack(side="left")
+        ttk.Button(profile_controls, text="Save Profile...", command=self.save_profile).pack(side="left")
+        profile_controls.pack(fill=tk.X)
+
+        self.profile_text = tk.Text(self, height=15, width=90, font="TkFixedFont", bg='white', fg=COLOR_TEXT_DARK)
+        self.profile_text.pack(fill=tk.BOTH, expand=True)
+
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.refresh()
+
+    def refresh(self):
+        sources = self.source_stats() if self.source_stats is not None else None
+        self.set_text(self.stats_text, instrumentation.format_table(sources))
+        self.refresh_job = self.after(DEBUG_PANEL_REFRESH_MS, self.refresh)
+
+    @staticmethod
+    def set_text(widget, text):
+        widget.delete("1.0", tk.END)
+        widget.insert(tk.END, text)
+
+    def reset(self):
+        instrumentation.reset()
+
+    def metrics_json(self):
+        sources = self.source_stats() if self.source_stats is not None else None
+        return instrumentation.to_json({"sources": sources} if sources else None)
+
+    def copy_json(self):
+        self.clipboard_clear()
+        self.clipboard_append(self.metrics_json())
+
+    def save_metrics(self):
+        path = filedialog.asksaveasfilename(parent=self, initialfile="metrics.prom",
+                                            filetypes=[("Prometheus text", "*.prom"), ("JSON", "*.json")])
+        if not path:
+            return
+        text = self.metrics_json() if path.endswith(".json") else instrumentation.to_prometheus()
+        try:
+            atomic_write(path, lambda f: f.write(text))
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save metrics: {e}", parent=self)
+
+    def toggle_profile(self):
+        if self.profile is not None and self.profile.running:
+            self.set_text(self.profile_text, self.profile.stop())
+            self.profile_button.config(text="Start Profile")
+            return
+        self.profile = instrumentation.ProfileCapture(self.profile_mode_var.get())
+        self.profile.start()
+        self.profile_button.config(text="Stop Profile")
+        self.set_text(self.profile_text, "Profiling... reproduce the slow action, then press Stop Profile.")
+
+    def save_profile(self):
+        if self.profile is None or self.profile.running:
+            return
+        default = "profile.prof" if self.profile.mode == "cprofile" else "profile.folded"
+        path = filedialog.asksaveasfilename(parent=self, initialfile=default)
+        if path:
+            try:
+                self.profile.save(path)
+            except OSError as e:
+                messagebox.showerror("Error", f"Failed to save profile: {e}", parent=self)
+
+    def close(self):
+        # A capture left running would keep sampling in the background
+        if self.profile is not None and self.profile.running:
+            self.profile.stop()
+        if self.refresh_job is not None:
+            self.after_cancel(self.refresh_job)
+        self.destroy()
+
+
 class UIStyleManager:
     @staticmethod
     def configure_styles(style):
@@ -1,109 +1,348 @@
-from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, 
-                              QLabel, QPushButton, QLineEdit, QTextEdit, QListWidget, 
-                              QGroupBox, QMessageBox, QScrollArea, QFrame, QSizePolicy)
-from PySide6.QtCore import Qt, Signal, QObject, QMimeData
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QStackedLayout,
+                              QLabel, QPushButton, QLineEdit, QTextEdit, QListView,
+                              QGroupBox, QMessageBox, QScrollArea, QFrame, QSizePolicy, QComboBox, QCheckBox,
+                              QSpinBox, QPlainTextEdit, QFileDialog, QApplication)
+from PySide6.QtCore import (Qt, Signal, QObject, QMimeData, QRunnable, QThreadPool, QTimer,
+                            QAbstractListModel, QModelIndex)
 from PySide6.QtGui import QDrag, QPainter, QPixmap
-import matplotlib.pyplot as plt
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+import threading
+import numpy as np
 from constants_pyside6 import *
+import instrumentation
+from persistence import atomic_write
+from price_sources import TickBuffer
+
+
+def load_matplotlib():
+    # matplotlib is imported on first use rather than at startup; it costs more
+    # to import than the rest of the app. Repeat calls hit the module cache.
+    import charts
+    from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+    from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
+    return charts, FigureCanvas, NavigationToolbar
+
+
+def prewarm_matplotlib():
+    # Import matplotlib on a background thread once the window is up, so the
+    # first "Plot" click doesn't pay for it either
+    threading.Thread(target=load_matplotlib, daemon=True).start()
+
+
+class FetchSignals(QObject):
+    finished = Signal(object)  # parsed (current_prices, market_info) snapshot
+    failed = Signal(object)  # the exception, so callers can inspect e.g. RateLimitError
+
+
+class PriceFetchTask(QRunnable):
+    def __init__(self, crypto_api, signals):
+        super().__init__()
+        self.crypto_api = crypto_api
+        self.signals = signals
+
+    def run(self):
+        try:
+            snapshot = self.crypto_api.request_prices()
+        except Exception as e:
+            self.signals.failed.emit(e)
+        else:
+            self.signals.finished.emit(snapshot)
+
+
+class PriceFetcher(QObject):
+    prices_fetched = Signal()
+    fetch_failed = Signal(object)
+
+    def __init__(self, crypto_api, parent=None):
+        super().__init__(parent)
+        self.crypto_api = crypto_api
+        self.in_flight = False
+        self.signals = FetchSignals(self)
+        self.signals.finished.connect(self._on_finished)
+        self.signals.failed.connect(self._on_failed)
+
+    def request(self):
+        # Coalesce: a click while a fetch is running piggybacks on that fetch
+        if self.in_flight:
+            return False
+
+        self.in_flight = True
+        QThreadPool.globalInstance().start(PriceFetchTask(self.crypto_api, self.signals))
+        return True
+
+    def _on_finished(self, snapshot):
+        self.in_flight = False
+        self.crypto_api.apply_snapshot(snapshot)
+        self.prices_fetched.emit()
+
+    def _on_failed(self, error):
+        self.in_flight = False
+        self.fetch_failed.emit(error)
+
+
+class PriceStream(QObject):
+    # Bridges CryptoAPI's streaming source to the GUI thread. Ticks arriving
+    # while the GUI is busy are merged, so a burst costs one redraw.
+    prices_updated = Signal()
+    stream_failed = Signal(object)
+    _ticks_ready = Signal()
+
+    def __init__(self, crypto_api, parent=None):
+        super().__init__(parent)
+        self.crypto_api = crypto_api
+        self.buffer = TickBuffer()
+        # Emitted from the stream thread, delivered (queued) on the GUI thread
+        self._ticks_ready.connect(self._drain)
+
+    def start(self):
+        return self.crypto_api.start_stream(self._on_update, self.stream_failed.emit)
+
+    def stop(self):
+        self.crypto_api.stop_stream()
+
+    def _on_update(self, update):
+        if self.buffer.add(update):
+            self._ticks_ready.emit()
+
+    def _drain(self):
+        update = self.buffer.drain()
+        if update is not None:
+            self.crypto_api.apply_update(update)
+            self.prices_updated.emit()
 
 
 class PlotWidget(QWidget):
+    # Keeps one persistent figure + canvas per chart type in a stacked layout;
+    # plotting again, or a live update, only rewrites the chart's artist data.
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setMinimumSize(PLOT_WIDTH, PLOT_HEIGHT)
-        self.layout = QVBoxLayout(self)
+        self.layout = QStackedLayout(self)
         self.layout.setContentsMargins(0, 0, 0, 0)
-        self.canvas = None
-        
-    def clear_plot(self):
-        if self.canvas:
-            self.layout.removeWidget(self.canvas)
-            self.canvas.deleteLater()
-            self.canvas = None
+        self.charts = {}
+        self.pages = {}
+        self.current_chart = None
 
-    def plot_scenarios(self, scenarios):
+    def show_chart(self, name, create, toolbar=False):
+        if name not in self.charts:
+            charts, FigureCanvas, NavigationToolbar = load_matplotlib()
+            chart = create(charts)
+            canvas = FigureCanvas(chart.figure)
+            chart.attach(canvas)
+            page = QWidget()
+            page_layout = QVBoxLayout(page)
+            page_layout.setContentsMargins(0, 0, 0, 0)
+            page_layout.addWidget(canvas)
+            if toolbar:
+                page_layout.addWidget(NavigationToolbar(canvas, page))
+            self.layout.addWidget(page)
+            self.charts[name] = chart
+            self.pages[name] = page
+        self.layout.setCurrentWidget(self.pages[name])
+        self.current_chart = name
+        return self.charts[name]
+
+    def plot_scenarios(self, scenarios, labels, colors, names=None):
         if len(scenarios) < 2:
             QMessageBox.information(self, "Info", "Add at least one future scenario to plot.")
             return
 
-        self.clear_plot()
-
-        times = list(range(len(scenarios)))
-        totals = [s[0] for s in scenarios]
-        btc_worths = [s[1] for s in scenarios]
-        eth_worths = [s[2] for s in scenarios]
-        xrp_worths = [s[3] for s in scenarios]
-
-        fig = Figure(figsize=(8, 6))
-        fig.patch.set_facecolor(COLOR_BACKGROUND_LIGHT)
-        ax = fig.add_subplot(111)
-        
-        ax.plot(times, totals, marker='o', label='Total Portfolio', color=COLOR_PRIMARY, linewidth=2)
-        ax.plot(times, btc_worths, marker='o', label='BTC', color=COLOR_SUCCESS_GREEN, linewidth=2)
-        ax.plot(times, eth_worths, marker='o', label='ETH', color=COLOR_NEUTRAL_GRAY, linewidth=2)
-        ax.plot(times, xrp_worths, marker='o', label='XRP', color=COLOR_WARNING_RED, linewidth=2)
-
-        ax.set_xticks(times)
-        ax.set_xticklabels(['Current'] + [f'Future {i}' for i in range(1, len(scenarios))])
-        ax.set_xlabel('Scenarios')
-        ax.set_ylabel('Worth ($)')
-        ax.set_title('Portfolio Worth Over Scenarios', fontweight='bold')
-        ax.legend()
-        ax.grid(True, alpha=0.3)
+        # Zoom/pan toolbar: large scenario sets are decimated and re-sampled per view
+        chart = self.show_chart("scenarios", lambda charts: charts.ScenarioChart(
+            (8, 6), labels, colors, COLOR_PRIMARY, COLOR_BACKGROUND_LIGHT,
+            line_width=2, title_weight='bold', grid_alpha=0.3), toolbar=True)
+        chart.update(scenarios, names, relabel=True)
 
-        self.canvas = FigureCanvas(fig)
-        self.layout.addWidget(self.canvas)
+    def update_scenarios(self, scenarios, names=None, relabel=False):
+        # Live refresh (e.g. on a price tick) if the scenario chart is on screen
+        if self.current_chart == "scenarios" and len(scenarios) >= 2:
+            self.charts["scenarios"].update(scenarios, names, relabel)
 
     def plot_portfolio_allocation(self, allocation_data):
         if not allocation_data:
             QMessageBox.information(self, "Info", "No holdings to plot.")
             return
 
-        self.clear_plot()
+        # Percentage text is bold and white
+        chart = self.show_chart("allocation", lambda charts: charts.AllocationChart(
+            (6, 6), COLOR_BACKGROUND_LIGHT, title_weight='bold', pct_color='white', pct_weight='bold'))
+        chart.update(allocation_data)
 
-        labels = allocation_data["labels"]
-        sizes = allocation_data["sizes"]
-        colors = CHART_COLORS
+    def update_allocation(self, allocation_data):
+        if self.current_chart == "allocation" and allocation_data:
+            self.charts["allocation"].update(allocation_data)
 
-        fig = Figure(figsize=(6, 6))
-        fig.patch.set_facecolor(COLOR_BACKGROUND_LIGHT)
-        ax = fig.add_subplot(111)
-        
-        wedges, texts, autotexts = ax.pie(sizes, labels=labels, colors=colors, 
-                                         autopct='%1.1f%%', startangle=140)
-        ax.set_title('Current Portfolio Allocation', fontweight='bold')
 
-        # Make percentage text bold and white
-        for autotext in autotexts:
-            autotext.set_color('white')
-            autotext.set_weight('bold')
+class ScenariosListModel(QAbstractListModel):
+    # Exposes PortfolioManager's scenarios to a QListView. Strings are formatted
+    # lazily in data(), so only rows the view actually paints are formatted, and
+    # refresh() signals dataChanged only for rows whose text can have changed.
+    # Given query results, it shows just those rows (below "Current").
+    def __init__(self, portfolio_manager, crypto_api, parent=None):
+        super().__init__(parent)
+        self.portfolio_manager = portfolio_manager
+        self.crypto_api = crypto_api
+        self.row_count = 0
+        self.rows = None  # display rows shown after "Current", or None for all
+        self.versions = None  # scenarios_versions the shown rows were valued at
+
+    def display_row(self, row):
+        return row if self.rows is None or row == 0 else int(self.rows[row - 1])
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.row_count
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        return self.portfolio_manager.get_scenario_display_row(self.display_row(index.row()),
+                                                              self.crypto_api.get_current_prices())
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if not index.isValid():
+            return flags | Qt.ItemFlag.ItemIsDropEnabled
+        # The "Current" row stays pinned at the top; query results can't be rearranged
+        if index.row() > 0 and self.rows is None:
+            flags |= Qt.ItemFlag.ItemIsDragEnabled | Qt.ItemFlag.ItemIsDropEnabled
+        return flags
 
-        self.canvas = FigureCanvas(fig)
-        self.layout.addWidget(self.canvas)
+    def supportedDragActions(self):
+        return Qt.DropAction.MoveAction
 
+    def supportedDropActions(self):
+        return Qt.DropAction.MoveAction
 
-class DragDropListWidget(QListWidget):
+    def _row_count(self, rows):
+        count = len(self.portfolio_manager.scenarios)
+        return count if rows is None or count == 0 else len(rows) + 1
+
+    def _shown_rows(self, rows, count):
+        # Display rows at positions 1..count-1
+        return np.arange(1, count) if rows is None else np.asarray(rows[:count - 1])
+
+    def refresh(self, rows=None):
+        # Which rows changed follows from the manager's versions, without
+        # comparing values: new holdings or scenario prices touch every row, a
+        # price tick only "Current", and a new query result the positions now
+        # showing a different scenario
+        old_count, old_rows, old_versions = self.row_count, self.rows, self.versions
+        new_count = self._row_count(rows)
+        versions = self.portfolio_manager.scenarios_versions
+
+        if new_count < old_count:
+            self.beginRemoveRows(QModelIndex(), new_count, old_count - 1)
+            self.row_count, self.rows, self.versions = new_count, rows, versions
+            self.endRemoveRows()
+        elif new_count > old_count:
+            self.beginInsertRows(QModelIndex(), old_count, new_count - 1)
+            self.row_count, self.rows, self.versions = new_count, rows, versions
+            self.endInsertRows()
+        else:
+            self.row_count, self.rows, self.versions = new_count, rows, versions
+
+        common = min(old_count, new_count)
+        if common == 0:
+            return
+        if versions != old_versions:
+            self._emit_changed(0, common - 1)
+            return
+        self._emit_changed(0, 0)
+        if old_rows is None and rows is None:
+            return
+        changed = np.flatnonzero(self._shown_rows(old_rows, common) != self._shown_rows(rows, common)) + 1
+        if len(changed) == 0:
+            return
+        # One dataChanged per contiguous run of changed rows
+        breaks = np.flatnonzero(np.diff(changed) > 1)
+        starts = np.concatenate(([changed[0]], changed[breaks + 1]))
+        ends = np.concatenate((changed[breaks], [changed[-1]]))
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            self._emit_changed(start, end)
+
+    def _emit_changed(self, start, end):
+        self.dataChanged.emit(self.index(start), self.index(end), [Qt.ItemDataRole.DisplayRole])
+
+    def move_row(self, from_row, to_row):
+        # PortfolioManager has already moved the scenario; mirror it as a row
+        # move so the view shifts rows it has laid out instead of repainting all.
+        # Qt's destination is the row the item goes before, in pre-move numbering.
+        destination = to_row + 1 if to_row > from_row else to_row
+        if self.beginMoveRows(QModelIndex(), from_row, from_row, QModelIndex(), destination):
+            self.endMoveRows()
+
+    def reorder(self, rows=None):
+        # After a bulk sort: rows are only permuted, so persistent indexes
+        # are dropped rather than mapped one by one
+        self.beginResetModel()
+        self.row_count, self.rows = self._row_count(rows), rows
+        self.versions = self.portfolio_manager.scenarios_versions
+        self.endResetModel()
+
+
+class DragDropListView(QListView):
     items_reordered = Signal(int, int)  # from_index, to_index
     
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setDragDropMode(QListWidget.DragDropMode.InternalMove)
+        self.setDragEnabled(True)
+        self.setAcceptDrops(True)
+        self.setDropIndicatorShown(True)
+        self.setDragDropMode(QListView.DragDropMode.InternalMove)
         self.setDefaultDropAction(Qt.DropAction.MoveAction)
+        # All rows share one height, which keeps layout O(1) for large lists
+        self.setUniformItemSizes(True)
 
     def dropEvent(self, event):
-        if event.source() == self:
-            from_index = self.currentRow()
-            super().dropEvent(event)
-            to_index = self.currentRow()
-            
-            # Don't allow moving the "Current" item (index 0)
-            if from_index == 0 or to_index == 0:
-                return
-                
-            if from_index != to_index:
-                self.items_reordered.emit(from_index, to_index)
+        if event.source() != self:
+            return
+
+        # The model is rearranged by PortfolioManager, not by Qt's default move handling
+        event.accept()
+        from_index = self.currentIndex().row()
+        target = self.indexAt(event.position().toPoint())
+        to_index = target.row() if target.isValid() else self.model().rowCount() - 1
+
+        # Don't allow moving the "Current" item (index 0)
+        if from_index <= 0 or to_index <= 0:
+            return
+
+        if from_index != to_index:
+            self.items_reordered.emit(from_index, to_index)
+            self.setCurrentIndex(self.model().index(to_index, 0))
+
+
+class CoinInputsWidget(QScrollArea):
+    # One labelled QLineEdit per registry coin, scrollable once the list gets long
+    text_changed = Signal()
+
+    def __init__(self, registry, label_format, parent=None):
+        super().__init__(parent)
+        self.setWidgetResizable(True)
+        self.setFrameShape(QFrame.Shape.NoFrame)
+        self.setMaximumHeight(COIN_INPUTS_MAX_HEIGHT)
+
+        container = QWidget()
+        layout = QGridLayout(container)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.inputs = {}
+        for row, coin in enumerate(registry):
+            layout.addWidget(QLabel(label_format.format(coin.symbol.upper())), row, 0)
+            line_edit = QLineEdit(DEFAULT_ENTRY_VALUE)
+            line_edit.textChanged.connect(lambda: self.text_changed.emit())
+            layout.addWidget(line_edit, row, 1)
+            self.inputs[coin.symbol] = line_edit
+        self.setWidget(container)
+
+    def get_values(self):
+        return {symbol: line_edit.text() for symbol, line_edit in self.inputs.items()}
+
+    def set_values(self, values):
+        for symbol, line_edit in self.inputs.items():
+            line_edit.setText(str(values.get(symbol, DEFAULT_ENTRY_VALUE)))
+
+    def reset(self):
+        for line_edit in self.inputs.values():
+            line_edit.setText(DEFAULT_ENTRY_VALUE)
 
 
 class HoldingsWidget(QGroupBox):
@@ -112,34 +351,20 @@ class HoldingsWidget(QGroupBox):
     load_requested = Signal()
     fetch_prices_requested = Signal()
     
-    def __init__(self, parent=None):
+    def __init__(self, registry, parent=None):
         super().__init__("Portfolio Holdings", parent)
+        self.registry = registry
         self.setup_ui()
         
     def setup_ui(self):
-        layout = QGridLayout(self)
+        layout = QVBoxLayout(self)
         
-        # Holdings inputs
-        row = 0
-        layout.addWidget(QLabel("BTC:"), row, 0)
-        self.btc_input = QLineEdit(DEFAULT_ENTRY_VALUE)
-        self.btc_input.textChanged.connect(lambda: self.holdings_changed.emit())
-        layout.addWidget(self.btc_input, row, 1)
-        
-        row += 1
-        layout.addWidget(QLabel("ETH:"), row, 0)
-        self.eth_input = QLineEdit(DEFAULT_ENTRY_VALUE)
-        self.eth_input.textChanged.connect(lambda: self.holdings_changed.emit())
-        layout.addWidget(self.eth_input, row, 1)
-        
-        row += 1
-        layout.addWidget(QLabel("XRP:"), row, 0)
-        self.xrp_input = QLineEdit(DEFAULT_ENTRY_VALUE)
-        self.xrp_input.textChanged.connect(lambda: self.holdings_changed.emit())
-        layout.addWidget(self.xrp_input, row, 1)
+        # Holdings inputs, one row per tracked coin
+        self.coin_inputs = CoinInputsWidget(self.registry, "{}:")
+        self.coin_inputs.text_changed.connect(self.holdings_changed.emit)
+        layout.addWidget(self.coin_inputs)
         
         # Buttons
-        row += 1
         button_layout = QHBoxLayout()
         
         save_btn = QPushButton("Save Holdings")
@@ -154,51 +379,34 @@ class HoldingsWidget(QGroupBox):
         fetch_btn.clicked.connect(self.fetch_prices_requested.emit)
         button_layout.addWidget(fetch_btn)
         
-        layout.addLayout(button_layout, row, 0, 1, 2)
+        layout.addLayout(button_layout)
         
     def get_holdings(self):
-        return {
-            'btc': self.btc_input.text(),
-            'eth': self.eth_input.text(),
-            'xrp': self.xrp_input.text()
-        }
+        return self.coin_inputs.get_values()
         
-    def set_holdings(self, btc, eth, xrp):
-        self.btc_input.setText(str(btc))
-        self.eth_input.setText(str(eth))
-        self.xrp_input.setText(str(xrp))
+    def set_holdings(self, holdings):
+        self.coin_inputs.set_values(holdings)
 
 
 class ScenariosWidget(QGroupBox):
     scenario_added = Signal()
     scenarios_saved = Signal()
     scenarios_loaded = Signal()
+    sort_requested = Signal(str, bool)  # "worth" or a coin symbol, descending
     
-    def __init__(self, parent=None):
+    def __init__(self, registry, parent=None):
         super().__init__("Future Scenarios", parent)
+        self.registry = registry
         self.setup_ui()
         
     def setup_ui(self):
-        layout = QGridLayout(self)
-        
-        # Future price inputs
-        row = 0
-        layout.addWidget(QLabel("Future BTC Price:"), row, 0)
-        self.future_btc_input = QLineEdit(DEFAULT_ENTRY_VALUE)
-        layout.addWidget(self.future_btc_input, row, 1)
-        
-        row += 1
-        layout.addWidget(QLabel("Future ETH Price:"), row, 0)
-        self.future_eth_input = QLineEdit(DEFAULT_ENTRY_VALUE)
-        layout.addWidget(self.future_eth_input, row, 1)
+        layout = QVBoxLayout(self)
         
-        row += 1
-        layout.addWidget(QLabel("Future XRP Price:"), row, 0)
-        self.future_xrp_input = QLineEdit(DEFAULT_ENTRY_VALUE)
-        layout.addWidget(self.future_xrp_input, row, 1)
+        # Future price inputs, one row per tracked coin
+        self.coin_inputs = CoinInputsWidget(self.registry, "Future {} Price:")
+        layout.addWidget(self.coin_inputs)
         
         # Buttons
-        row += 1
         button_layout = QHBoxLayout()
         
         add_btn = QPushButton("Add Scenario")
@@ -213,21 +421,106 @@ class ScenariosWidget(QGroupBox):
         load_btn.clicked.connect(self.scenarios_loaded.emit)
         button_layout.addWidget(load_btn)
         
-        layout.addLayout(button_layout, row, 0, 1, 2)
+        layout.addLayout(button_layout)
+        
+        # Sorting, by total worth or by one coin's price
+        sort_layout = QHBoxLayout()
+        self.sort_key = QComboBox()
+        self.sort_key.addItem("Total worth", "worth")
+        for coin in self.registry:
+            self.sort_key.addItem(f"{coin.symbol.upper()} price", coin.symbol)
+        sort_layout.addWidget(self.sort_key)
+        
+        self.sort_descending = QCheckBox("Descending")
+        sort_layout.addWidget(self.sort_descending)
+        
+        sort_btn = QPushButton("Sort Scenarios")
+        sort_btn.clicked.connect(
+            lambda: self.sort_requested.emit(self.sort_key.currentData(), self.sort_descending.isChecked()))
+        sort_layout.addWidget(sort_btn)
+        
+        layout.addLayout(sort_layout)
         
     def _add_scenario(self):
         self.scenario_added.emit()
         # Clear inputs after adding
-        self.future_btc_input.setText(DEFAULT_ENTRY_VALUE)
-        self.future_eth_input.setText(DEFAULT_ENTRY_VALUE)
-        self.future_xrp_input.setText(DEFAULT_ENTRY_VALUE)
+        self.coin_inputs.reset()
         
     def get_future_prices(self):
-        return {
-            'btc': self.future_btc_input.text(),
-            'eth': self.future_eth_input.text(),
-            'xrp': self.future_xrp_input.text()
-        }
+        return self.coin_inputs.get_values()
+
+
+class ScenarioQueryWidget(QGroupBox):
+    # Sort, filter and top-k over the scenarios list. One column drives both
+    # the threshold filter and the sort; the list stays draggable only while
+    # no query is applied.
+    query_changed = Signal(object)  # query_scenarios keyword arguments, or None for the full list
+
+    OPERATORS = ["any", "<", "<=", ">", ">="]
+    ORDERS = ["List order", "Ascending", "Descending"]
+
+    def __init__(self, registry, parent=None):
+        super().__init__("Find Scenarios", parent)
+        self.registry = registry
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QGridLayout(self)
+
+        self.column = QComboBox()
+        self.column.addItem("Total worth", "total")
+        for coin in self.registry:
+            self.column.addItem(f"{coin.symbol.upper()} worth", coin.symbol)
+        layout.addWidget(self.column, 0, 0)
+
+        self.operator = QComboBox()
+        self.operator.addItems(self.OPERATORS)
+        layout.addWidget(self.operator, 0, 1)
+
+        self.value = QLineEdit()
+        self.value.setPlaceholderText("current worth")
+        layout.addWidget(self.value, 0, 2)
+
+        self.order = QComboBox()
+        self.order.addItems(self.ORDERS)
+        layout.addWidget(self.order, 1, 0)
+
+        self.limit = QSpinBox()
+        self.limit.setRange(0, 10 ** 9)
+        self.limit.setPrefix("Top ")
+        self.limit.setSpecialValueText("All rows")
+        layout.addWidget(self.limit, 1, 1)
+
+        button_layout = QHBoxLayout()
+        apply_btn = QPushButton("Apply")
+        apply_btn.clicked.connect(self._apply)
+        button_layout.addWidget(apply_btn)
+        clear_btn = QPushButton("Clear")
+        clear_btn.clicked.connect(lambda: self.query_changed.emit(None))
+        button_layout.addWidget(clear_btn)
+        layout.addLayout(button_layout, 1, 2)
+
+    def _apply(self):
+        try:
+            query = self.get_query()
+        except ValueError:
+            QMessageBox.critical(self, "Error", "The threshold must be a number, or empty for the current worth.")
+            return
+        self.query_changed.emit(query)
+
+    def get_query(self):
+        # Raises ValueError if the threshold isn't a number
+        column = self.column.currentData()
+        query = {}
+        if self.operator.currentText() != "any":
+            value = self.value.text().strip()
+            query["where"] = [(column, self.operator.currentText(), float(value) if value else "current")]
+        if self.order.currentIndex():
+            query["sort"] = column
+            query["descending"] = self.order.currentText() == "Descending"
+        if self.limit.value():
+            query["limit"] = self.limit.value()
+        return query
 
 
 class InfoDisplayWidget(QWidget):
@@ -274,7 +567,7 @@ class InfoDisplayWidget(QWidget):
         self.market_info_text.clear()
         self.market_info_text.setPlainText(text)
         self.market_info_text.setReadOnly(True)
-        print(f"Market info updated successfully")  # Debug
+        instrumentation.count("ui.market_info_updates")
 
 
 class PlotControlWidget(QWidget):
@@ -294,4 +587,121 @@ class PlotControlWidget(QWidget):
         
         allocation_btn = QPushButton("Plot Portfolio Allocation")
         allocation_btn.clicked.connect(self.plot_allocation_requested.emit)
-        layout.addWidget(allocation_btn)
\ No newline at end of file
+        layout.addWidget(allocation_btn)
+
+
+class DebugPanel(QWidget):
+    # Live timings and counters from instrumentation, metric dumps, and an
+    # opt-in profile capture. Opening the panel turns recording on; it stays
+    # on (at the cost of a clock read per probe) until unticked.
+    def __init__(self, source_stats=None, parent=None):
+        super().__init__(parent, Qt.WindowType.Window)
+        self.setWindowTitle("Debug: Timings and Profiling")
+        self.source_stats = source_stats  # callable, e.g. CryptoAPI.source_stats
+        self.profile = None
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+
+        controls = QHBoxLayout()
+        self.recording = QCheckBox("Record timings")
+        self.recording.toggled.connect(instrumentation.enable)
+        controls.addWidget(self.recording)
+        reset_btn = QPushButton("Reset")
+        reset_btn.clicked.connect(self.reset)
+        controls.addWidget(reset_btn)
+        copy_btn = QPushButton("Copy JSON")
+        copy_btn.clicked.connect(lambda: QApplication.clipboard().setText(self.metrics_json()))
+        controls.addWidget(copy_btn)
+        save_btn = QPushButton("Save Metrics...")
+        save_btn.clicked.connect(self.save_metrics)
+        controls.addWidget(save_btn)
+        layout.addLayout(controls)
+
+        self.stats_text = QPlainTextEdit()
+        self.stats_text.setReadOnly(True)
+        self.stats_text.setStyleSheet("font-family: monospace;")
+        self.stats_text.setMinimumSize(640, 300)
+        layout.addWidget(self.stats_text)
+
+        profile_controls = QHBoxLayout()
+        self.profile_mode = QComboBox()
+        self.profile_mode.addItems(instrumentation.ProfileCapture.MODES)
+        profile_controls.addWidget(self.profile_mode)
+        self.profile_btn = QPushButton("Start Profile")
+        self.profile_btn.clicked.connect(self.toggle_profile)
+        profile_controls.addWidget(self.profile_btn)
+        save_profile_btn = QPushButton("Save Profile...")
+        save_profile_btn.clicked.connect(self.save_profile)
+        profile_controls.addWidget(save_profile_btn)
+        layout.addLayout(profile_controls)
+
+        self.profile_text = QPlainTextEdit()
+        self.profile_text.setReadOnly(True)
+        self.profile_text.setStyleSheet("font-family: monospace;")
+        layout.addWidget(self.profile_text)
+
+    def showEvent(self, event):
+        self.recording.setChecked(True)
+        self.refresh()
+        self.refresh_timer.start(DEBUG_PANEL_REFRESH_MS)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        sources = self.source_stats() if self.source_stats is not None else None
+        self.stats_text.setPlainText(instrumentation.format_table(sources))
+
+    def reset(self):
+        instrumentation.reset()
+        self.refresh()
+
+    def metrics_json(self):
+        sources = self.source_stats() if self.source_stats is not None else None
+        return instrumentation.to_json({"sources": sources} if sources else None)
+
+    def save_metrics(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Metrics", "metrics.prom",
+                                              "Prometheus text (*.prom);;JSON (*.json)")
+        if not path:
+            return
+        text = self.metrics_json() if path.endswith(".json") else instrumentation.to_prometheus()
+        try:
+            atomic_write(path, lambda f: f.write(text))
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Failed to save metrics: {e}")
+
+    def toggle_profile(self):
+        if self.profile is not None and self.profile.running:
+            self.profile_text.setPlainText(self.profile.stop())
+            self.profile_btn.setText("Start Profile")
+            self.profile_mode.setEnabled(True)
+            return
+        self.profile = instrumentation.ProfileCapture(self.profile_mode.currentText())
+        self.profile.start()
+        self.profile_btn.setText("Stop Profile")
+        self.profile_mode.setEnabled(False)
+        self.profile_text.setPlainText("Profiling... reproduce the slow action, then press Stop Profile.")
+
+    def save_profile(self):
+        if self.profile is None or self.profile.running:
+            return
+        default = "profile.prof" if self.profile.mode == "cprofile" else "profile.folded"
+        path, _ = QFileDialog.getSaveFileName(self, "Save Profile", default)
+        if path:
+            try:
+                self.profile.save(path)
+            except OSError as e:
+                QMessageBox.critical(self, "Error", f"Failed to save profile: {e}")
+
+    def closeEvent(self, event):
+        # A capture left running would keep sampling in the background
+        if self.profile is not None and self.profile.running:
+            self.toggle_profile()
+        super().closeEvent(event)
@@ -0,0 +1,170 @@
+# Minimal RFC 6455 WebSocket client on the standard library, enough for a
+# ticker feed: ws:// and wss://, text/binary messages (fragmented or not),
+# automatic pong replies and a clean close. No extensions or subprotocols.
+import base64
+import hashlib
+import os
+import socket
+import ssl
+import struct
+import urllib.parse
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT = 0x1
+OPCODE_BINARY = 0x2
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+
+class WebSocketError(Exception):
+    pass
+
+
+def accept_key(key):
+    # Sec-WebSocket-Accept value the server must answer a Sec-WebSocket-Key with
+    return base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+
+
+def read_frame(reader):
+    # Returns (fin, opcode, payload); `reader` is a buffered binary file.
+    # Payloads are unmasked if the peer masked them.
+    header = _read_exactly(reader, 2)
+    fin = bool(header[0] & 0x80)
+    opcode = header[0] & 0x0F
+    masked = bool(header[1] & 0x80)
+    length = header[1] & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", _read_exactly(reader, 2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", _read_exactly(reader, 8))[0]
+    mask = _read_exactly(reader, 4) if masked else None
+    payload = _read_exactly(reader, length)
+    if mask:
+        payload = _apply_mask(payload, mask)
+    return fin, opcode, payload
+
+
+def encode_frame(opcode, payload, mask=False):
+    # Clients must mask every frame they send; servers must not
+    header = bytearray([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    if len(payload) < 126:
+        header.append(mask_bit | len(payload))
+    elif len(payload) < 1 << 16:
+        header.append(mask_bit | 126)
+        header += struct.pack("!H", len(payload))
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack("!Q", len(payload))
+    if mask:
+        key = os.urandom(4)
+        return bytes(header) + key + _apply_mask(payload, key)
+    return bytes(header) + payload
+
+
+def _apply_mask(payload, mask):
+    # XOR as one big integer: much faster than a per-byte loop in Python
+    if not payload:
+        return payload
+    repeated = (mask * (len(payload) // 4 + 1))[:len(payload)]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(repeated, "big")).to_bytes(len(payload), "big")
+
+
+def _read_exactly(reader, size):
+    data = reader.read(size)
+    if len(data) < size:
+        raise WebSocketError("Connection closed mid-frame")
+    return data
+
+
+class WebSocketClient:
+    def __init__(self, url, timeout=None, context=None):
+        self.url = url
+        self.timeout = timeout
+        self.context = context
+        self.sock = None
+        self.reader = None
+
+    def connect(self):
+        parts = urllib.parse.urlsplit(self.url)
+        if parts.scheme not in ("ws", "wss"):
+            raise WebSocketError(f"Not a WebSocket URL: {self.url}")
+        port = parts.port or (443 if parts.scheme == "wss" else 80)
+        sock = socket.create_connection((parts.hostname, port), timeout=self.timeout)
+        # Ticks are small and latency-sensitive; don't let Nagle hold them back
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if parts.scheme == "wss":
+            context = self.context if self.context is not None else ssl.create_default_context()
+            sock = context.wrap_socket(sock, server_hostname=parts.hostname)
+
+        key = base64.b64encode(os.urandom(16)).decode()
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        request = (f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nUpgrade: websocket\r\n"
+                   f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n")
+        sock.sendall(request.encode())
+
+        reader = sock.makefile("rb")
+        status = reader.readline().decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = reader.readline().decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if len(status) < 2 or status[1] != "101" or headers.get("sec-websocket-accept") != accept_key(key):
+            reader.close()
+            sock.close()
+            raise WebSocketError(f"WebSocket handshake failed: {' '.join(status).strip()}")
+        self.sock = sock
+        self.reader = reader
+        return self
+
+    def send(self, message):
+        if isinstance(message, str):
+            self.sock.sendall(encode_frame(OPCODE_TEXT, message.encode(), mask=True))
+        else:
+            self.sock.sendall(encode_frame(OPCODE_BINARY, bytes(message), mask=True))
+
+    def recv(self):
+        # Next complete message (str for text, bytes for binary), or None once
+        # the server has closed the connection
+        fragments = []
+        message_opcode = None
+        while True:
+            fin, opcode, payload = read_frame(self.reader)
+            if opcode == OPCODE_PING:
+                self.sock.sendall(encode_frame(OPCODE_PONG, payload, mask=True))
+                continue
+            if opcode == OPCODE_PONG:
+                continue
+            if opcode == OPCODE_CLOSE:
+                self._send_close(payload[:2])
+                return None
+            if opcode != OPCODE_CONTINUATION:
+                message_opcode = opcode
+            fragments.append(payload)
+            if fin:
+                data = b"".join(fragments)
+                return data.decode("utf-8") if message_opcode == OPCODE_TEXT else data
+
+    def close(self):
+        # Safe to call from another thread to interrupt a blocked recv()
+        sock, reader = self.sock, self.reader
+        self.sock = self.reader = None
+        if sock is None:
+            return
+        try:
+            sock.sendall(encode_frame(OPCODE_CLOSE, struct.pack("!H", 1000), mask=True))
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        reader.close()
+        sock.close()
+
+    def _send_close(self, payload):
+        self.sock.sendall(encode_frame(OPCODE_CLOSE, payload, mask=True))